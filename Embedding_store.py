@@ -1,11 +1,21 @@
 # embedding_store.py — FAISS index manager for WYA semantic recommendation engine
-# Manages one FAISS flat L2 index per user, persisted to /app/data/faiss/
-# Falls back gracefully if faiss-cpu is not installed.
+# Manages one ID-mapped FAISS flat L2 index per user, persisted to /app/data/faiss/
+# Items can be added, updated and removed without re-embedding the wardrobe.
+# Each edit still rewrites the user's index file, so it costs O(n) in the
+# wardrobe size (see _load_for_write).
+# Each user's index and id map live in a single versioned file that is replaced
+# atomically, with writers serialized across workers by a per-user file lock.
+# If faiss-cpu is not installed, an exact NumPy backend with the same API is used.
 
 import json
 import logging
 import os
-from typing import Dict, Any, List, Optional
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 
 import numpy as np
 
@@ -13,67 +23,577 @@ logger = logging.getLogger(__name__)
 
 FAISS_DIR = os.getenv("FAISS_DIR", "/app/data/faiss")
 
+# In-process cache of loaded indexes — bounded by entry count and by memory
+CACHE_MAX_ENTRIES = int(os.getenv("FAISS_CACHE_MAX_ENTRIES", "256"))
+CACHE_MAX_BYTES = int(os.getenv("FAISS_CACHE_MAX_MB", "128")) * 1024 * 1024
+
+# On-disk format: fixed header, JSON metadata (id map), then the serialized index
+_MAGIC = b"WYAFAISS"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sII")  # magic, format version, metadata length
+
+try:
+    import fcntl  # POSIX only — Windows dev boxes fall back to in-process locks
+except ImportError:
+    fcntl = None  # type: ignore
+
 # ---------------------------------------------------------------------------
-# Optional FAISS import — fall back silently so the app boots without it
+# Optional FAISS import — fall back to the NumPy backend so the app boots without it
 # ---------------------------------------------------------------------------
 try:
     import faiss  # type: ignore
     _FAISS_AVAILABLE = True
-    logger.info("FAISS loaded successfully — semantic search enabled")
 except ImportError:
     faiss = None  # type: ignore
     _FAISS_AVAILABLE = False
-    logger.warning("faiss-cpu not installed — semantic search will fall back to linear scan")
+
+# EMBEDDING_BACKEND=auto|faiss|numpy — auto prefers FAISS when it is installed
+_requested_backend = os.getenv("EMBEDDING_BACKEND", "auto").lower()
+if _requested_backend == "numpy" or not _FAISS_AVAILABLE:
+    BACKEND = "numpy"
+else:
+    BACKEND = "faiss"
+
+if BACKEND == "faiss":
+    logger.info("FAISS loaded successfully — semantic search enabled")
+elif _requested_backend == "faiss":
+    logger.warning("EMBEDDING_BACKEND=faiss but faiss-cpu is not installed — using NumPy backend")
+else:
+    logger.info("Semantic search using NumPy backend (faiss-cpu %s)",
+                "available but disabled" if _FAISS_AVAILABLE else "not installed")
 
 
 def _index_path(user_id: str) -> str:
-    return os.path.join(FAISS_DIR, f"{user_id}.index")
+    return os.path.join(FAISS_DIR, f"{user_id}.faiss")
+
 
+def _lock_path(user_id: str) -> str:
+    return os.path.join(FAISS_DIR, f"{user_id}.lock")
 
-def _ids_path(user_id: str) -> str:
-    return os.path.join(FAISS_DIR, f"{user_id}.ids.json")
+
+def _legacy_paths(user_id: str) -> Tuple[str, str]:
+    """Pre-v1 layout: separate index and ids files written non-atomically."""
+    return (os.path.join(FAISS_DIR, f"{user_id}.index"),
+            os.path.join(FAISS_DIR, f"{user_id}.ids.json"))
 
 
 def _ensure_dir() -> None:
     os.makedirs(FAISS_DIR, exist_ok=True)
 
 
+def _file_signature(user_id: str) -> Optional[Tuple[int, int, int]]:
+    """
+    (inode, mtime_ns, size) of the persisted index file, or None if missing.
+    Every save renames a fresh file into place, so a write by any worker
+    changes the inode and invalidates cached copies elsewhere.
+    """
+    try:
+        st = os.stat(_index_path(user_id))
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+_local_locks: Dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _user_lock(user_id: str) -> Iterator[None]:
+    """
+    Exclusive per-user write lock. flock() serializes writers across uvicorn
+    workers (and threads, since each holder opens its own file description).
+    Readers never take it — they only ever see a fully renamed file.
+    """
+    _ensure_dir()
+    if fcntl is None:
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(user_id, threading.Lock())
+        with lock:
+            yield
+        return
+
+    with open(_lock_path(user_id), "a") as fh:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+# ---------------------------------------------------------------------------
+# item_id <-> FAISS label mapping
+# ---------------------------------------------------------------------------
+
+class _IdMap:
+    """
+    Bidirectional map between wardrobe item_ids and the int64 labels stored in
+    the IndexIDMap2. Labels are never reused across items, so a stale label
+    can't resolve to the wrong item after a removal.
+    """
+
+    def __init__(self, labels: Optional[Dict[str, int]] = None, next_label: int = 0):
+        self.labels: Dict[str, int] = dict(labels or {})
+        self.items: Dict[int, str] = {lbl: iid for iid, lbl in self.labels.items()}
+        self.next_label = max(next_label, max(self.items, default=-1) + 1)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self.labels
+
+    def label_for(self, item_id: str) -> Optional[int]:
+        return self.labels.get(item_id)
+
+    def item_for(self, label: int) -> Optional[str]:
+        return self.items.get(int(label))
+
+    def assign(self, item_id: str) -> int:
+        label = self.next_label
+        self.next_label += 1
+        self.labels[item_id] = label
+        self.items[label] = item_id
+        return label
+
+    def remove(self, item_id: str) -> Optional[int]:
+        label = self.labels.pop(item_id, None)
+        if label is not None:
+            self.items.pop(label, None)
+        return label
+
+    def copy(self) -> "_IdMap":
+        return _IdMap(self.labels, self.next_label)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {"next_label": self.next_label, "labels": self.labels}
+
+    @classmethod
+    def from_json(cls, data: Any) -> "_IdMap":
+        if isinstance(data, list):
+            # Legacy format: positional list where row number == FAISS label
+            return cls({iid: i for i, iid in enumerate(data)}, len(data))
+        return cls(data.get("labels", {}), data.get("next_label", 0))
+
+
+# ---------------------------------------------------------------------------
+# NumPy backend — exact flat L2 search without faiss-cpu
+# ---------------------------------------------------------------------------
+
+class _NumpyIndex:
+    """
+    Drop-in for IndexIDMap2(IndexFlatL2) covering the subset of the FAISS API
+    this module uses. Vectors live in one contiguous float32 matrix (grown
+    geometrically) so a search is a single matrix-vector product plus an
+    argpartition top-k. Removal swaps the last row into the freed slot, O(1).
+    """
+
+    def __init__(self, d: int):
+        self.d = d
+        self.ntotal = 0
+        self._vectors = np.empty((0, d), dtype=np.float32)
+        self._sq_norms = np.empty(0, dtype=np.float32)
+        self._labels = np.empty(0, dtype=np.int64)
+        self._rows: Dict[int, int] = {}
+
+    def _reserve(self, n: int) -> None:
+        capacity = self._vectors.shape[0]
+        if n <= capacity:
+            return
+        new_cap = max(n, capacity * 2, 16)
+        vectors = np.empty((new_cap, self.d), dtype=np.float32)
+        sq_norms = np.empty(new_cap, dtype=np.float32)
+        labels = np.empty(new_cap, dtype=np.int64)
+        vectors[:self.ntotal] = self._vectors[:self.ntotal]
+        sq_norms[:self.ntotal] = self._sq_norms[:self.ntotal]
+        labels[:self.ntotal] = self._labels[:self.ntotal]
+        self._vectors, self._sq_norms, self._labels = vectors, sq_norms, labels
+
+    def add_with_ids(self, x: np.ndarray, ids: np.ndarray) -> None:
+        x = np.ascontiguousarray(x, dtype=np.float32).reshape(-1, self.d)
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        start, end = self.ntotal, self.ntotal + len(ids)
+        self._reserve(end)
+        self._vectors[start:end] = x
+        self._sq_norms[start:end] = np.einsum("ij,ij->i", x, x)
+        self._labels[start:end] = ids
+        for row, label in enumerate(ids.tolist(), start):
+            self._rows[label] = row
+        self.ntotal = end
+
+    def remove_ids(self, ids: np.ndarray) -> int:
+        removed = 0
+        for label in np.asarray(ids, dtype=np.int64).reshape(-1).tolist():
+            row = self._rows.pop(label, None)
+            if row is None:
+                continue
+            last = self.ntotal - 1
+            if row != last:
+                moved = int(self._labels[last])
+                self._vectors[row] = self._vectors[last]
+                self._sq_norms[row] = self._sq_norms[last]
+                self._labels[row] = moved
+                self._rows[moved] = row
+            self.ntotal = last
+            removed += 1
+        return removed
+
+    def search(self, x: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        q = np.ascontiguousarray(x, dtype=np.float32).reshape(-1, self.d)
+        n = self.ntotal
+        distances = np.full((q.shape[0], k), np.finfo(np.float32).max, dtype=np.float32)
+        labels = np.full((q.shape[0], k), -1, dtype=np.int64)
+        if n == 0 or k <= 0:
+            return distances, labels
+
+        # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2, one matrix product for all rows
+        dists = self._sq_norms[:n] - 2.0 * (q @ self._vectors[:n].T)
+        dists += np.einsum("ij,ij->i", q, q)[:, None]
+
+        kk = min(k, n)
+        if kk < n:
+            top = np.argpartition(dists, kk - 1, axis=1)[:, :kk]
+        else:
+            top = np.broadcast_to(np.arange(n), (q.shape[0], n))
+        top_d = np.take_along_axis(dists, top, axis=1)
+        order = np.argsort(top_d, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+
+        distances[:, :kk] = np.maximum(np.take_along_axis(top_d, order, axis=1), 0.0)
+        labels[:, :kk] = self._labels[top]
+        return distances, labels
+
+    def reconstruct(self, label: int) -> np.ndarray:
+        return self._vectors[self._rows[int(label)]].copy()
+
+    def copy(self) -> "_NumpyIndex":
+        clone = _NumpyIndex(self.d)
+        clone.add_with_ids(self._vectors[:self.ntotal], self._labels[:self.ntotal])
+        return clone
+
+    def to_bytes(self) -> bytes:
+        return self._labels[:self.ntotal].tobytes() + self._vectors[:self.ntotal].tobytes()
+
+    @classmethod
+    def from_bytes(cls, d: int, count: int, buf: memoryview) -> "_NumpyIndex":
+        labels = np.frombuffer(buf, dtype=np.int64, count=count)
+        vectors = np.frombuffer(buf, dtype=np.float32, count=count * d, offset=count * 8)
+        index = cls(d)
+        index.add_with_ids(vectors.reshape(count, d), labels)
+        return index
+
+    @classmethod
+    def from_faiss(cls, index) -> "_NumpyIndex":
+        """Copy the vectors out of an IndexIDMap2 (used to switch backends)."""
+        converted = cls(index.d)
+        if index.ntotal:
+            # id_map is aligned with the storage order of the wrapped flat index
+            labels = faiss.vector_to_array(index.id_map).astype(np.int64)
+            converted.add_with_ids(index.index.reconstruct_n(0, index.ntotal), labels)
+        return converted
+
+
+# ---------------------------------------------------------------------------
+# Backend dispatch
+# ---------------------------------------------------------------------------
+
+def _new_index(dim: int):
+    if BACKEND == "faiss":
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    return _NumpyIndex(dim)
+
+
+def _clone_index(index):
+    if isinstance(index, _NumpyIndex):
+        return index.copy()
+    return faiss.clone_index(index)
+
+
+def _serialize_index(index) -> Tuple[str, bytes]:
+    if isinstance(index, _NumpyIndex):
+        return "numpy", index.to_bytes()
+    return "faiss", faiss.serialize_index(index).tobytes()
+
+
+def _deserialize_index(backend: str, meta: Dict[str, Any], buf: memoryview):
+    """Rebuild an index from its payload, converting to the active backend if needed."""
+    if backend == "numpy":
+        index = _NumpyIndex.from_bytes(meta["dim"], meta["count"], buf)
+        if BACKEND == "numpy":
+            return index
+        converted = _new_index(index.d)
+        if index.ntotal:
+            converted.add_with_ids(index._vectors[:index.ntotal], index._labels[:index.ntotal])
+        return converted
+
+    if not _FAISS_AVAILABLE:
+        raise ValueError("index was written by FAISS but faiss-cpu is not installed — rebuild required")
+    index = faiss.deserialize_index(np.frombuffer(buf, dtype=np.uint8))
+    return _NumpyIndex.from_faiss(index) if BACKEND == "numpy" else index
+
+
+def _upgrade_legacy_index(index):
+    """Wrap a pre-ID-map IndexFlatL2 so existing row numbers become labels."""
+    if isinstance(index, faiss.IndexIDMap2):
+        return index
+    upgraded = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+    if index.ntotal:
+        vectors = index.reconstruct_n(0, index.ntotal)
+        upgraded.add_with_ids(vectors, np.arange(index.ntotal, dtype=np.int64))
+    return upgraded if BACKEND == "faiss" else _NumpyIndex.from_faiss(upgraded)
+
+
+def _item_id(item: Dict[str, Any]) -> str:
+    return item.get("item_id") or item.get("id", "")
+
+
+# ---------------------------------------------------------------------------
+# In-process LRU cache of loaded indexes
+# ---------------------------------------------------------------------------
+
+class _IndexCache:
+    """
+    Bounded LRU of (index, id_map) keyed by user_id.
+    Entries are evicted least-recently-used first once either the entry count
+    or the estimated memory footprint exceeds its limit. Cached indexes are
+    treated as read-only snapshots — writers clone, mutate, then put() back.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, Any, _IdMap, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _estimate_bytes(index, id_map: _IdMap) -> int:
+        # float32 vectors + the label map held by IndexIDMap2 + our own dicts
+        vectors = int(index.ntotal) * (int(index.d) * 4 + 16)
+        return vectors + sum(len(i) + 128 for i in id_map.labels)
+
+    def get(self, user_id: str, signature) -> Optional[Tuple[Any, _IdMap]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            cached_sig, index, id_map, size = entry
+            if cached_sig != signature:
+                # Files changed on disk since we loaded them — drop the stale copy
+                self._drop(user_id)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return index, id_map
+
+    def put(self, user_id: str, signature, index, id_map: _IdMap) -> None:
+        size = self._estimate_bytes(index, id_map)
+        with self._lock:
+            self._drop(user_id)
+            if size > self.max_bytes or self.max_entries <= 0:
+                return
+            self._entries[user_id] = (signature, index, id_map, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                evicted, _ = next(iter(self._entries.items()))
+                self._drop(evicted)
+                self.evictions += 1
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            if self._drop(user_id):
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, user_id: str) -> bool:
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[3]
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+_cache = _IndexCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
+
+
+def _load(user_id: str) -> Optional[Tuple[Any, _IdMap]]:
+    """
+    Return (index, id_map) for a user, from the cache when the file on disk
+    is unchanged, otherwise by reading it and caching the result.
+    Returns None if no index is persisted.
+    """
+    signature = _file_signature(user_id)
+    if signature is None:
+        _cache.invalidate(user_id)
+        return _load_legacy(user_id)
+
+    cached = _cache.get(user_id, signature)
+    if cached is not None:
+        return cached
+
+    index, id_map = _read_index_file(_index_path(user_id))
+    _cache.put(user_id, signature, index, id_map)
+    return index, id_map
+
+
+def _read_index_file(path: str) -> Tuple[Any, _IdMap]:
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise ValueError(f"truncated index file {path}")
+    magic, version, meta_len = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError(f"not a WYA index file: {path}")
+    if version > _FORMAT_VERSION:
+        raise ValueError(f"index format v{version} is newer than supported v{_FORMAT_VERSION}")
+
+    meta_end = _HEADER.size + meta_len
+    meta = json.loads(data[_HEADER.size:meta_end].decode("utf-8"))
+    index = _deserialize_index(meta.get("backend", "faiss"), meta, memoryview(data)[meta_end:])
+    return index, _IdMap.from_json(meta["id_map"])
+
+
+def _load_legacy(user_id: str) -> Optional[Tuple[Any, _IdMap]]:
+    """Read a pre-v1 index pair; it is rewritten in the new format on next save."""
+    idx_path, ids_path = _legacy_paths(user_id)
+    if not (os.path.exists(idx_path) and os.path.exists(ids_path)):
+        return None
+    if not _FAISS_AVAILABLE:
+        raise ValueError("legacy FAISS index found but faiss-cpu is not installed — rebuild required")
+    index = _upgrade_legacy_index(faiss.read_index(idx_path))
+    with open(ids_path) as f:
+        id_map = _IdMap.from_json(json.load(f))
+    return index, id_map
+
+
+def _save(user_id: str, index, id_map: _IdMap) -> None:
+    """
+    Atomically persist index + id map as one file and publish it as the cached
+    copy. Writes a temp file in the same directory, fsyncs, then os.replace()s
+    it over the old one — a crash leaves either the old or the new file intact.
+    Callers must hold _user_lock(user_id).
+    """
+    backend, payload = _serialize_index(index)
+    meta = json.dumps({
+        "backend": backend,
+        "dim": int(index.d),
+        "count": int(index.ntotal),
+        "id_map": id_map.to_json(),
+    }).encode("utf-8")
+
+    fd, tmp_path = tempfile.mkstemp(dir=FAISS_DIR, prefix=f".{user_id}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, len(meta)))
+            f.write(meta)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, _index_path(user_id))
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    for legacy in _legacy_paths(user_id):
+        if os.path.exists(legacy):
+            os.remove(legacy)
+
+    _cache.put(user_id, _file_signature(user_id), index, id_map)
+
+
+def _load_for_write(user_id: str) -> Optional[Tuple[Any, _IdMap]]:
+    """
+    Copy-on-write view of a user's index: concurrent searches keep using the
+    cached snapshot while the caller mutates and then _save()s the copy.
+    Callers must hold _user_lock(user_id) so the state they copy is current.
+
+    This makes every single-item edit O(n): the clone copies all vectors, and
+    _save() rewrites the whole file, because the file is what other workers
+    watch for changes and it has to be replaced atomically. That is kept on
+    purpose — a wardrobe is hundreds of small vectors, and an edit used to
+    drop the index and re-embed every item on the next search instead.
+    """
+    loaded = _load(user_id)
+    if loaded is None:
+        return None
+    index, id_map = loaded
+    return _clone_index(index), id_map.copy()
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
 
-def build_index(user_id: str, items: List[Dict[str, Any]]) -> bool:
+def build_index(user_id: str, items: List[Dict[str, Any]],
+                vectors: Optional[np.ndarray] = None) -> bool:
     """
-    Build (or rebuild) a FAISS flat L2 index from a list of wardrobe item dicts.
-    Stores the index and a parallel item_id list to disk.
-    Returns True on success, False on failure / FAISS unavailable.
+    Build (or rebuild) an ID-mapped FAISS flat L2 index from a list of wardrobe item dicts.
+    If `vectors` is given (one row per item, e.g. from database.load_embedding_matrix),
+    they are indexed as-is instead of being re-derived from item attributes.
+    Stores the index and its item_id <-> label map to disk in one atomic write.
+    Returns True on success, False on failure / empty wardrobe.
     """
-    if not _FAISS_AVAILABLE or not items:
+    if not items:
         return False
 
-    from ai_matcher import _text_to_pseudo_embedding  # local import to avoid circular deps
+    from ai_matcher import encode_items  # local import to avoid circular deps
 
     try:
         _ensure_dir()
-        embeddings = []
-        item_ids = []
-
-        for item in items:
-            emb = _text_to_pseudo_embedding(item)
-            embeddings.append(emb)
-            item_ids.append(item.get("item_id") or item.get("id", ""))
-
-        vectors = np.array(embeddings, dtype=np.float32)
+        id_map = _IdMap()
+        unique_rows = []
+        labels = []
+
+        for row, item in enumerate(items):
+            item_id = _item_id(item)
+            if item_id in id_map:
+                continue
+            unique_rows.append(row)
+            labels.append(id_map.assign(item_id))
+
+        if vectors is None:
+            vectors = encode_items([items[r] for r in unique_rows])
+        else:
+            if len(vectors) != len(items):
+                raise ValueError(f"{len(vectors)} vectors for {len(items)} items")
+            vectors = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32)[unique_rows])
         dim = vectors.shape[1]
 
-        index = faiss.IndexFlatL2(dim)
-        index.add(vectors)
-
-        faiss.write_index(index, _index_path(user_id))
-        with open(_ids_path(user_id), "w") as f:
-            json.dump(item_ids, f)
+        index = _new_index(dim)
+        index.add_with_ids(vectors, np.array(labels, dtype=np.int64))
+        with _user_lock(user_id):
+            _save(user_id, index, id_map)
 
-        logger.info("FAISS index built — user=%s items=%d dim=%d", user_id[:8], len(items), dim)
+        logger.info("FAISS index built — user=%s items=%d dim=%d", user_id[:8], len(labels), dim)
         return True
 
     except Exception as exc:
@@ -85,33 +605,26 @@ def search(user_id: str, query_embedding: np.ndarray, top_k: int = 10) -> List[s
     """
     Search the FAISS index for the top-K most similar item_ids.
     Returns a list of item_id strings (may be shorter than top_k if wardrobe is small).
-    Returns [] if index doesn't exist or FAISS is unavailable.
+    Returns [] if index doesn't exist.
     """
-    if not _FAISS_AVAILABLE:
-        return []
-
-    idx_path = _index_path(user_id)
-    ids_path = _ids_path(user_id)
-
-    if not os.path.exists(idx_path) or not os.path.exists(ids_path):
-        return []
-
     try:
-        index = faiss.read_index(idx_path)
-        with open(ids_path) as f:
-            item_ids = json.load(f)
+        loaded = _load(user_id)
+        if loaded is None:
+            return []
+        index, id_map = loaded
 
         k = min(top_k, index.ntotal)
         if k == 0:
             return []
 
         vec = np.array([query_embedding], dtype=np.float32)
-        _distances, indices = index.search(vec, k)
+        _distances, labels = index.search(vec, k)
 
         results = []
-        for idx in indices[0]:
-            if 0 <= idx < len(item_ids):
-                results.append(item_ids[idx])
+        for label in labels[0]:
+            item_id = id_map.item_for(label) if label >= 0 else None
+            if item_id is not None:
+                results.append(item_id)
 
         logger.debug("FAISS search — user=%s top_k=%d results=%d", user_id[:8], top_k, len(results))
         return results
@@ -125,68 +638,117 @@ def add_item(user_id: str, item: Dict[str, Any]) -> bool:
     """
     Add a single item to an existing FAISS index.
     If no index exists yet, builds one from scratch with just this item.
+    Adding an item that is already indexed replaces its vector.
     Returns True on success.
     """
-    if not _FAISS_AVAILABLE:
-        return False
+    return _upsert(user_id, item, "added")
+
+
+def update_item(user_id: str, item: Dict[str, Any]) -> bool:
+    """
+    Re-embed an edited item and swap its vector, keeping its label.
+    Items missing from the index are added. Only this item is re-embedded,
+    but the index file is rewritten (O(n), see _load_for_write).
+    Returns True on success.
+    """
+    return _upsert(user_id, item, "updated")
 
-    from ai_matcher import _text_to_pseudo_embedding
 
-    idx_path = _index_path(user_id)
-    ids_path = _ids_path(user_id)
+def _upsert(user_id: str, item: Dict[str, Any], action: str) -> bool:
+    from ai_matcher import _text_to_pseudo_embedding
 
     try:
         _ensure_dir()
         emb = _text_to_pseudo_embedding(item)
         vec = np.array([emb], dtype=np.float32)
-        item_id = item.get("item_id") or item.get("id", "")
+        item_id = _item_id(item)
+
+        with _user_lock(user_id):
+            loaded = _load_for_write(user_id)
+            if loaded is not None:
+                index, id_map = loaded
+            else:
+                # No index yet — bootstrap with this single item
+                index, id_map = _new_index(vec.shape[1]), _IdMap()
+
+            label = id_map.label_for(item_id)
+            if label is not None:
+                index.remove_ids(np.array([label], dtype=np.int64))
+            else:
+                label = id_map.assign(item_id)
+            index.add_with_ids(vec, np.array([label], dtype=np.int64))
+            _save(user_id, index, id_map)
+
+        logger.info("FAISS item %s — user=%s item=%s", action, user_id[:8], str(item_id)[:8])
+        return True
 
-        if os.path.exists(idx_path) and os.path.exists(ids_path):
-            index = faiss.read_index(idx_path)
-            with open(ids_path) as f:
-                item_ids = json.load(f)
+    except Exception as exc:
+        logger.error("FAISS item %s failed — user=%s error=%s", action, user_id[:8], exc)
+        return False
 
-            index.add(vec)
-            item_ids.append(item_id)
 
-            faiss.write_index(index, idx_path)
-            with open(ids_path, "w") as f:
-                json.dump(item_ids, f)
-        else:
-            # No index yet — bootstrap with this single item
-            dim = vec.shape[1]
-            index = faiss.IndexFlatL2(dim)
-            index.add(vec)
-            faiss.write_index(index, idx_path)
-            with open(ids_path, "w") as f:
-                json.dump([item_id], f)
-
-        logger.info("FAISS item added — user=%s item=%s", user_id[:8], str(item_id)[:8])
+def remove_item(user_id: str, item_id: str) -> bool:
+    """
+    Drop a single item from the user's index without re-embedding the rest.
+    The index file is rewritten (O(n), see _load_for_write).
+    Returns True if the item was indexed and has been removed.
+    """
+    if not index_exists(user_id):
+        return False
+
+    try:
+        with _user_lock(user_id):
+            loaded = _load_for_write(user_id)
+            if loaded is None:
+                return False
+            index, id_map = loaded
+
+            label = id_map.remove(item_id)
+            if label is None:
+                return False
+            index.remove_ids(np.array([label], dtype=np.int64))
+            _save(user_id, index, id_map)
+
+        logger.info("FAISS item removed — user=%s item=%s", user_id[:8], str(item_id)[:8])
         return True
 
     except Exception as exc:
-        logger.error("FAISS add_item failed — user=%s error=%s", user_id[:8], exc)
+        logger.error("FAISS remove_item failed — user=%s error=%s", user_id[:8], exc)
         return False
 
 
 def delete_index(user_id: str) -> bool:
     """
-    Delete persisted FAISS index for a user (e.g. after a wardrobe delete).
-    Next search will return [] and trigger a rebuild via the rebuild endpoint.
+    Delete the persisted FAISS index for a user entirely.
+    Next search will return [] until the index is rebuilt via the rebuild endpoint.
+    Single-item deletes should use remove_item() instead.
     """
+    if not index_exists(user_id):
+        _cache.invalidate(user_id)
+        return False
+
     removed = False
-    for path in (_index_path(user_id), _ids_path(user_id)):
-        if os.path.exists(path):
-            try:
-                os.remove(path)
-                removed = True
-            except Exception as exc:
-                logger.error("FAISS delete_index failed — user=%s path=%s error=%s", user_id[:8], path, exc)
+    with _user_lock(user_id):
+        _cache.invalidate(user_id)
+        for path in (_index_path(user_id), *_legacy_paths(user_id)):
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                    removed = True
+                except Exception as exc:
+                    logger.error("FAISS delete_index failed — user=%s path=%s error=%s", user_id[:8], path, exc)
     if removed:
         logger.info("FAISS index deleted — user=%s", user_id[:8])
     return removed
 
 
 def index_exists(user_id: str) -> bool:
-    """Return True if a valid index file exists for this user."""
-    return os.path.exists(_index_path(user_id)) and os.path.exists(_ids_path(user_id))
+    """Return True if a persisted index (current or legacy layout) exists for this user."""
+    if os.path.exists(_index_path(user_id)):
+        return True
+    return all(os.path.exists(p) for p in _legacy_paths(user_id))
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters and current size of the in-process index cache."""
+    return _cache.stats()
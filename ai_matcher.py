@@ -6,7 +6,8 @@ import logging
 import random
 import json
 import os
-from typing import Dict, Any, List, Tuple
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 from collections import defaultdict
 import numpy as np
 
@@ -15,82 +16,155 @@ logger = logging.getLogger(__name__)
 # ---------------------------------------------------------------------------
 # Embedding helpers — replaces random.uniform(85, 95) with real cosine sim
 # ---------------------------------------------------------------------------
-
-def _text_to_pseudo_embedding(item: Dict[str, Any]) -> np.ndarray:
-    """Convert item attributes to embedding vector for similarity comparison."""
-    COLOR_HUES = {
-        'Red': 0, 'Orange': 30, 'Yellow': 60, 'Green': 120, 'Teal': 180,
-        'Blue': 240, 'Purple': 270, 'Pink': 300, 'Brown': 20, 'Beige': 45,
-        'White': 0, 'Black': 0, 'Gray': 0, 'Navy': 240, 'Denim': 210,
-        'Cream': 60, 'Camel': 30, 'Olive': 80, 'Burgundy': 350, 'Rust': 15,
-        'Mint': 150, 'Lavender': 270, 'Sage': 100, 'Taupe': 30, 'Gold': 45,
-        'Silver': 0, 'Charcoal': 200, 'Rose': 330, 'Coral': 15, 'Mustard': 55,
-        'Blush': 340, 'Mauve': 310, 'Plum': 290, 'Emerald': 130, 'Terracotta': 20,
-    }
-    CATEGORY_VEC = {
-        'Top': [1,0,0,0,0,0,0,0], 'T-Shirt': [1,0,0,0,0,0,0,0],
-        'Blouse': [1,0,0,0,0,0,0,0], 'Shirt': [1,0,0,0,0,0,0,0],
-        'Sweater': [0.8,0,0,0,0,0,0.2,0], 'Tank': [1,0,0,0,0,0,0,0],
-        'Crop Top': [1,0,0,0,0,0,0,0],
-        'Bottom': [0,1,0,0,0,0,0,0], 'Trousers': [0,1,0,0,0,0,0,0],
-        'Jeans': [0,1,0,0,0,0,0,0], 'Skirt': [0,1,0,0,0,0,0,0],
-        'Shorts': [0,1,0,0,0,0,0,0], 'Pants': [0,1,0,0,0,0,0,0],
-        'Jacket': [0,0,1,0,0,0,0,0], 'Blazer': [0,0,1,0,0,0,0,0],
-        'Coat': [0,0,1,0,0,0,0,0], 'Cardigan': [0,0,0.7,0,0,0,0.3,0],
-        'Outerwear': [0,0,1,0,0,0,0,0],
-        'Dress': [0,0,0,1,0,0,0,0], 'Jumpsuit': [0,0,0,1,0,0,0,0],
-        'Romper': [0,0,0,1,0,0,0,0],
-        'Shoes': [0,0,0,0,1,0,0,0], 'Boots': [0,0,0,0,1,0,0,0],
-        'Sandals': [0,0,0,0,1,0,0,0], 'Sneakers': [0,0,0,0,1,0,0,0],
-        'Heels': [0,0,0,0,1,0,0,0],
-        'Bag': [0,0,0,0,0,1,0,0], 'Accessory': [0,0,0,0,0,1,0,0],
-        'Jewelry': [0,0,0,0,0,1,0,0], 'Hat': [0,0,0,0,0,1,0,0],
-        'Scarf': [0,0,0,0,0,1,0,0], 'Belt': [0,0,0,0,0,0.8,0,0.2],
-        'Necklace': [0,0,0,0,0,1,0,0], 'Ring': [0,0,0,0,0,1,0,0],
-        'Earrings': [0,0,0,0,0,1,0,0], 'Watch': [0,0,0,0,0,0.8,0,0.2],
-        'Suit': [0,0,0.5,0,0,0,0,0.5], 'Dress Pants': [0,1,0,0,0,0,0,0],
-    }
-    FABRIC_VEC = {
-        'Linen': [1,0,0,0], 'Cotton': [0.8,0.2,0,0], 'Silk': [0,1,0,0],
-        'Chiffon': [0,1,0,0], 'Jersey': [0.5,0.5,0,0], 'Wool': [0,0,1,0],
-        'Cashmere': [0,0,1,0], 'Tweed': [0,0,0.8,0.2], 'Fleece': [0,0,0.7,0.3],
-        'Velvet': [0,0.3,0.7,0], 'Denim': [0.5,0,0,0.5], 'Polyester': [0.3,0.3,0.3,0.1],
-        'Rayon': [0.5,0.5,0,0], 'Spandex': [0,0,0,1], 'Leather': [0,0,0,1],
-        'Metal': [0,0,0,1], 'Gold': [0,0,0,1], 'Silver': [0,0,0,1],
-        'Unknown': [0.25,0.25,0.25,0.25],
-    }
-    cat = item.get('category', 'Top')
-    color = item.get('color', 'Black')
-    fabric = item.get('fabric', 'Unknown')
-    name = item.get('name', '').lower()
-
-    cat_vec = CATEGORY_VEC.get(cat, [0.125]*8)
-    hue = COLOR_HUES.get(color, 0)
-    hue_rad = np.radians(hue)
-    is_neutral = 1.0 if color in ['Black','White','Gray','Beige','Cream','Taupe','Navy','Denim'] else 0.0
-    brightness = 1.0 if color in ['White','Cream','Yellow','Mint','Lavender'] else (0.0 if color in ['Black','Navy','Burgundy'] else 0.5)
-    color_vec = [
+# The pseudo-embedding is a 24-d concatenation of four one-hot-ish blocks:
+#   category (8) | color (8) | fabric (4) | style (4)
+# Every block depends on a single attribute, so each one is precomputed once
+# into a lookup table and an item embedding is just four row gathers + a norm.
+
+COLOR_HUES: Dict[str, float] = {
+    'Red': 0, 'Orange': 30, 'Yellow': 60, 'Green': 120, 'Teal': 180,
+    'Blue': 240, 'Purple': 270, 'Pink': 300, 'Brown': 20, 'Beige': 45,
+    'White': 0, 'Black': 0, 'Gray': 0, 'Navy': 240, 'Denim': 210,
+    'Cream': 60, 'Camel': 30, 'Olive': 80, 'Burgundy': 350, 'Rust': 15,
+    'Mint': 150, 'Lavender': 270, 'Sage': 100, 'Taupe': 30, 'Gold': 45,
+    'Silver': 0, 'Charcoal': 200, 'Rose': 330, 'Coral': 15, 'Mustard': 55,
+    'Blush': 340, 'Mauve': 310, 'Plum': 290, 'Emerald': 130, 'Terracotta': 20,
+}
+CATEGORY_VEC: Dict[str, List[float]] = {
+    'Top': [1,0,0,0,0,0,0,0], 'T-Shirt': [1,0,0,0,0,0,0,0],
+    'Blouse': [1,0,0,0,0,0,0,0], 'Shirt': [1,0,0,0,0,0,0,0],
+    'Sweater': [0.8,0,0,0,0,0,0.2,0], 'Tank': [1,0,0,0,0,0,0,0],
+    'Crop Top': [1,0,0,0,0,0,0,0],
+    'Bottom': [0,1,0,0,0,0,0,0], 'Trousers': [0,1,0,0,0,0,0,0],
+    'Jeans': [0,1,0,0,0,0,0,0], 'Skirt': [0,1,0,0,0,0,0,0],
+    'Shorts': [0,1,0,0,0,0,0,0], 'Pants': [0,1,0,0,0,0,0,0],
+    'Jacket': [0,0,1,0,0,0,0,0], 'Blazer': [0,0,1,0,0,0,0,0],
+    'Coat': [0,0,1,0,0,0,0,0], 'Cardigan': [0,0,0.7,0,0,0,0.3,0],
+    'Outerwear': [0,0,1,0,0,0,0,0],
+    'Dress': [0,0,0,1,0,0,0,0], 'Jumpsuit': [0,0,0,1,0,0,0,0],
+    'Romper': [0,0,0,1,0,0,0,0],
+    'Shoes': [0,0,0,0,1,0,0,0], 'Boots': [0,0,0,0,1,0,0,0],
+    'Sandals': [0,0,0,0,1,0,0,0], 'Sneakers': [0,0,0,0,1,0,0,0],
+    'Heels': [0,0,0,0,1,0,0,0],
+    'Bag': [0,0,0,0,0,1,0,0], 'Accessory': [0,0,0,0,0,1,0,0],
+    'Jewelry': [0,0,0,0,0,1,0,0], 'Hat': [0,0,0,0,0,1,0,0],
+    'Scarf': [0,0,0,0,0,1,0,0], 'Belt': [0,0,0,0,0,0.8,0,0.2],
+    'Necklace': [0,0,0,0,0,1,0,0], 'Ring': [0,0,0,0,0,1,0,0],
+    'Earrings': [0,0,0,0,0,1,0,0], 'Watch': [0,0,0,0,0,0.8,0,0.2],
+    'Suit': [0,0,0.5,0,0,0,0,0.5], 'Dress Pants': [0,1,0,0,0,0,0,0],
+}
+FABRIC_VEC: Dict[str, List[float]] = {
+    'Linen': [1,0,0,0], 'Cotton': [0.8,0.2,0,0], 'Silk': [0,1,0,0],
+    'Chiffon': [0,1,0,0], 'Jersey': [0.5,0.5,0,0], 'Wool': [0,0,1,0],
+    'Cashmere': [0,0,1,0], 'Tweed': [0,0,0.8,0.2], 'Fleece': [0,0,0.7,0.3],
+    'Velvet': [0,0.3,0.7,0], 'Denim': [0.5,0,0,0.5], 'Polyester': [0.3,0.3,0.3,0.1],
+    'Rayon': [0.5,0.5,0,0], 'Spandex': [0,0,0,1], 'Leather': [0,0,0,1],
+    'Metal': [0,0,0,1], 'Gold': [0,0,0,1], 'Silver': [0,0,0,1],
+    'Unknown': [0.25,0.25,0.25,0.25],
+}
+STYLE_KEYWORDS: Dict[int, List[str]] = {
+    0: ['casual','tee','jeans','sneaker','cotton','basic'],
+    1: ['formal','suit','blazer','silk','tailored'],
+    2: ['boho','flowy','embroid','fringe','maxi','linen'],
+    3: ['street','hoodie','oversized','graphic','cargo'],
+}
+_NEUTRAL_COLORS = {'Black','White','Gray','Beige','Cream','Taupe','Navy','Denim'}
+_LIGHT_COLORS = {'White','Cream','Yellow','Mint','Lavender'}
+_DARK_COLORS = {'Black','Navy','Burgundy'}
+
+EMBEDDING_DIM = 24
+_ENCODER_CACHE_SIZE = int(os.getenv("MATCHER_ENCODER_CACHE_SIZE", "4096"))
+
+
+def _color_block(color: Any) -> List[float]:
+    hue_rad = np.radians(COLOR_HUES.get(color, 0))
+    is_neutral = 1.0 if color in _NEUTRAL_COLORS else 0.0
+    brightness = 1.0 if color in _LIGHT_COLORS else (0.0 if color in _DARK_COLORS else 0.5)
+    return [
         float(np.sin(hue_rad)), float(np.cos(hue_rad)),
         float(np.sin(hue_rad * 0.5)), float(np.cos(hue_rad * 0.5)),
         is_neutral, 1.0 - is_neutral, brightness, 1.0 - brightness
     ]
-    fab_vec = FABRIC_VEC.get(fabric, FABRIC_VEC['Unknown'])
-    style_keywords = {
-        0: ['casual','tee','jeans','sneaker','cotton','basic'],
-        1: ['formal','suit','blazer','silk','tailored'],
-        2: ['boho','flowy','embroid','fringe','maxi','linen'],
-        3: ['street','hoodie','oversized','graphic','cargo'],
-    }
-    style_vec = [0.25, 0.25, 0.25, 0.25]
-    for i, kws in style_keywords.items():
+
+
+def _build_table(rows: Dict[Any, List[float]], default: List[float]) -> Tuple[Dict[Any, int], np.ndarray]:
+    """Stack a {key: vector} dict into (key -> row, matrix); the last row is the default."""
+    keys = list(rows)
+    table = np.array([rows[k] for k in keys] + [default], dtype=np.float32)
+    return {k: i for i, k in enumerate(keys)}, table
+
+
+_CAT_ROW, _CAT_TABLE = _build_table(CATEGORY_VEC, [0.125] * 8)
+_COLOR_ROW, _COLOR_TABLE = _build_table(
+    {c: _color_block(c) for c in COLOR_HUES}, _color_block(None)
+)
+_FABRIC_ROW, _FABRIC_TABLE = _build_table(FABRIC_VEC, FABRIC_VEC['Unknown'])
+# Style rows 0-3 are the keyword buckets; the last row means "no keyword matched"
+_STYLE_TABLE = np.vstack([np.eye(4, dtype=np.float32), np.full((1, 4), 0.25, dtype=np.float32)])
+_NO_STYLE = len(STYLE_KEYWORDS)
+
+
+def _style_bucket(name: str) -> int:
+    for i, kws in STYLE_KEYWORDS.items():
         if any(kw in name for kw in kws):
-            style_vec = [0.0]*4
-            style_vec[i] = 1.0
-            break
+            return i
+    return _NO_STYLE
+
+
+def _item_key(item: Dict[str, Any]) -> Tuple[Any, Any, Any, int]:
+    """Reduce an item to the attributes its embedding depends on."""
+    name = (item.get('name', '') or '').lower()
+    return (
+        item.get('category', 'Top'),
+        item.get('color', 'Black'),
+        item.get('fabric', 'Unknown'),
+        _style_bucket(name),
+    )
+
+
+def _assemble(cat_rows: np.ndarray, color_rows: np.ndarray,
+              fabric_rows: np.ndarray, style_rows: np.ndarray) -> np.ndarray:
+    """Gather table rows into an (n, 24) matrix of L2-normalised embeddings."""
+    mat = np.concatenate([
+        _CAT_TABLE[cat_rows], _COLOR_TABLE[color_rows],
+        _FABRIC_TABLE[fabric_rows], _STYLE_TABLE[style_rows],
+    ], axis=1)
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    np.divide(mat, norms, out=mat, where=norms > 0)
+    return mat
+
+
+def _rows_for(keys: List[Tuple[Any, Any, Any, int]]) -> Tuple[np.ndarray, ...]:
+    cat_default, color_default, fabric_default = len(_CAT_ROW), len(_COLOR_ROW), len(_FABRIC_ROW)
+    return (
+        np.fromiter((_CAT_ROW.get(k[0], cat_default) for k in keys), dtype=np.intp, count=len(keys)),
+        np.fromiter((_COLOR_ROW.get(k[1], color_default) for k in keys), dtype=np.intp, count=len(keys)),
+        np.fromiter((_FABRIC_ROW.get(k[2], fabric_default) for k in keys), dtype=np.intp, count=len(keys)),
+        np.fromiter((k[3] for k in keys), dtype=np.intp, count=len(keys)),
+    )
+
+
+@lru_cache(maxsize=_ENCODER_CACHE_SIZE)
+def _encode_key(category: Any, color: Any, fabric: Any, style_bucket: int) -> np.ndarray:
+    vec = _assemble(*_rows_for([(category, color, fabric, style_bucket)]))[0]
+    vec.flags.writeable = False  # shared across callers via the memo cache
+    return vec
+
+
+def _text_to_pseudo_embedding(item: Dict[str, Any]) -> np.ndarray:
+    """Convert item attributes to embedding vector for similarity comparison."""
+    return _encode_key(*_item_key(item))
 
-    vec = np.array(cat_vec + color_vec + fab_vec + style_vec, dtype=np.float32)
-    norm = np.linalg.norm(vec)
-    return vec / norm if norm > 0 else vec
+
+def encode_items(items: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Embed a whole wardrobe in one vectorized pass.
+    Returns an (n, EMBEDDING_DIM) float32 matrix whose rows match
+    _text_to_pseudo_embedding(item) for each item, in order.
+    """
+    if not items:
+        return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+    return _assemble(*_rows_for([_item_key(it) for it in items]))
 
 
 def cosine_similarity(v1: np.ndarray, v2: np.ndarray) -> float:
@@ -103,6 +177,61 @@ def cosine_similarity(v1: np.ndarray, v2: np.ndarray) -> float:
     return max(0.0, min(1.0, dot / (n1 * n2)))
 
 
+# Category groups for the pairing bonus; anything else falls in the trailing "other" group
+_PAIR_GROUPS: Dict[str, set] = {
+    'tops': {'Top','T-Shirt','Blouse','Shirt','Sweater','Tank','Crop Top'},
+    'bottoms': {'Bottom','Trousers','Jeans','Skirt','Shorts','Pants'},
+    'outerwear': {'Jacket','Blazer','Coat','Cardigan','Outerwear'},
+    'dresses': {'Dress','Jumpsuit','Romper'},
+    'shoes': {'Shoes','Boots','Sandals','Sneakers','Heels'},
+    'accessories': {'Bag','Accessory','Jewelry','Hat','Scarf','Belt','Necklace','Ring','Earrings','Watch'},
+}
+_PAIR_GROUP_NAMES = list(_PAIR_GROUPS) + ['other']
+_PAIR_GROUP_OF = {cat: i for i, cats in enumerate(_PAIR_GROUPS.values()) for cat in cats}
+_OTHER_GROUP = len(_PAIR_GROUPS)
+
+
+def _pair_bonus(g1: str, g2: str) -> float:
+    pair = {g1, g2}
+    if pair == {'tops', 'bottoms'}:
+        return 0.35
+    if pair == {'dresses', 'outerwear'}:
+        return 0.28
+    if 'shoes' in pair and g1 != g2:
+        return 0.20
+    if 'accessories' in pair and g1 != g2:
+        return 0.15
+    return 0.0
+
+
+_BONUS_TABLE = np.array(
+    [[_pair_bonus(a, b) for b in _PAIR_GROUP_NAMES] for a in _PAIR_GROUP_NAMES], dtype=np.float64
+)
+
+
+def _category_groups(items: List[Dict[str, Any]]) -> np.ndarray:
+    """Map each item to its row in _BONUS_TABLE."""
+    return np.fromiter(
+        (_PAIR_GROUP_OF.get(it.get('category', ''), _OTHER_GROUP) for it in items),
+        dtype=np.intp, count=len(items),
+    )
+
+
+def _score_block(emb_a: np.ndarray, groups_a: np.ndarray,
+                 emb_b: np.ndarray, groups_b: np.ndarray) -> np.ndarray:
+    """Similarity scores (0-100) between every row of a and every row of b."""
+    raw = (emb_a @ emb_b.T).astype(np.float64)
+    norms = np.outer(np.linalg.norm(emb_a, axis=1).astype(np.float64),
+                     np.linalg.norm(emb_b, axis=1).astype(np.float64))
+    np.divide(raw, norms, out=raw, where=norms > 0)
+    np.clip(raw, 0.0, 1.0, out=raw)
+    raw *= 0.55
+    raw += _BONUS_TABLE.take(groups_a, axis=0).take(groups_b, axis=1) * 0.45
+    raw *= 49
+    raw += 50
+    return np.round(raw, 1, out=raw)
+
+
 def compute_similarity_score(item1: Dict[str, Any], item2: Dict[str, Any]) -> float:
     """
     Compute real similarity score between two items (0-100 scale).
@@ -111,30 +240,51 @@ def compute_similarity_score(item1: Dict[str, Any], item2: Dict[str, Any]) -> fl
     e1 = _text_to_pseudo_embedding(item1)
     e2 = _text_to_pseudo_embedding(item2)
     raw = cosine_similarity(e1, e2)
-
-    TOPS = {'Top','T-Shirt','Blouse','Shirt','Sweater','Tank','Crop Top'}
-    BOTTOMS = {'Bottom','Trousers','Jeans','Skirt','Shorts','Pants'}
-    OUTERWEAR = {'Jacket','Blazer','Coat','Cardigan','Outerwear'}
-    DRESSES = {'Dress','Jumpsuit','Romper'}
-    SHOES = {'Shoes','Boots','Sandals','Sneakers','Heels'}
-    ACCESSORIES = {'Bag','Accessory','Jewelry','Hat','Scarf','Belt','Necklace','Ring','Earrings','Watch'}
-
-    cat1 = item1.get('category', '')
-    cat2 = item2.get('category', '')
-    bonus = 0.0
-    if (cat1 in TOPS and cat2 in BOTTOMS) or (cat2 in TOPS and cat1 in BOTTOMS):
-        bonus = 0.35
-    elif (cat1 in DRESSES and cat2 in OUTERWEAR) or (cat2 in DRESSES and cat1 in OUTERWEAR):
-        bonus = 0.28
-    elif (cat1 in SHOES and cat2 not in SHOES) or (cat2 in SHOES and cat1 not in SHOES):
-        bonus = 0.20
-    elif (cat1 in ACCESSORIES and cat2 not in ACCESSORIES) or (cat2 in ACCESSORIES and cat1 not in ACCESSORIES):
-        bonus = 0.15
-
-    combined = raw * 0.55 + bonus * 0.45
+    bonus = _BONUS_TABLE[
+        _PAIR_GROUP_OF.get(item1.get('category', ''), _OTHER_GROUP),
+        _PAIR_GROUP_OF.get(item2.get('category', ''), _OTHER_GROUP),
+    ]
+    combined = raw * 0.55 + float(bonus) * 0.45
     return round(50 + combined * 49, 1)
 
 
+_WARDROBE_CACHE_SIZE = int(os.getenv("MATCHER_WARDROBE_CACHE_SIZE", "64"))
+
+
+def _wardrobe_fingerprint(items: List[Dict[str, Any]]) -> Tuple[Tuple[Any, ...], ...]:
+    return tuple(
+        (it.get('category', 'Top'), it.get('color', 'Black'), it.get('fabric', 'Unknown'), it.get('name', ''))
+        for it in items
+    )
+
+
+@lru_cache(maxsize=_WARDROBE_CACHE_SIZE)
+def _encode_fingerprint(fingerprint: Tuple[Tuple[Any, ...], ...]) -> Tuple[np.ndarray, np.ndarray]:
+    items = [{'category': c, 'color': col, 'fabric': f, 'name': n} for c, col, f, n in fingerprint]
+    emb, groups = encode_items(items), _category_groups(items)
+    emb.flags.writeable = False  # shared across callers via the memo cache
+    groups.flags.writeable = False
+    return emb, groups
+
+
+def wardrobe_matrix(items: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Embeddings and bonus-table category groups for a wardrobe, memoized on the
+    attributes they depend on so repeat requests over an unchanged wardrobe skip
+    re-encoding. Both arrays are read-only.
+    """
+    return _encode_fingerprint(_wardrobe_fingerprint(items))
+
+
+def compatibility_matrix(items: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Pairwise compute_similarity_score for a whole item list in one pass.
+    Returns an (n, n) float64 matrix; entry [i, j] scores items[i] with items[j].
+    """
+    emb, groups = wardrobe_matrix(items)
+    return _score_block(emb, groups, emb, groups)
+
+
 def _load_color_harmony() -> Dict[str, Any]:
     """Load color harmony rules from JSON file."""
     path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'color_harmony.json')
@@ -281,17 +431,38 @@ class AdvancedFashionMatcher:
             'breakdown': {'color': color_score, 'category': category_score, 'fabric': fabric_score, 'style': style_score}
         }
 
-    def rank_closet_matches(self, inspiration_item: Dict[str, Any], wardrobe: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def rank_closet_matches(self, inspiration_item: Dict[str, Any], wardrobe: List[Dict[str, Any]],
+                            top_k: Optional[int] = None,
+                            embeddings: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
         """
         Rank all wardrobe items by actual cosine similarity to inspiration_item.
         Replaces random.uniform(85, 95) with real similarity scores.
+        With top_k, only the best top_k items are selected (partial sort, O(n))
+        and copied into result dicts. `embeddings` (one row per wardrobe item, e.g.
+        stored vectors from the DB) skips re-encoding the wardrobe.
         """
-        scored = []
-        for item in wardrobe:
-            score = compute_similarity_score(inspiration_item, item)
-            scored.append({**item, 'match_score': round(score, 1)})
-        scored.sort(key=lambda x: x['match_score'], reverse=True)
-        return scored
+        if not wardrobe:
+            return []
+        if embeddings is None:
+            emb, groups = wardrobe_matrix(wardrobe)
+        else:
+            emb, groups = embeddings, _category_groups(wardrobe)
+        scores = _score_block(
+            _text_to_pseudo_embedding(inspiration_item)[None, :], _category_groups([inspiration_item]),
+            emb, groups,
+        )[0]
+        if top_k is None or top_k >= len(wardrobe):
+            order = np.argsort(-scores, kind='stable')
+        elif top_k <= 0:
+            return []
+        else:
+            kth = -np.partition(-scores, top_k - 1)[top_k - 1]
+            above = np.flatnonzero(scores > kth)
+            # Ties at the cut-off go to the earliest items, matching the stable full sort
+            tied = np.flatnonzero(scores == kth)[:top_k - len(above)]
+            winners = np.concatenate([above, tied])
+            order = winners[np.lexsort((winners, -scores[winners]))]
+        return [{**wardrobe[i], 'match_score': float(scores[i])} for i in order]
 
     def create_complete_outfit(self, items: List[Dict[str, Any]], style: str = "casual", occasion: str = "daytime") -> Dict[str, Any]:
         """
@@ -300,43 +471,45 @@ class AdvancedFashionMatcher:
         """
         if len(items) < 2:
             return {}
+        compat = compatibility_matrix(items)
         categorized = defaultdict(list)
-        for item in items:
+        for idx, item in enumerate(items):
             cat = item.get('category', 'Unknown')
             for gname, gcats in self.category_groups.items():
                 if cat in gcats:
-                    categorized[gname].append(item)
+                    categorized[gname].append(idx)
                     break
             else:
-                categorized['other'].append(item)
+                categorized['other'].append(idx)
 
         # Pick seed item (most worn or random from tops/bottoms)
-        seed_pool = categorized.get('tops', []) + categorized.get('bottoms', []) or items
-        seed = max(seed_pool, key=lambda x: x.get('wear_count', 0))
+        seed_pool = categorized.get('tops', []) + categorized.get('bottoms', []) or list(range(len(items)))
+        seed_idx = max(seed_pool, key=lambda i: items[i].get('wear_count', 0))
+        seed = items[seed_idx]
 
         def best(pool):
             if not pool:
                 return None
-            return max(pool, key=lambda x: compute_similarity_score(seed, x))
+            return pool[int(np.argmax(compat[seed_idx, pool]))]
 
-        selected = [seed]
+        selected = [seed_idx]
         partner = best(categorized.get('bottoms' if seed.get('category') in self.category_groups['tops'] else 'tops', []))
-        if not partner and seed.get('category') in self.category_groups['dresses']:
+        if partner is None and seed.get('category') in self.category_groups['dresses']:
             partner = best(categorized.get('outerwear', []))
-        if partner:
+        if partner is not None:
             selected.append(partner)
         
         shoes = best(categorized.get('shoes', []))
-        if shoes:
+        if shoes is not None:
             selected.append(shoes)
         if random.random() > 0.3:
             acc = best(categorized.get('accessories', []))
-            if acc:
+            if acc is not None:
                 selected.append(acc)
 
         # Determine harmony type for badge
         seed_color = seed.get('color', 'Black')
-        partner_color = (partner or seed).get('color', seed_color)
+        partner_color = items[partner if partner is not None else seed_idx].get('color', seed_color)
         harmonize, h_type = _colors_harmonize(seed_color, partner_color)
         vibe = h_type.replace('_', ' ').title() if harmonize and h_type != 'none' else style.capitalize()
         
@@ -346,15 +519,16 @@ class AdvancedFashionMatcher:
             f"The {seed_color} Moment"
         ])
 
-        # Calculate average compatibility score
-        scores = [compute_similarity_score(selected[i], selected[j]) 
-                  for i in range(len(selected)) for j in range(i+1, len(selected))]
-        avg = sum(scores)/len(scores) if scores else 75.0
+        # Calculate average compatibility score over the outfit's item pairs
+        rows, cols = np.triu_indices(len(selected), k=1)
+        scores = compat[np.asarray(selected)[rows], np.asarray(selected)[cols]]
+        avg = float(scores.mean()) if scores.size else 75.0
+        selected = [items[i] for i in selected]
 
         return {
             'name': outfit_name,
             'vibe': vibe,
-            'item_ids': [it['id'] for it in selected],
+            'item_ids': [it.get('id', it.get('item_id')) for it in selected],
             'items': selected,
             'compatibility_score': round(avg, 1),
             'styling_tips': self._generate_styling_tips(selected, style, occasion),
@@ -442,8 +616,9 @@ class AdvancedFashionMatcher:
         if not wardrobe:
             return 0.0
         p_emb = _text_to_pseudo_embedding(prototype)
-        sims = [cosine_similarity(p_emb, _text_to_pseudo_embedding(w)) for w in wardrobe]
-        return max(sims)
+        # Rows are unit-norm, so one matrix-vector product gives every cosine
+        sims = encode_items(wardrobe) @ p_emb
+        return float(np.clip(sims, 0.0, 1.0).max())
 
     def analyze_wardrobe_gaps(self, wardrobe: List[Dict[str, Any]], style_dna: List[str] = None) -> Dict[str, Any]:
         """
@@ -1,17 +1,21 @@
 # ai_model.py - Thin orchestrator for all AI features
 # Delegates to specialized services for similarity matching, outfit generation, gap analysis, etc.
 
+import base64
 import json
 import logging
 import random
 from datetime import datetime, timedelta
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Union
 
 import numpy as np
 
+import scan_cache
+from executors import ExecutorSaturated, WorkerError, run_cpu
+from services import vision_workers
 from services.brand_auditor import audit_brand
 from services.color_matcher import ColorMatcher
-from services.computer_vision import LocalComputerVision
+from services.computer_vision import CV_WORKING_SIZE, AnalysisContext, LocalComputerVision
 from services.data_loader import COLOR_HARMONY, FASHION_DATA
 from services.fabric_classifier import FabricClassifier
 from services.style_profile import StyleProfile
@@ -112,27 +116,58 @@ class FashionAIModel:
     # ------------------------------------------------------------------
 
     @staticmethod
-    async def autotag_garment(image_data: str) -> Dict[str, Any]:
-        """Decode → mask → colour → category → fabric → pattern → smart name → tags."""
+    async def autotag_garment(image_data: str, include_embedding: bool = False) -> Dict[str, Any]:
+        """
+        Decode → mask → colour → category → fabric → pattern → smart name → tags.
+        With include_embedding, the result also carries the garment's image
+        embedding ("image_embedding", a list of floats) for the caller to persist.
+        """
         try:
-            if not image_data or not isinstance(image_data, str):
-                raise ValueError("Invalid image_data: must be non-empty string")
+            data = vision_workers.image_bytes(image_data)
+        except ValueError as exc:
+            return FashionAIModel._autotag_failure(exc)
+        # Rescans and outfit-match variations of the same photo (or a re-encoded copy) reuse the tags
+        return await scan_cache.cached(
+            "autotag", data, lambda: FashionAIModel._autotag_uncached(data, include_embedding),
+            near_duplicates=True,
+            usable=lambda hit: not include_embedding or "image_embedding" in hit,
+        )
+
+    @staticmethod
+    async def _autotag_uncached(data: bytes, include_embedding: bool) -> Dict[str, Any]:
+        if vision_workers.ENABLED:
+            try:
+                return await vision_workers.autotag(data, include_embedding)
+            except (ValueError, WorkerError) as exc:
+                return FashionAIModel._autotag_failure(exc)
+        return await run_cpu(FashionAIModel._autotag_sync, data, include_embedding)
 
-            img = FashionAIModel.vision.decode_image(image_data)
+    @staticmethod
+    def _autotag_sync(image_data: Union[str, bytes, np.ndarray], include_embedding: bool = False) -> Dict[str, Any]:
+        """Autotag a base64 image, its raw bytes, or an already-decoded BGR array (vision worker processes)."""
+        try:
+            # Analysis runs at working size (CV_WORKING_SIZE), decoded downscale-first
+            if isinstance(image_data, np.ndarray):
+                img = FashionAIModel.vision.to_working_size(image_data)
+            elif isinstance(image_data, bytes):
+                img = FashionAIModel.vision.decode_image_bytes(image_data, CV_WORKING_SIZE)
+            elif not image_data or not isinstance(image_data, str):
+                raise ValueError("Invalid image_data: must be non-empty string")
+            else:
+                img = FashionAIModel.vision.decode_image(image_data, CV_WORKING_SIZE)
             if img is None or img.size == 0 or np.all(img == 0):
                 raise ValueError("Failed to decode image or image is empty")
 
             mask = FashionAIModel.vision.get_improved_mask(img)
             mask_coverage = np.sum(mask > 0) / (img.shape[0] * img.shape[1]) * 100
 
-            category = FashionAIModel.vision.identify_garment(img, mask)
-            hex_color, color_name, rgb = FashionAIModel.vision.get_dominant_color(img, mask)
-
-            # Secondary color (set as side-effect during get_dominant_color)
-            secondary_color: str = getattr(FashionAIModel.vision, "_last_secondary_color", None) or ""
-
-            # Shoe sub-type (set as side-effect during identify_garment)
-            shoe_subtype: str = getattr(FashionAIModel.vision, "_last_shoe_subtype", "Shoes")
+            # One context per scan: the CLIP image embedding is computed once and
+            # shared by classification, shoe sub-typing and the returned embedding
+            ctx = AnalysisContext()
+            category = FashionAIModel.vision.identify_garment(img, mask, ctx)
+            hex_color, color_name, rgb = FashionAIModel.vision.get_dominant_color(img, mask, ctx)
+            secondary_color: str = ctx.secondary_color or ""
+            shoe_subtype: str = ctx.shoe_subtype
 
             texture = FashionAIModel.vision.analyze_texture_properties(img, mask)
 
@@ -195,7 +230,7 @@ class FashionAIModel:
 
             name = " ".join(name_parts)
 
-            return {
+            result = {
                 "success": True,
                 "name": name,
                 "category": str(category),
@@ -216,14 +251,22 @@ class FashionAIModel:
                 "brightness": float(round(texture["brightness"], 2)),
                 "mask_coverage": float(round(mask_coverage, 2)),
             }
+            if include_embedding:
+                embedding = FashionAIModel.vision.get_image_embedding(img, ctx)
+                result["image_embedding"] = [round(float(x), 6) for x in embedding]
+            return result
 
         except Exception as exc:
-            logger.error("Autotag error: %s", exc)
-            return {
-                "success": False, "error": str(exc),
-                "name": "Cotton Item", "category": "Top", "fabric": "Cotton",
-                "color": "Gray", "hex_color": "#808080", "rgb": [128, 128, 128], "confidence": 0.0,
-            }
+            return FashionAIModel._autotag_failure(exc)
+
+    @staticmethod
+    def _autotag_failure(exc: Exception) -> Dict[str, Any]:
+        logger.error("Autotag error: %s", exc)
+        return {
+            "success": False, "error": str(exc),
+            "name": "Cotton Item", "category": "Top", "fabric": "Cotton",
+            "color": "Gray", "hex_color": "#808080", "rgb": [128, 128, 128], "confidence": 0.0,
+        }
 
     # ------------------------------------------------------------------
     # Outfit suggestions with similarity matching (Feature 1)
@@ -290,6 +333,8 @@ class FashionAIModel:
                 "silhouette": silhouette,
             }
 
+        except ExecutorSaturated:
+            raise
         except Exception as exc:
             logger.error("Suggestion failed: %s", exc)
             return {
@@ -378,11 +423,11 @@ class FashionAIModel:
     # ------------------------------------------------------------------
 
     @staticmethod
-    async def generate_outfits_from_wardrobe(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    async def generate_outfits_from_wardrobe(items: List[Dict[str, Any]], count: int = 3) -> List[Dict[str, Any]]:
         """Generate outfits using color harmony (Feature 2)."""
         if not fashion_matcher:
             return []
-        return FashionAIModel.outfit_generator.generate_outfits_from_wardrobe(items)
+        return await run_cpu(FashionAIModel.outfit_generator.generate_outfits_from_wardrobe, items, count=count)
 
     @staticmethod
     async def get_gap_analysis(user_id: str, wardrobe_items: List[Dict[str, Any]], db_conn) -> Dict[str, Any]:
@@ -451,19 +496,50 @@ class FashionAIModel:
     # ------------------------------------------------------------------
 
     @staticmethod
-    async def remove_background(image_data: str) -> Dict[str, Any]:
-        """Remove background from garment image."""
+    async def remove_background(image_data: str, alpha_matting: bool = False) -> Dict[str, Any]:
+        """Remove background from garment image. Alpha matting (finer edges, slower) only on request."""
+        try:
+            data = vision_workers.image_bytes(image_data)
+        except ValueError as exc:
+            logger.error(f"Background removal failed: {exc}")
+            return {"success": False, "error": str(exc), "bg_removed_image": None}
+        # Exact repeats only: a near-duplicate photo needs its own cut-out
+        return await scan_cache.cached(
+            "remove_bg_matted" if alpha_matting else "remove_bg", data,
+            lambda: FashionAIModel._remove_background_uncached(data, alpha_matting),
+        )
+
+    @staticmethod
+    async def _remove_background_uncached(data: bytes, alpha_matting: bool = False) -> Dict[str, Any]:
+        if vision_workers.ENABLED:
+            try:
+                png = await vision_workers.remove_background(data, alpha_matting)
+                if not png:
+                    raise ValueError("Failed to encode result image")
+            except (ValueError, WorkerError) as exc:
+                logger.error(f"Background removal failed: {exc}")
+                return {"success": False, "error": str(exc), "bg_removed_image": None}
+            return {
+                "success": True,
+                "bg_removed_image": base64.b64encode(png).decode("utf-8"),
+                "message": "Background removed successfully"
+            }
+        return await run_cpu(FashionAIModel._remove_background_sync, data, alpha_matting)
+
+    @staticmethod
+    def _remove_background_sync(data: bytes, alpha_matting: bool = False) -> Dict[str, Any]:
         try:
-            img = FashionAIModel.vision.decode_image(image_data)
+            img = FashionAIModel.vision.decode_image_bytes(data)
             if img is None or img.size == 0:
                 raise ValueError("Failed to decode image")
 
-            result = FashionAIModel.vision.remove_background(img)
-            result_base64 = FashionAIModel.vision.encode_image_to_base64(result)
+            png = FashionAIModel.vision.remove_background_png(img, alpha_matting)
+            if not png:
+                raise ValueError("Failed to encode result image")
 
             return {
                 "success": True,
-                "bg_removed_image": result_base64,
+                "bg_removed_image": base64.b64encode(png).decode("utf-8"),
                 "message": "Background removed successfully"
             }
         except Exception as exc:
@@ -13,6 +13,7 @@ from pydantic import BaseModel
 from typing import Optional
 
 from database import get_db
+from executors import run_io
 
 logger = logging.getLogger(__name__)
 
@@ -96,6 +97,16 @@ def create_access_token(user_id: str) -> str:
 
 # ── Token verification & user resolution ─────────────────────────────────────
 
+def _load_user(user_id: str):
+    conn = get_db()
+    try:
+        return conn.execute(
+            "SELECT * FROM users WHERE user_id = ?", (user_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserProfile:
     credentials_error = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -115,14 +126,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserProfile:
         logger.warning("JWT decode failed: %s", exc)
         raise credentials_error
 
-    conn = get_db()
-    try:
-        row = conn.execute(
-            "SELECT * FROM users WHERE user_id = ?", (user_id,)
-        ).fetchone()
-    finally:
-        conn.close()
-
+    row = await run_io(_load_user, user_id)
     if not row:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
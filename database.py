@@ -1,16 +1,243 @@
 import sqlite3
 import logging
 import os
+import struct
+import threading
+import time
+import weakref
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# ---------------------------------------------------------------------------
+# Connection pool
+# ---------------------------------------------------------------------------
+#
+# get_db() hands out pooled connections; conn.close() returns them to the pool
+# instead of closing the file, so existing `conn = get_db() ... conn.close()`
+# call sites keep working unchanged. Each thread gets back the connection it
+# used last when one is idle. Up to DB_POOL_SIZE connections per database file
+# are kept open between requests; bursts may open DB_POOL_OVERFLOW more, which
+# are closed on release. Past that, callers wait up to DB_POOL_TIMEOUT seconds.
+# A checked-out connection that is never closed gives its slot back when it is
+# garbage-collected, so a leak elsewhere can't drain the pool for good.
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+POOL_OVERFLOW = int(os.getenv("DB_POOL_OVERFLOW", "8"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Idle connections older than this are pinged before being handed out again
+HEALTH_CHECK_AFTER = float(os.getenv("DB_HEALTH_CHECK_AFTER", "30"))
+
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() checks it back into its pool."""
+
+    _pool: Optional["ConnectionPool"] = None
+    _owner: Optional[int] = None
+    _last_used: float = 0.0
+    _lease: Optional[List[bool]] = None  # [checked out?], shared with the pool's finalizer
+
+    @property
+    def _checked_out(self) -> bool:
+        return bool(self._lease and self._lease[0])
+
+    @_checked_out.setter
+    def _checked_out(self, value: bool) -> None:
+        self._lease[0] = value
+
+    def close(self) -> None:
+        if self._pool is not None and self._checked_out:
+            self._pool.release(self)
+        elif self._pool is None:
+            super().close()
+
+    def _discard(self) -> None:
+        self._pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections to one database file."""
+
+    def __init__(self, path: str, max_size: int = POOL_SIZE, max_overflow: int = POOL_OVERFLOW,
+                 timeout: float = POOL_TIMEOUT):
+        self.path = path
+        self.max_size = max(1, max_size)
+        self.max_overflow = max(0, max_overflow)
+        self.timeout = timeout
+        self._idle: List[PooledConnection] = []
+        self._open = 0
+        self._cond = threading.Condition()
+        self.created = self.reused = self.discarded = self.waits = self.leaked = 0
+
+    def _connect(self) -> PooledConnection:
+        conn = sqlite3.connect(
+            self.path, check_same_thread=False, factory=PooledConnection,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size={-CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn._pool = self
+        conn._lease = [False]
+        # Must not reference conn itself, or it would never be collected
+        weakref.finalize(conn, self._reclaim, conn._lease)
+        return conn
+
+    def _reclaim(self, lease: List[bool]) -> None:
+        """Finalizer: a connection was garbage-collected while still checked out."""
+        if not lease[0]:
+            return
+        lease[0] = False
+        with self._cond:
+            self._open -= 1
+            self.leaked += 1
+            self._cond.notify()
+        logger.warning("Pooled connection to %s was never closed; its slot has been reclaimed", self.path)
+
+    @staticmethod
+    def _healthy(conn: PooledConnection) -> bool:
+        if time.monotonic() - conn._last_used < HEALTH_CHECK_AFTER:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _take_idle(self) -> Optional[PooledConnection]:
+        me = threading.get_ident()
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._idle[i]._owner == me:
+                return self._idle.pop(i)
+        return self._idle.pop() if self._idle else None
+
+    def acquire(self) -> PooledConnection:
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                conn = self._take_idle()
+                if conn is not None:
+                    if self._healthy(conn):
+                        self.reused += 1
+                        break
+                    self._open -= 1
+                    self.discarded += 1
+                    conn._discard()
+                    continue
+                if self._open < self.max_size + self.max_overflow:
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(
+                        f"database connection pool exhausted ({self._open} in use)"
+                    )
+                self.waits += 1
+                self._cond.wait(remaining)
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            self.created += 1
+        conn._owner = threading.get_ident()
+        conn._checked_out = True
+        return conn
+
+    def release(self, conn: PooledConnection) -> None:
+        conn._checked_out = False
+        healthy = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()  # same as closing a plain connection with uncommitted work
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            healthy = False
+        with self._cond:
+            if healthy and len(self._idle) < self.max_size:
+                conn._last_used = time.monotonic()
+                self._idle.append(conn)
+            else:
+                self._open -= 1
+                self.discarded += 1
+                conn._discard()
+            self._cond.notify()
+
+    def close_all(self) -> None:
+        with self._cond:
+            for conn in self._idle:
+                conn._discard()
+            self._open -= len(self._idle)
+            self._idle.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "name": os.path.basename(self.path),  # not the full path: /health/info is public
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+                "max_size": self.max_size,
+                "max_overflow": self.max_overflow,
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded,
+                "waits": self.waits,
+                "leaked": self.leaked,
+            }
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_for(path: str) -> ConnectionPool:
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                pool = _pools[path] = ConnectionPool(path)
+    return pool
+
+
 def get_db():
     DB_PATH = os.getenv('DB_PATH', '/app/data/wya.db')
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return _pool_for(DB_PATH).acquire()
+
+
+def get_db_at(path: str):
+    """Pooled connection to another SQLite file (local caches), tracked by pool_stats()/close_pools()."""
+    return _pool_for(path).acquire()
+
+
+def close_pools() -> None:
+    """Close every idle pooled connection (app shutdown)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+
+
+def pool_stats() -> List[Dict[str, Any]]:
+    with _pools_lock:
+        return [pool.stats() for pool in _pools.values()]
 
 def init_db():
     conn = get_db()
@@ -153,28 +380,232 @@ def init_db():
         FOREIGN KEY (user_id) REFERENCES users (user_id))''')
     
     conn.commit()
+    _run_migrations(conn)
+    check_query_plans(conn)
     conn.close()
     logger.info("Database initialization and migration check complete.")
 
 
+# ---------------------------------------------------------------------------
+# Versioned migrations — tracked in PRAGMA user_version
+# ---------------------------------------------------------------------------
+
+def _migrate_json_embeddings(cursor) -> None:
+    """Rewrite embeddings stored as JSON text (pre-BLOB format) as versioned float32 BLOBs."""
+    rows = cursor.execute(
+        "SELECT item_id, embedding FROM wardrobe_items WHERE typeof(embedding) = 'text'"
+    ).fetchall()
+    if not rows:
+        return
+    logger.info("Migrating database: Converting %d JSON embeddings to BLOB format.", len(rows))
+    converted, dropped = [], []
+    for row in rows:
+        vec = decode_embedding(row[1])
+        if vec is None:
+            dropped.append((row[0],))
+        else:
+            converted.append((encode_embedding(vec), row[0]))
+    cursor.executemany("UPDATE wardrobe_items SET embedding = ? WHERE item_id = ?", converted)
+    # Unparseable rows are cleared; the wardrobe routes re-embed on the next edit
+    cursor.executemany("UPDATE wardrobe_items SET embedding = NULL WHERE item_id = ?", dropped)
+
+
+# Per-user listings filter on user_id and order by a timestamp; without these
+# every such query scans the whole table.
+USER_INDEXES = [
+    ("idx_wardrobe_items_user_created", "wardrobe_items", "user_id, created_at"),
+    ("idx_saved_outfits_user_created", "saved_outfits", "user_id, created_date"),
+    ("idx_outfit_wear_history_user_worn", "outfit_wear_history", "user_id, worn_at"),
+    ("idx_style_history_user_created", "style_history", "user_id, created_at"),
+    ("idx_wardrobe_archive_user_deleted", "wardrobe_archive", "user_id, deleted_at"),
+    ("idx_activity_log_user_created", "activity_log", "user_id, created_at"),
+]
+
+
+def _add_user_indexes(cursor) -> None:
+    for name, table, columns in USER_INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+    cursor.execute("ANALYZE")
+
+
+def _move_inline_images(cursor) -> None:
+    """Move base64 data-URL images out of the DB into the content-addressed image store."""
+    import image_store
+
+    for table in ("wardrobe_items", "wardrobe_archive"):
+        # Fetch ids first and each image on its own — every row can be megabytes
+        ids = [row[0] for row in cursor.execute(
+            f"SELECT item_id FROM {table} WHERE image_url LIKE 'data:image%'"
+        ).fetchall()]
+        if not ids:
+            continue
+        logger.info("Migrating database: Moving %d inline images from %s to the image store.", len(ids), table)
+        moved = 0
+        for item_id in ids:
+            url = cursor.execute(f"SELECT image_url FROM {table} WHERE item_id = ?", (item_id,)).fetchone()[0]
+            try:
+                ref = image_store.store_image_url(url)
+            except ValueError as e:
+                logger.warning(f"Kept inline image for {table} item {item_id[:8]}: {e}")
+                continue
+            if ref != url:
+                cursor.execute(f"UPDATE {table} SET image_url = ? WHERE item_id = ?", (ref, item_id))
+                moved += 1
+        logger.info("Migrating database: Moved %d/%d images from %s.", moved, len(ids), table)
+
+
+def _add_wardrobe_keyset_index(cursor) -> None:
+    """
+    Index the wardrobe keyset so pages ordered by (COALESCE(created_at, ''),
+    item_id) are read straight off the index with no sort step. Undated legacy
+    rows key as '' so they can be paged like any other.
+    """
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_wardrobe_items_user_created_id "
+        "ON wardrobe_items (user_id, COALESCE(created_at, ''), item_id)"
+    )
+    cursor.execute("ANALYZE wardrobe_items")
+
+
+# (version, description, migration) — append only; never renumber a released entry
+MIGRATIONS = [
+    (1, "store embeddings as float32 BLOBs", _migrate_json_embeddings),
+    (2, "add (user_id, timestamp) indexes", _add_user_indexes),
+    (3, "move inline images to the image store", _move_inline_images),
+    (4, "index wardrobe items on (user_id, COALESCE(created_at, ''), item_id)", _add_wardrobe_keyset_index),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def _run_migrations(conn) -> int:
+    """Apply every migration newer than the database's user_version. Returns the resulting version."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, description, migrate in MIGRATIONS:
+        if target <= version:
+            continue
+        logger.info("Migrating database: v%d -> v%d (%s).", version, target, description)
+        try:
+            migrate(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Migration to v{target} failed: {e}")
+            break
+        version = target
+    return version
+
+
+# ---------------------------------------------------------------------------
+# Query plan self-check
+# ---------------------------------------------------------------------------
+
+# Hot per-user queries; each should be answered from an index, not a table scan.
+HOT_QUERIES = {
+    "wardrobe listing": "SELECT * FROM wardrobe_items WHERE user_id = ? ORDER BY created_at DESC",
+    "wardrobe page": (
+        "SELECT item_id, name, created_at FROM wardrobe_items WHERE user_id = ? "
+        "AND (COALESCE(created_at, ''), item_id) < (?, ?) "
+        "ORDER BY COALESCE(created_at, '') DESC, item_id DESC LIMIT 51"
+    ),
+    "recent activity": "SELECT name, created_at FROM wardrobe_items WHERE user_id = ? ORDER BY created_at DESC LIMIT 5",
+    "saved outfits": "SELECT * FROM saved_outfits WHERE user_id = ? ORDER BY created_date DESC",
+    "outfit wear history": "SELECT worn_at FROM outfit_wear_history WHERE outfit_id = ? AND user_id = ? ORDER BY worn_at DESC",
+    "wear timeline": (
+        "SELECT owh.worn_at, so.name FROM outfit_wear_history owh "
+        "JOIN saved_outfits so ON owh.outfit_id = so.outfit_id "
+        "WHERE owh.user_id = ? AND owh.worn_at >= ? ORDER BY owh.worn_at DESC"
+    ),
+    "style history": "SELECT * FROM style_history WHERE user_id = ? ORDER BY created_at DESC",
+    "archive listing": "SELECT * FROM wardrobe_archive WHERE user_id = ? ORDER BY deleted_at DESC",
+    "activity log": "SELECT * FROM activity_log WHERE user_id = ? ORDER BY created_at DESC",
+}
+
+
+def check_query_plans(conn) -> Dict[str, List[str]]:
+    """
+    Run EXPLAIN QUERY PLAN on HOT_QUERIES and log a warning for any that scan a
+    table or sort in a temp b-tree. Returns {query name: [problem plan steps]}.
+    """
+    problems: Dict[str, List[str]] = {}
+    for name, sql in HOT_QUERIES.items():
+        params = (None,) * sql.count("?")
+        try:
+            steps = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        except sqlite3.Error as e:
+            logger.warning("Query plan check skipped for %s: %s", name, e)
+            continue
+        bad = [
+            step for step in steps
+            if (step.startswith("SCAN ") and " USING " not in step) or "TEMP B-TREE" in step
+        ]
+        if bad:
+            problems[name] = bad
+            logger.warning("Query plan check: %s is not index-backed — %s", name, "; ".join(bad))
+    if not problems:
+        logger.info("Query plan check: all %d hot queries use indexes.", len(HOT_QUERIES))
+    return problems
+
+
 # ---------------------------------------------------------------------------
 # Embedding helpers — used by wardrobe_router and embedding_store
 # ---------------------------------------------------------------------------
+#
+# Embeddings are stored as BLOBs: an 8-byte header (magic, format version,
+# dimension) followed by the vector as little-endian float32.
 
-def save_embedding(conn, item_id: str, embedding_list) -> None:
+EMBEDDING_MAGIC = b"WYAE"
+EMBEDDING_FORMAT_VERSION = 1
+_EMBEDDING_HEADER = struct.Struct("<4sHH")
+_FLOAT32_LE = np.dtype("<f4")
+
+
+def encode_embedding(embedding) -> bytes:
+    """Serialize a 1-D vector (ndarray or list) to the versioned BLOB format."""
+    vec = np.asarray(embedding, dtype=_FLOAT32_LE).ravel()
+    return _EMBEDDING_HEADER.pack(EMBEDDING_MAGIC, EMBEDDING_FORMAT_VERSION, vec.size) + vec.tobytes()
+
+
+def _embedding_dim(blob: bytes) -> Optional[int]:
+    """Dimension declared by a well-formed BLOB, or None if the header doesn't check out."""
+    if len(blob) < _EMBEDDING_HEADER.size:
+        return None
+    magic, version, dim = _EMBEDDING_HEADER.unpack_from(blob)
+    if magic != EMBEDDING_MAGIC or version != EMBEDDING_FORMAT_VERSION:
+        return None
+    if len(blob) != _EMBEDDING_HEADER.size + dim * _FLOAT32_LE.itemsize:
+        return None
+    return dim
+
+
+def decode_embedding(value) -> Optional[np.ndarray]:
     """
-    Persist a numpy array (or plain list) as JSON in the embedding column.
-    Pass embedding_list as _text_to_pseudo_embedding(item).tolist()
+    Deserialize a stored embedding. Accepts the BLOB format and, for rows not yet
+    migrated, the legacy JSON text. Returns a float32 array, or None if unreadable.
     """
-    import json
-    import numpy as np
+    if value is None:
+        return None
+    if isinstance(value, str):
+        import json
+        try:
+            return np.array(json.loads(value), dtype=np.float32)
+        except Exception:
+            return None
+    blob = bytes(value)
+    dim = _embedding_dim(blob)
+    if dim is None:
+        return None
+    return np.frombuffer(blob, dtype=_FLOAT32_LE, count=dim, offset=_EMBEDDING_HEADER.size).astype(np.float32)
+
 
-    if isinstance(embedding_list, np.ndarray):
-        embedding_list = embedding_list.tolist()
-    serialized = json.dumps(embedding_list)
+def save_embedding(conn, item_id: str, embedding_list) -> None:
+    """
+    Persist a numpy array (or plain list) as a float32 BLOB in the embedding column.
+    Pass embedding_list as _text_to_pseudo_embedding(item)
+    """
     conn.execute(
         "UPDATE wardrobe_items SET embedding = ? WHERE item_id = ?",
-        (serialized, item_id)
+        (encode_embedding(embedding_list), item_id)
     )
 
 
@@ -183,16 +614,57 @@ def load_embedding(conn, item_id: str):
     Load and deserialize the embedding for an item.
     Returns a numpy float32 array, or None if no embedding is stored.
     """
-    import json
-    import numpy as np
-
     row = conn.execute(
         "SELECT embedding FROM wardrobe_items WHERE item_id = ?",
         (item_id,)
     ).fetchone()
     if row and row["embedding"]:
-        try:
-            return np.array(json.loads(row["embedding"]), dtype=np.float32)
-        except Exception:
-            return None
+        return decode_embedding(row["embedding"])
     return None
+
+
+def load_embedding_matrix(conn, user_id: str) -> Tuple[List[str], np.ndarray]:
+    """
+    Bulk-load every stored embedding for a user in one query.
+    Returns (item_ids, matrix) where matrix[i] is the float32 embedding of item_ids[i],
+    newest items first. Items with no embedding, or one whose dimension differs from
+    the first row's, are left out.
+    """
+    rows = conn.execute(
+        """SELECT item_id, embedding FROM wardrobe_items
+           WHERE user_id = ? AND embedding IS NOT NULL
+           ORDER BY created_at DESC""",
+        (user_id,)
+    ).fetchall()
+
+    ids: List[str] = []
+    matrix: Optional[np.ndarray] = None
+    for item_id, value in rows:
+        if isinstance(value, str):
+            vec = decode_embedding(value)  # legacy JSON row not yet migrated
+            if vec is None:
+                continue
+            blob, dim = None, vec.size
+        else:
+            blob, dim = bytes(value), _embedding_dim(bytes(value))
+            if dim is None:
+                continue
+        if matrix is None:
+            matrix = np.empty((len(rows), dim), dtype=np.float32)
+        elif dim != matrix.shape[1]:
+            continue
+        row = matrix[len(ids)]
+        row[:] = vec if blob is None else np.frombuffer(blob, dtype=_FLOAT32_LE, count=dim,
+                                                         offset=_EMBEDDING_HEADER.size)
+        ids.append(item_id)
+
+    if matrix is None:
+        return [], np.empty((0, 0), dtype=np.float32)
+    return ids, matrix[:len(ids)]
+
+
+def row_to_item(row) -> Dict[str, Any]:
+    """A wardrobe_items row as a plain dict for API responses — the binary embedding is dropped."""
+    item = dict(row)
+    item.pop("embedding", None)
+    return item
@@ -0,0 +1,319 @@
+# executors.py — bounded worker pools for blocking work called from async routes
+# Route handlers are `async def`, so anything blocking they call directly —
+# sqlite3, HTTP requests, SMTP, bcrypt, the OpenCV/CLIP/rembg pipeline — stalls
+# the event loop and every other request on the worker. Blocking calls go
+# through one of two pools instead:
+#
+#   io   — sqlite3, outbound HTTP, SMTP, file reads; many threads, mostly waiting
+#   cpu  — image analysis, bcrypt, matcher/outfit scoring; ~one thread per core
+#
+# Both pools are bounded in threads *and* queue depth: when a pool's queue is
+# full, new work is rejected with ExecutorSaturated (served as 503 by main.py)
+# rather than piling up behind a slow background removal.
+#
+# BoundedProcessPool is the optional tier above these for GIL-bound work
+# (see services/vision_workers.py): worker processes with per-task timeouts
+# that are replaced when one hangs or crashes.
+
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+IO_POOL_SIZE = int(os.getenv("IO_POOL_SIZE", "16"))
+IO_QUEUE_LIMIT = int(os.getenv("IO_QUEUE_LIMIT", "256"))
+CPU_POOL_SIZE = int(os.getenv("CPU_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+CPU_QUEUE_LIMIT = int(os.getenv("CPU_QUEUE_LIMIT", "32"))
+
+
+class ExecutorSaturated(RuntimeError):
+    """Raised when a pool's queue is full; the request should be retried later."""
+
+    def __init__(self, pool: str):
+        super().__init__(f"{pool} pool is saturated")
+        self.pool = pool
+
+
+class WorkerError(RuntimeError):
+    """A process-pool task did not finish: its worker crashed or it hit the task timeout."""
+
+
+class BoundedExecutor:
+    """
+    ThreadPoolExecutor with a cap on queued work and counters for monitoring.
+    Tasks run in a copy of the caller's context, like asyncio.to_thread.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = None  # created on first use, and again after shutdown()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queued = 0
+        self._peak_queued = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        with self._lock:
+            # Idle workers take new tasks straight away, so they don't count against the queue
+            idle = max(0, self.max_workers - self._active)
+            if self._queued >= self.max_queue + idle:
+                self._rejected += 1
+                logger.warning("%s pool saturated — queued=%d active=%d", self.name, self._queued, self._active)
+                raise ExecutorSaturated(self.name)
+            self._queued += 1
+            self._submitted += 1
+            self._peak_queued = max(self._peak_queued, self._queued)
+
+        enqueued = time.perf_counter()
+        ctx = contextvars.copy_context()
+
+        def _task():
+            waited = time.perf_counter() - enqueued
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            ok = False
+            try:
+                result = ctx.run(fn, *args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+                    if not ok:
+                        self._failed += 1
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix=f"wya-{self.name}"
+                )
+            executor = self._executor
+        return executor.submit(_task)
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run `fn(*args, **kwargs)` on this pool and await its result."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self._completed + self._active
+            return {
+                "pool": self.name,
+                "workers": self.max_workers,
+                "queue_limit": self.max_queue,
+                "active": self._active,
+                "queued": self._queued,
+                "peak_queued": self._peak_queued,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._wait_total / started * 1000, 2) if started else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 2),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class BoundedProcessPool:
+    """
+    ProcessPoolExecutor (spawn context) with a cap on queued work, a per-task
+    timeout and restart-on-crash. A task that times out takes its worker down
+    with it — ProcessPoolExecutor can't cancel running work — so the whole
+    pool is replaced; a task that crashed its worker is retried once, and
+    tasks caught in another task's restart are resubmitted to the new pool.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, timeout: float,
+                 initializer: Callable[..., None] = None, initargs: tuple = ()):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._initializer = initializer
+        self._initargs = initargs
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._crashes = 0
+        self._restarts = 0
+
+    def _current(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),  # forking a process holding torch/OpenCV threads isn't safe
+                    initializer=self._initializer,
+                    initargs=self._initargs,
+                )
+            return self._executor
+
+    def _replace(self, executor: ProcessPoolExecutor, reason: str) -> None:
+        with self._lock:
+            if self._executor is not executor:
+                return  # another task already replaced it
+            self._executor = None
+            self._restarts += 1
+        logger.warning("%s process pool restarting — %s", self.name, reason)
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _replaced(self, executor: ProcessPoolExecutor) -> bool:
+        with self._lock:
+            return self._executor is not executor
+
+    async def run(self, fn: Callable[..., T], *args: Any, timeout: float = None) -> T:
+        """Run a picklable top-level `fn(*args)` in a worker process and await its result."""
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                logger.warning("%s process pool saturated — in_flight=%d", self.name, self._in_flight)
+                raise ExecutorSaturated(self.name)
+            self._in_flight += 1
+            self._submitted += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+
+        ok = False
+        crashed = False
+        try:
+            while True:
+                executor = self._current()
+                try:
+                    future = executor.submit(fn, *args)
+                except RuntimeError:
+                    # Submitted just as another task shut this executor down in
+                    # _replace(); go again on the replacement
+                    if self._replaced(executor):
+                        continue
+                    raise
+                try:
+                    result = await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+                    ok = True
+                    return result
+                except asyncio.CancelledError:
+                    # Still queued when another task's _replace() cancelled it
+                    if future.cancelled() and self._replaced(executor):
+                        continue
+                    raise
+                except asyncio.TimeoutError:
+                    with self._lock:
+                        self._timeouts += 1
+                    self._replace(executor, f"{getattr(fn, '__name__', fn)} timed out")
+                    raise WorkerError(f"{self.name} task timed out after {timeout or self.timeout}s")
+                except BrokenProcessPool:
+                    with self._lock:
+                        self._crashes += 1
+                    self._replace(executor, "worker process died")
+                    if crashed:
+                        raise WorkerError(f"{self.name} worker crashed")
+                    crashed = True
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+                if not ok:
+                    self._failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pool": self.name,
+                "workers": self.max_workers,
+                "queue_limit": self.max_queue,
+                "active": min(self._in_flight, self.max_workers),
+                "queued": max(0, self._in_flight - self.max_workers),
+                "peak_queued": max(0, self._peak_in_flight - self.max_workers),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "crashes": self._crashes,
+                "restarts": self._restarts,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+io_pool = BoundedExecutor("io", IO_POOL_SIZE, IO_QUEUE_LIMIT)
+cpu_pool = BoundedExecutor("cpu", CPU_POOL_SIZE, CPU_QUEUE_LIMIT)
+_process_pools: List[BoundedProcessPool] = []
+
+
+def register_process_pool(pool: BoundedProcessPool) -> BoundedProcessPool:
+    """Include a process pool in executor_stats() and shutdown_executors()."""
+    _process_pools.append(pool)
+    return pool
+
+
+async def run_io(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking I/O call (sqlite3, HTTP, SMTP, disk) off the event loop."""
+    return await io_pool.run(fn, *args, **kwargs)
+
+
+async def run_cpu(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run CPU-heavy work (image analysis, hashing, scoring) off the event loop."""
+    return await cpu_pool.run(fn, *args, **kwargs)
+
+
+def _offload(pool: BoundedExecutor) -> Callable[[Callable[..., T]], Callable[..., Any]]:
+    def decorator(fn: Callable[..., T]) -> Callable[..., Any]:
+        @functools.wraps(fn)  # keeps the signature FastAPI reads parameters from
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            return await pool.run(fn, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Decorators for route handlers written as plain `def`: the whole body runs on the pool.
+offload_io = _offload(io_pool)
+offload_cpu = _offload(cpu_pool)
+
+
+def executor_stats() -> List[Dict[str, Any]]:
+    return [io_pool.stats(), cpu_pool.stats()] + [pool.stats() for pool in _process_pools]
+
+
+def shutdown_executors() -> None:
+    """Stop every pool (app shutdown); queued work that hasn't started is cancelled."""
+    for pool in (io_pool, cpu_pool, *_process_pools):
+        pool.shutdown(wait=False)
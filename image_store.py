@@ -0,0 +1,179 @@
+# image_store.py — content-addressed image blob store for wardrobe photos
+# Images are stored once per distinct content under /app/data/images/, keyed by
+# the SHA-256 of their bytes and sharded two levels deep (ab/cd/abcd…ef.png).
+# The DB keeps only the key; responses turn it into an absolute URL for the
+# request (public_url / publish), and routers/image_router.py streams the bytes
+# back with long-lived cache headers, since a key never changes content.
+
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from typing import Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DIR = os.getenv("IMAGE_DIR", "/app/data/images")
+# Absolute base for image URLs in responses (e.g. a CDN in front of /api/images).
+# Unset, URLs are built from the request, so they point back at this API.
+IMAGE_PUBLIC_URL = os.getenv("IMAGE_PUBLIC_URL", "").rstrip("/")
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_MB", "20")) * 1024 * 1024
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "webp": "image/webp",
+    "gif": "image/gif",
+}
+_EXTENSIONS = {ctype: ext for ext, ctype in CONTENT_TYPES.items()}
+_EXTENSIONS["image/jpg"] = "jpg"
+
+_KEY_RE = re.compile(r"^([0-9a-f]{64})\.(" + "|".join(CONTENT_TYPES) + r")$")
+# An image URL this API handed out, or a reference stored before keys were stored bare
+_SERVED_RE = re.compile(r"^(?:[a-z][a-z0-9+.-]*://[^/]+)?(?:/[^?#]*)?/api/images/([^/?#]+)$", re.IGNORECASE)
+# Response fields that may hold a stored image reference
+URL_FIELDS = ("image_url", "bg_removed_url")
+_DATA_URL_RE = re.compile(r"^data:(image/[\w.+-]+);base64,", re.IGNORECASE)
+
+
+def _ensure_dir(path: str) -> None:
+    os.makedirs(path, exist_ok=True)
+
+
+def path_for(key: str) -> Optional[str]:
+    """Filesystem path for a key like '<sha256>.png', or None if the key is malformed."""
+    m = _KEY_RE.match(key)
+    if not m:
+        return None
+    digest = m.group(1)
+    return os.path.join(IMAGE_DIR, digest[:2], digest[2:4], key)
+
+
+def content_type(key: str) -> str:
+    return CONTENT_TYPES.get(key.rsplit(".", 1)[-1], "application/octet-stream")
+
+
+def put(data: bytes, ctype: str = "image/png") -> str:
+    """
+    Store image bytes and return their key. Identical content is stored once —
+    a second put of the same bytes is a no-op that returns the same key.
+    """
+    ext = _EXTENSIONS.get(ctype.lower())
+    if ext is None:
+        raise ValueError(f"Unsupported image type: {ctype}")
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError(f"Image too large ({len(data)} bytes)")
+
+    key = f"{hashlib.sha256(data).hexdigest()}.{ext}"
+    path = path_for(key)
+    if os.path.exists(path):
+        return key
+
+    shard = os.path.dirname(path)
+    _ensure_dir(shard)
+    fd, tmp_path = tempfile.mkstemp(dir=shard, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)  # concurrent writers of the same key write the same bytes
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    logger.debug("Image stored — key=%s bytes=%d", key[:12], len(data))
+    return key
+
+
+def get(key: str) -> Optional[bytes]:
+    path = path_for(key)
+    if path is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# References stored in image_url
+# ---------------------------------------------------------------------------
+# image_url holds the bare store key. Older rows hold /api/images/<key>, and
+# clients may send back the absolute URL they were given; both resolve to the key.
+
+def key_from_reference(url: Optional[str]) -> Optional[str]:
+    """The store key an image_url points at, or None for data URLs / external links."""
+    if not url:
+        return None
+    if _KEY_RE.match(url):
+        return url
+    if IMAGE_PUBLIC_URL and url.startswith(IMAGE_PUBLIC_URL + "/"):
+        key = url[len(IMAGE_PUBLIC_URL) + 1:]
+        return key if _KEY_RE.match(key) else None
+    m = _SERVED_RE.match(url)
+    return m.group(1) if m and _KEY_RE.match(m.group(1)) else None
+
+
+def public_url(url: Optional[str], request) -> Optional[str]:
+    """
+    The URL a client should load for a stored image_url: absolute, so it works
+    from a frontend on another origin. Data URLs and external links are returned as-is.
+    """
+    key = key_from_reference(url)
+    if key is None:
+        return url
+    if IMAGE_PUBLIC_URL:
+        return f"{IMAGE_PUBLIC_URL}/{key}"
+    return str(request.url_for("get_image", key=key))
+
+
+def publish(payload: Any, request) -> Any:
+    """A copy of a response payload with every image URL field made public (see public_url)."""
+    if isinstance(payload, dict):
+        return {k: public_url(v, request) if k in URL_FIELDS and isinstance(v, str) else publish(v, request)
+                for k, v in payload.items()}
+    if isinstance(payload, list):
+        return [publish(v, request) for v in payload]
+    return payload
+
+
+def parse_data_url(url: str) -> Optional[Tuple[str, bytes]]:
+    """(content type, bytes) for a base64 image data URL, or None if it isn't one."""
+    m = _DATA_URL_RE.match(url or "")
+    if not m:
+        return None
+    try:
+        return m.group(1).lower(), base64.b64decode(url[m.end():], validate=False)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def store_image_url(url: Optional[str]) -> Optional[str]:
+    """
+    Normalize an incoming image_url for storage: data URLs are moved into the
+    store and replaced by their key, URLs of stored images become their key,
+    and anything else is returned unchanged.
+    """
+    parsed = parse_data_url(url) if url else None
+    if parsed is None:
+        return key_from_reference(url) or url
+    ctype, data = parsed
+    return put(data, ctype)
+
+
+def load_data_url(url: Optional[str]) -> Optional[str]:
+    """The image behind an image_url as a base64 data URL (for the CV pipeline)."""
+    if url and url.startswith("data:image"):
+        return url
+    key = key_from_reference(url)
+    data = get(key) if key else None
+    if data is None:
+        return None
+    return f"data:{content_type(key)};base64,{base64.b64encode(data).decode('ascii')}"
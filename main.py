@@ -1,14 +1,18 @@
+import asyncio
 import time
 import os
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi.middleware import SlowAPIMiddleware
 from dotenv import load_dotenv
 
-from database import init_db
+from database import close_pools, init_db
+from executors import ExecutorSaturated, shutdown_executors
 from logger import setup_logging, get_logger
 from rate_limiter import init_rate_limiter
+from services import model_warmup
 from routers.auth_router import router as auth_router
 from routers.wardrobe_router import router as wardrobe_router
 from routers.outfit_router import router as outfit_router
@@ -17,6 +21,7 @@ from routers.style_router import router as style_router
 from routers.user_router import router as user_router
 from routers.recommend_router import router as recommend_router
 from routers.health_router import router as health_router
+from routers.image_router import router as image_router
 
 load_dotenv()
 setup_logging()
@@ -53,10 +58,15 @@ async def lifespan(app: FastAPI):
     """FastAPI lifespan context manager (replaces deprecated @app.on_event)"""
     # Startup
     init_db()
+    # Models load and warm in the background; /health/ready reports 503 until they're done
+    warmup = asyncio.create_task(model_warmup.run_startup_warmup())
     logger.info("WYA backend started — DEBUG=%s, origins=%d", DEBUG, len(allowed_origins))
     yield
     # Shutdown
     logger.info("WYA backend shutting down")
+    warmup.cancel()
+    shutdown_executors()
+    close_pools()
 
 # ── App ───────────────────────────────────────────────────────────────────────
 app = FastAPI(
@@ -71,6 +81,17 @@ app = FastAPI(
 init_rate_limiter(app)
 app.add_middleware(SlowAPIMiddleware)
 
+
+# ── Worker pool backpressure ──────────────────────────────────────────────────
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    logger.warning("%s %s rejected — %s", request.method, request.url.path, exc)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy. Please try again in a moment."},
+        headers={"Retry-After": "1"},
+    )
+
 # ── Request Logging Middleware ────────────────────────────────────────────────
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -93,7 +114,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type", "Accept", "X-Requested-With"],
-    expose_headers=["Content-Length", "X-Request-ID"],
+    expose_headers=["Content-Length", "X-Request-ID", "X-Next-Cursor"],
     max_age=3600,
 )
 
@@ -116,3 +137,4 @@ app.include_router(style_router)
 app.include_router(user_router)
 app.include_router(recommend_router)
 app.include_router(health_router)
+app.include_router(image_router)
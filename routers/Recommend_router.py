@@ -1,15 +1,20 @@
 # routers/recommend_router.py — Semantic recommendation endpoints (Day 6)
-# Uses FAISS vector search for O(log n) item similarity instead of O(n) linear scan.
+# Uses FAISS vector search (or the NumPy fallback backend) instead of a per-item Python scan.
+# Handlers are dominated by vector search and matcher scoring, so they run on the CPU pool.
 
 import logging
 from typing import Any, Dict, List
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 
 from auth_utils import get_current_user, UserProfile
-from database import get_db
+import numpy as np
+
+from database import get_db, load_embedding_matrix, row_to_item
 import embedding_store
-from ai_matcher import _text_to_pseudo_embedding, fashion_matcher
+import image_store
+from executors import offload_cpu
+from ai_matcher import EMBEDDING_DIM, _text_to_pseudo_embedding, encode_items, fashion_matcher
 
 router = APIRouter(prefix="/api/recommend", tags=["recommend"])
 logger = logging.getLogger("uvicorn.error")
@@ -19,11 +24,16 @@ logger = logging.getLogger("uvicorn.error")
 # Helpers
 # ---------------------------------------------------------------------------
 
+# What the matcher (wear_count picks the outfit seed) and the similar-item cards
+# need — not the embedding or the rest of the row
+_MATCH_COLUMNS = "item_id, name, category, color, fabric, brand, image_url, wear_count, last_worn, created_at"
+
+
 def _fetch_wardrobe(user_id: str) -> List[Dict[str, Any]]:
     conn = get_db()
     try:
         rows = conn.execute(
-            "SELECT * FROM wardrobe_items WHERE user_id = ? ORDER BY created_at DESC",
+            f"SELECT {_MATCH_COLUMNS} FROM wardrobe_items WHERE user_id = ? ORDER BY created_at DESC",
             (user_id,)
         ).fetchall()
         return [dict(r) for r in rows]
@@ -40,11 +50,35 @@ def _fetch_item(user_id: str, item_id: str) -> Dict[str, Any]:
         ).fetchone()
         if not row:
             raise HTTPException(404, f"Item {item_id} not found")
-        return dict(row)
+        return row_to_item(row)
     finally:
         conn.close()
 
 
+def _wardrobe_embeddings(user_id: str, wardrobe: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Stored embeddings for `wardrobe`, row-aligned with it, read in one bulk query.
+    Items without a usable stored vector are encoded from their attributes.
+    """
+    conn = get_db()
+    try:
+        ids, matrix = load_embedding_matrix(conn, user_id)
+    finally:
+        conn.close()
+
+    row_of = {item_id: i for i, item_id in enumerate(ids)} if matrix.shape[1] == EMBEDDING_DIM else {}
+    rows = [row_of.get(item.get("item_id")) for item in wardrobe]
+    stored = [i for i, r in enumerate(rows) if r is not None]
+    missing = [i for i, r in enumerate(rows) if r is None]
+
+    out = np.empty((len(wardrobe), EMBEDDING_DIM), dtype=np.float32)
+    if stored:
+        out[stored] = matrix[[rows[i] for i in stored]]
+    if missing:
+        out[missing] = encode_items([wardrobe[i] for i in missing])
+    return out
+
+
 def _items_by_ids(wardrobe: List[Dict], ids: List[str]) -> List[Dict]:
     """Return wardrobe items in the order given by ids, skipping unknowns."""
     lookup = {item.get("item_id"): item for item in wardrobe}
@@ -56,13 +90,18 @@ def _items_by_ids(wardrobe: List[Dict], ids: List[str]) -> List[Dict]:
 # ---------------------------------------------------------------------------
 
 @router.get("/similar/{item_id}")
-async def similar_items(item_id: str, top_k: int = 8, user: UserProfile = Depends(get_current_user)):
+@offload_cpu
+def similar_items(item_id: str, request: Request, top_k: int = 8, user: UserProfile = Depends(get_current_user)):
     """
     Find the most visually/stylistically similar items in the user's wardrobe
-    to the given seed item, using FAISS vector search.
+    to the given seed item, using the per-user vector index.
 
-    Falls back to linear cosine scan if no FAISS index exists yet.
+    Falls back to linear cosine scan if no index exists yet.
     """
+    return image_store.publish(_similar_items(item_id, top_k, user), request)
+
+
+def _similar_items(item_id: str, top_k: int, user: UserProfile) -> Dict[str, Any]:
     seed = _fetch_item(user.user_id, item_id)
     wardrobe = _fetch_wardrobe(user.user_id)
 
@@ -86,13 +125,15 @@ async def similar_items(item_id: str, top_k: int = 8, user: UserProfile = Depend
                 from ai_matcher import compute_similarity_score
                 r["match_score"] = compute_similarity_score(seed, r)
             logger.info(
-                "FAISS similar search — user=%s seed=%s results=%d",
-                user.user_id[:8], item_id[:8], len(results)
+                "Index similar search — backend=%s user=%s seed=%s results=%d",
+                embedding_store.BACKEND, user.user_id[:8], item_id[:8], len(results)
             )
-            return {"item_id": item_id, "similar_items": results, "method": "faiss"}
+            return {"item_id": item_id, "similar_items": results, "method": embedding_store.BACKEND}
 
     # Fall back to linear scan
-    ranked = fashion_matcher.rank_closet_matches(seed, other_items)
+    ranked = fashion_matcher.rank_closet_matches(
+        seed, other_items, top_k=top_k, embeddings=_wardrobe_embeddings(user.user_id, other_items)
+    )
     logger.info(
         "Linear similar search (no FAISS index) — user=%s seed=%s", user.user_id[:8], item_id[:8]
     )
@@ -104,7 +145,8 @@ async def similar_items(item_id: str, top_k: int = 8, user: UserProfile = Depend
 # ---------------------------------------------------------------------------
 
 @router.post("/outfit")
-async def recommend_outfit(data: Dict[str, Any], user: UserProfile = Depends(get_current_user)):
+@offload_cpu
+def recommend_outfit(data: Dict[str, Any], request: Request, user: UserProfile = Depends(get_current_user)):
     """
     Build a complete semantic outfit recommendation from a seed item_id.
 
@@ -140,16 +182,16 @@ async def recommend_outfit(data: Dict[str, Any], user: UserProfile = Depends(get
             if not any(c.get("item_id") == item_id for c in candidates):
                 candidates.insert(0, seed)
             candidate_pool = candidates
-            method = "faiss"
+            method = embedding_store.BACKEND
             logger.info(
-                "FAISS outfit pool — user=%s seed=%s candidates=%d",
-                user.user_id[:8], item_id[:8], len(candidates)
+                "Index outfit pool — backend=%s user=%s seed=%s candidates=%d",
+                method, user.user_id[:8], item_id[:8], len(candidates)
             )
 
     outfit = fashion_matcher.create_complete_outfit(candidate_pool, style=style, occasion=occasion)
     outfit["seed_item_id"] = item_id
     outfit["method"] = method
-    return outfit
+    return image_store.publish(outfit, request)
 
 
 # ---------------------------------------------------------------------------
@@ -157,22 +199,30 @@ async def recommend_outfit(data: Dict[str, Any], user: UserProfile = Depends(get
 # ---------------------------------------------------------------------------
 
 @router.get("/rebuild-index")
-async def rebuild_index(user: UserProfile = Depends(get_current_user)):
+@offload_cpu
+def rebuild_index(user: UserProfile = Depends(get_current_user)):
     """
-    Rebuild the FAISS index for the current user from their entire wardrobe.
+    Rebuild the vector index for the current user from their entire wardrobe.
     Call this after bulk imports or whenever the index is stale.
     """
     wardrobe = _fetch_wardrobe(user.user_id)
     if not wardrobe:
         return {"success": False, "message": "Wardrobe is empty — nothing to index"}
 
-    success = embedding_store.build_index(user.user_id, wardrobe)
+    success = embedding_store.build_index(
+        user.user_id, wardrobe, vectors=_wardrobe_embeddings(user.user_id, wardrobe)
+    )
     if success:
-        logger.info("FAISS index rebuilt — user=%s items=%d", user.user_id[:8], len(wardrobe))
-        return {"success": True, "indexed_items": len(wardrobe), "message": "Index rebuilt successfully"}
+        logger.info("Index rebuilt — backend=%s user=%s items=%d", embedding_store.BACKEND, user.user_id[:8], len(wardrobe))
+        return {
+            "success": True,
+            "indexed_items": len(wardrobe),
+            "backend": embedding_store.BACKEND,
+            "message": "Index rebuilt successfully",
+        }
     else:
         return {
             "success": False,
             "indexed_items": 0,
-            "message": "faiss-cpu not available — install it to enable semantic search",
+            "message": "Index rebuild failed — check server logs",
         }
@@ -1,25 +1,82 @@
 from fastapi import APIRouter, HTTPException, Depends, Query, Body, Request, Response
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 import json
 import logging
 
-from database import get_db
+from database import get_db, row_to_item
 from auth_utils import get_current_user, UserProfile
 from ai_model import FashionAIModel
+from executors import run_cpu, run_io
 from schemas import WeatherRequest, GreenAuditRequest
 from rate_limiter import limiter
+import image_store
 
 router = APIRouter(prefix="/api/ai", tags=["ai"])
 logger = logging.getLogger("uvicorn.error")
 
 
+def _fetch_wardrobe(user_id: str) -> List[Dict[str, Any]]:
+    conn = get_db()
+    try:
+        items = conn.execute(
+            "SELECT * FROM wardrobe_items WHERE user_id = ? ORDER BY created_at DESC",
+            (user_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [row_to_item(item) for item in items]
+
+
+def _closet_matches(user_id: str, wardrobe_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    from ai_matcher import fashion_matcher, _text_to_pseudo_embedding
+    import embedding_store
+
+    inspiration_item = {"category": "Top", "color": "Unknown", "fabric": "Unknown"}
+
+    if embedding_store.index_exists(user_id):
+        query_emb = _text_to_pseudo_embedding(inspiration_item)
+        similar_ids = embedding_store.search(user_id, query_emb, top_k=8)
+        if similar_ids:
+            id_set = set(similar_ids)
+            ranked = [w for w in wardrobe_items if w.get("item_id") in id_set]
+            id_order = {sid: i for i, sid in enumerate(similar_ids)}
+            ranked.sort(key=lambda x: id_order.get(x.get("item_id", ""), 999))
+        else:
+            ranked = fashion_matcher.rank_closet_matches(inspiration_item, wardrobe_items, top_k=8)
+    else:
+        ranked = fashion_matcher.rank_closet_matches(inspiration_item, wardrobe_items, top_k=8)
+    return ranked
+
+
+def _fetch_gap_inputs(user_id: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    conn = get_db()
+    try:
+        items = conn.execute(
+            "SELECT * FROM wardrobe_items WHERE user_id = ?", (user_id,)
+        ).fetchall()
+        dna_row = conn.execute(
+            "SELECT styles FROM style_dna WHERE user_id = ? ORDER BY created_at DESC LIMIT 1",
+            (user_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+    style_dna = []
+    if dna_row:
+        try:
+            style_dna = json.loads(dna_row["styles"])
+        except Exception:
+            style_dna = []
+    return [row_to_item(item) for item in items], style_dna
+
+
 @router.post("/fabric-scan")
 @limiter.limit("10/minute")
 async def fabric_scan(request: Request, response: Response, data: Dict[str, Any], user: UserProfile = Depends(get_current_user)):
     image = data.get('image')
     if not image:
         raise HTTPException(400, "Image required")
-    return await FashionAIModel.autotag_garment(image)
+    return await FashionAIModel.autotag_garment(image, include_embedding=bool(data.get('include_embedding')))
 
 
 @router.post("/outfit-match")
@@ -30,34 +87,11 @@ async def outfit_match(request: Request, response: Response, data: Dict[str, Any
     if not image:
         raise HTTPException(400, "Image required")
 
-    conn = get_db()
-    items = conn.execute(
-        "SELECT * FROM wardrobe_items WHERE user_id = ? ORDER BY created_at DESC",
-        (user.user_id,)
-    ).fetchall()
-    conn.close()
-    wardrobe_items = [dict(item) for item in items]
-
-    from ai_matcher import fashion_matcher, _text_to_pseudo_embedding
-    import embedding_store
-
-    inspiration_item = {"category": "Top", "color": "Unknown", "fabric": "Unknown"}
-
-    if embedding_store.index_exists(user.user_id):
-        query_emb = _text_to_pseudo_embedding(inspiration_item)
-        similar_ids = embedding_store.search(user.user_id, query_emb, top_k=8)
-        if similar_ids:
-            id_set = set(similar_ids)
-            ranked = [w for w in wardrobe_items if w.get("item_id") in id_set]
-            id_order = {sid: i for i, sid in enumerate(similar_ids)}
-            ranked.sort(key=lambda x: id_order.get(x.get("item_id", ""), 999))
-        else:
-            ranked = fashion_matcher.rank_closet_matches(inspiration_item, wardrobe_items)
-    else:
-        ranked = fashion_matcher.rank_closet_matches(inspiration_item, wardrobe_items)
+    wardrobe_items = await run_io(_fetch_wardrobe, user.user_id)
+    ranked = await run_cpu(_closet_matches, user.user_id, wardrobe_items)
 
     suggestion = await FashionAIModel.get_outfit_suggestion(image, variation, user.user_id)
-    suggestion['closet_matches'] = ranked[:8]
+    suggestion['closet_matches'] = image_store.publish(ranked[:8], request)
     return suggestion
 
 
@@ -71,7 +105,7 @@ async def vacation_packer(
     city: str = Query("Delhi"),
     user: UserProfile = Depends(get_current_user)
 ):
-    return FashionAIModel.curate_trip(city, duration_days, vacation_type)
+    return await run_io(FashionAIModel.curate_trip, city, duration_days, vacation_type)
 
 
 @router.post("/curate-outfits")
@@ -80,13 +114,17 @@ async def curate_outfits(request: Request, response: Response, data: Dict[str, A
     items = data.get('items', [])
     if not items:
         raise HTTPException(400, "Wardrobe items required")
-    return await FashionAIModel.generate_outfits_from_wardrobe(items)
+    try:
+        count = max(1, min(int(data.get('count', 3)), 7))
+    except (TypeError, ValueError):
+        raise HTTPException(400, "count must be an integer")
+    return await FashionAIModel.generate_outfits_from_wardrobe(items, count=count)
 
 
 @router.post("/weather-search")
 @limiter.limit("20/minute")
 async def weather_search(request: Request, response: Response, data: WeatherRequest, user: UserProfile = Depends(get_current_user)):
-    return FashionAIModel.weather_styling(data.city)
+    return await run_io(FashionAIModel.weather_styling, data.city)
 
 
 @router.post("/green-audit")
@@ -100,27 +138,10 @@ async def green_audit(request: Request, response: Response, data: GreenAuditRequ
 async def gap_analysis(request: Request, response: Response, data: Dict[str, Any] = Body(default={}), user: UserProfile = Depends(get_current_user)):
     from services.gap_analyzer import gap_analyzer
 
-    conn = get_db()
-    items = conn.execute(
-        "SELECT * FROM wardrobe_items WHERE user_id = ?", (user.user_id,)
-    ).fetchall()
-    wardrobe_items = [dict(item) for item in items]
-
-    dna_row = conn.execute(
-        "SELECT styles FROM style_dna WHERE user_id = ? ORDER BY created_at DESC LIMIT 1",
-        (user.user_id,)
-    ).fetchone()
-    conn.close()
-
-    style_dna = []
-    if dna_row:
-        try:
-            style_dna = json.loads(dna_row["styles"])
-        except Exception:
-            style_dna = []
+    wardrobe_items, style_dna = await run_io(_fetch_gap_inputs, user.user_id)
 
     inspired_category = (data.get("inspired_category") or "").strip()
-    result = gap_analyzer.analyze(style_dna, wardrobe_items, inspired_category=inspired_category)
+    result = await run_cpu(gap_analyzer.analyze, style_dna, wardrobe_items, inspired_category=inspired_category)
 
     gender = (user.gender or "Female").strip().lower()
     gender_label = "women's" if gender in ("female", "f", "woman", "women") else "men's"
@@ -1,44 +1,60 @@
 from fastapi import APIRouter, HTTPException, Request, Response
 from datetime import datetime
+from typing import Any, Dict, Optional
 import uuid
 import logging
 from database import get_db
 from auth_utils import hash_password, verify_password, create_access_token
+from executors import ExecutorSaturated, run_cpu, run_io
 from schemas import UserRegister, UserLogin
 from rate_limiter import limiter
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 logger = logging.getLogger("uvicorn.error")
 
-@router.post("/register")
-@limiter.limit("3/minute")
-async def register(request: Request, response: Response, data: UserRegister):
+def _insert_user(data: UserRegister, hashed: str) -> Dict[str, Any]:
     conn = get_db()
     try:
         user_id = str(uuid.uuid4())
-        hashed = hash_password(data.password)
         now = datetime.utcnow().isoformat()
         conn.execute(
             "INSERT INTO users (user_id, email, full_name, birthday, gender, location, hashed_password, created_at) VALUES (?,?,?,?,?,?,?,?)",
             (user_id, data.email, data.full_name, data.birthday or '', data.gender or 'Female', data.location or 'Global', hashed, now)
         )
         conn.commit()
-        token = create_access_token(user_id)
-        user_row = conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone()
-        return {"access_token": token, "user": dict(user_row)}
+        return dict(conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone())
+    finally:
+        conn.close()
+
+
+def _find_user(email: str) -> Optional[Dict[str, Any]]:
+    conn = get_db()
+    try:
+        row = conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
+
+@router.post("/register")
+@limiter.limit("3/minute")
+async def register(request: Request, response: Response, data: UserRegister):
+    try:
+        hashed = await run_cpu(hash_password, data.password)
+        user = await run_io(_insert_user, data, hashed)
+        token = create_access_token(user["user_id"])
+        return {"access_token": token, "user": user}
+    except ExecutorSaturated:
+        raise
     except Exception as e:
         logger.error(f"Registration error: {e}")
         raise HTTPException(status_code=400, detail="Registration failed.")
-    finally:
-        conn.close()
 
 @router.post("/login")
 @limiter.limit("5/minute")
 async def login(request: Request, response: Response, credentials: UserLogin):
-    conn = get_db()
-    user = conn.execute("SELECT * FROM users WHERE email = ?", (credentials.email,)).fetchone()
-    conn.close()
-    if not user or not verify_password(credentials.password, user['hashed_password']):
+    user = await run_io(_find_user, credentials.email)
+    if not user or not await run_cpu(verify_password, credentials.password, user['hashed_password']):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     token = create_access_token(user['user_id'])
-    return {"access_token": token, "user": dict(user)}
+    return {"access_token": token, "user": user}
@@ -1,7 +1,16 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 from datetime import datetime
+import logging
 import time
 
+import scan_cache
+from database import get_db, pool_stats
+from executors import executor_stats, run_io
+from services import model_warmup
+from services.computer_vision import clip_batcher
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/health", tags=["health"])
 
 # Track startup time
@@ -15,13 +24,35 @@ async def health_check():
         "timestamp": datetime.utcnow().isoformat()
     }
 
+def _check_database() -> str:
+    try:
+        conn = get_db()
+        try:
+            conn.execute("SELECT 1").fetchone()
+        finally:
+            conn.close()
+        return "ok"
+    except Exception as e:
+        logger.warning("Readiness database check failed: %s", e)
+        return "error"
+
+
 @router.get("/ready")
-async def readiness_check():
-    """Readiness probe - checks if the app is ready to serve traffic"""
-    # Add database check here if needed
+async def readiness_check(response: Response):
+    """Readiness probe - 503 until the database answers and model warmup has finished"""
+    warmup = model_warmup.status()
+    checks = {
+        "database": await run_io(_check_database),
+        "models": warmup["status"],
+    }
+    ready = checks["database"] == "ok" and model_warmup.is_ready()
+    if not ready:
+        response.status_code = 503
     return {
-        "status": "ready",
-        "database": "connected"
+        "status": "ready" if ready else "not_ready",
+        "checks": checks,
+        "uptime_seconds": int(time.time() - startup_time),
+        "model_timings_ms": warmup["timings_ms"],
     }
 
 @router.get("/info")
@@ -31,5 +62,10 @@ async def health_info():
     return {
         "version": "1.0.0",
         "uptime_seconds": uptime_seconds,
-        "environment": "production"
+        "environment": "production",
+        "database_pools": pool_stats(),
+        "executors": executor_stats(),
+        "models": model_warmup.status(),
+        "clip_batching": clip_batcher.stats(),
+        "scan_cache": scan_cache.stats(),
     }
@@ -0,0 +1,35 @@
+# routers/image_router.py — serves wardrobe images from the content-addressed image store
+# Keys are SHA-256 digests of the image bytes, so a URL's content never changes:
+# responses are cacheable forever and revalidate by ETag.
+
+import os
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+import image_store
+
+router = APIRouter(prefix="/api/images", tags=["images"])
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/{key}")
+async def get_image(key: str, request: Request):
+    """
+    Stream a stored image. No auth: image tags can't send bearer tokens, and the
+    key is the SHA-256 of the content, so it can't be guessed without the image.
+    """
+    path = image_store.path_for(key)
+    if path is None or not os.path.exists(path):
+        raise HTTPException(404, "Image not found")
+
+    etag = f'"{key.split(".", 1)[0]}"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+    return FileResponse(
+        path,
+        media_type=image_store.content_type(key),
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL},
+    )
@@ -6,6 +6,7 @@ import logging
 
 from database import get_db
 from auth_utils import get_current_user, UserProfile
+from executors import offload_io
 from schemas import OutfitCreate
 import uuid
 
@@ -14,13 +15,16 @@ logger = logging.getLogger("uvicorn.error")
 
 
 @router.get("")
-async def get_outfits(user: UserProfile = Depends(get_current_user)):
+@offload_io
+def get_outfits(user: UserProfile = Depends(get_current_user)):
     conn = get_db()
-    outfits = conn.execute(
-        "SELECT * FROM saved_outfits WHERE user_id = ? ORDER BY created_date DESC",
-        (user.user_id,)
-    ).fetchall()
-    conn.close()
+    try:
+        outfits = conn.execute(
+            "SELECT * FROM saved_outfits WHERE user_id = ? ORDER BY created_date DESC",
+            (user.user_id,)
+        ).fetchall()
+    finally:
+        conn.close()
 
     result = []
     for outfit in outfits:
@@ -38,68 +42,78 @@ async def get_outfits(user: UserProfile = Depends(get_current_user)):
 
 
 @router.post("")
-async def save_outfit(data: OutfitCreate, user: UserProfile = Depends(get_current_user)):
+@offload_io
+def save_outfit(data: OutfitCreate, user: UserProfile = Depends(get_current_user)):
     outfit_id = str(uuid.uuid4())
-    conn = get_db()
     now = datetime.utcnow().isoformat()
-    conn.execute(
-        """INSERT INTO saved_outfits
-           (outfit_id, user_id, name, vibe, items_json, created_date)
-           VALUES (?,?,?,?,?,?)""",
-        (outfit_id, user.user_id, data.name, data.vibe,
-         json.dumps([item.dict() for item in data.items]),
-         data.created_date or now)
-    )
-    conn.commit()
-    conn.close()
+    conn = get_db()
+    try:
+        conn.execute(
+            """INSERT INTO saved_outfits
+               (outfit_id, user_id, name, vibe, items_json, created_date)
+               VALUES (?,?,?,?,?,?)""",
+            (outfit_id, user.user_id, data.name, data.vibe,
+             json.dumps([item.dict() for item in data.items]),
+             data.created_date or now)
+        )
+        conn.commit()
+    finally:
+        conn.close()
     return {"success": True, "id": outfit_id}
 
 
 @router.delete("/{outfit_id}")
-async def delete_outfit(outfit_id: str, user: UserProfile = Depends(get_current_user)):
+@offload_io
+def delete_outfit(outfit_id: str, user: UserProfile = Depends(get_current_user)):
     conn = get_db()
-    conn.execute(
-        "DELETE FROM saved_outfits WHERE outfit_id = ? AND user_id = ?",
-        (outfit_id, user.user_id)
-    )
-    conn.commit()
-    conn.close()
+    try:
+        conn.execute(
+            "DELETE FROM saved_outfits WHERE outfit_id = ? AND user_id = ?",
+            (outfit_id, user.user_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
     return {"success": True}
 
 
 @router.post("/{outfit_id}/worn")
-async def log_outfit_wear(outfit_id: str, data: Dict[str, Any], user: UserProfile = Depends(get_current_user)):
-    conn = get_db()
+@offload_io
+def log_outfit_wear(outfit_id: str, data: Dict[str, Any], user: UserProfile = Depends(get_current_user)):
     worn_at = data.get('worn_at', datetime.utcnow().isoformat())
-
-    outfit = conn.execute(
-        "SELECT * FROM saved_outfits WHERE outfit_id = ? AND user_id = ?",
-        (outfit_id, user.user_id)
-    ).fetchone()
-
-    if not outfit:
+    conn = get_db()
+    try:
+        outfit = conn.execute(
+            "SELECT * FROM saved_outfits WHERE outfit_id = ? AND user_id = ?",
+            (outfit_id, user.user_id)
+        ).fetchone()
+
+        if not outfit:
+            raise HTTPException(status_code=404, detail="Outfit not found")
+
+        conn.execute(
+            "INSERT INTO outfit_wear_history (outfit_id, user_id, worn_at) VALUES (?,?,?)",
+            (outfit_id, user.user_id, worn_at)
+        )
+        conn.execute(
+            "UPDATE saved_outfits SET worn_count = worn_count + 1, last_worn = ? WHERE outfit_id = ?",
+            (worn_at, outfit_id)
+        )
+        conn.commit()
+    finally:
         conn.close()
-        raise HTTPException(status_code=404, detail="Outfit not found")
-
-    conn.execute(
-        "INSERT INTO outfit_wear_history (outfit_id, user_id, worn_at) VALUES (?,?,?)",
-        (outfit_id, user.user_id, worn_at)
-    )
-    conn.execute(
-        "UPDATE saved_outfits SET worn_count = worn_count + 1, last_worn = ? WHERE outfit_id = ?",
-        (worn_at, outfit_id)
-    )
-    conn.commit()
-    conn.close()
     return {"success": True, "worn_at": worn_at}
 
 
 @router.get("/{outfit_id}/wear-history")
-async def get_outfit_wear_history(outfit_id: str, user: UserProfile = Depends(get_current_user)):
+@offload_io
+def get_outfit_wear_history(outfit_id: str, user: UserProfile = Depends(get_current_user)):
     conn = get_db()
-    history = conn.execute(
-        "SELECT worn_at FROM outfit_wear_history WHERE outfit_id = ? AND user_id = ? ORDER BY worn_at DESC",
-        (outfit_id, user.user_id)
-    ).fetchall()
-    conn.close()
+    try:
+        history = conn.execute(
+            "SELECT worn_at FROM outfit_wear_history WHERE outfit_id = ? AND user_id = ? ORDER BY worn_at DESC",
+            (outfit_id, user.user_id)
+        ).fetchall()
+    finally:
+        conn.close()
     return [dict(row) for row in history]
@@ -3,9 +3,10 @@ from datetime import datetime
 import json
 import logging
 
-from database import get_db
+from database import get_db, row_to_item
 from auth_utils import get_current_user, UserProfile
 from ai_model import FashionAIModel
+from executors import offload_io
 from schemas import StyleDNACreate
 
 router = APIRouter(prefix="/api", tags=["style"])
@@ -13,13 +14,17 @@ logger = logging.getLogger("uvicorn.error")
 
 
 @router.get("/dashboard/stats")
-async def get_stats(user: UserProfile = Depends(get_current_user)):
+@offload_io
+def get_stats(user: UserProfile = Depends(get_current_user)):
     conn = get_db()
-    count = conn.execute(
-        "SELECT COUNT(*) FROM wardrobe_items WHERE user_id = ?", (user.user_id,)
-    ).fetchone()[0]
+    try:
+        count = conn.execute(
+            "SELECT COUNT(*) FROM wardrobe_items WHERE user_id = ?", (user.user_id,)
+        ).fetchone()[0]
+        dna_row = conn.execute("SELECT * FROM style_dna WHERE user_id = ?", (user.user_id,)).fetchone()
+    finally:
+        conn.close()
 
-    dna_row = conn.execute("SELECT * FROM style_dna WHERE user_id = ?", (user.user_id,)).fetchone()
     archetype = "Pending"
     if dna_row:
         try:
@@ -29,63 +34,73 @@ async def get_stats(user: UserProfile = Depends(get_current_user)):
         except Exception:
             archetype = "Mapped"
 
-    conn.close()
     return {"wardrobe_count": count, "style_archetype": archetype, "style_confidence": 91}
 
 
 @router.get("/style/evolution")
-async def get_evolution(user: UserProfile = Depends(get_current_user)):
+@offload_io
+def get_evolution(user: UserProfile = Depends(get_current_user)):
     conn = get_db()
-    items = conn.execute(
-        "SELECT * FROM wardrobe_items WHERE user_id = ? ORDER BY created_at ASC", (user.user_id,)
-    ).fetchall()
-    history = conn.execute(
-        "SELECT * FROM style_history WHERE user_id = ? ORDER BY created_at DESC", (user.user_id,)
-    ).fetchall()
-    conn.close()
-    return FashionAIModel.get_evolution_data([dict(i) for i in items], [dict(h) for h in history])
+    try:
+        items = conn.execute(
+            "SELECT * FROM wardrobe_items WHERE user_id = ? ORDER BY created_at ASC", (user.user_id,)
+        ).fetchall()
+        history = conn.execute(
+            "SELECT * FROM style_history WHERE user_id = ? ORDER BY created_at DESC", (user.user_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return FashionAIModel.get_evolution_data([row_to_item(i) for i in items], [dict(h) for h in history])
 
 
 @router.get("/style/dna/{user_id}")
-async def get_style_dna(user_id: str, user: UserProfile = Depends(get_current_user)):
+@offload_io
+def get_style_dna(user_id: str, user: UserProfile = Depends(get_current_user)):
     conn = get_db()
-    row = conn.execute("SELECT * FROM style_dna WHERE user_id = ?", (user_id,)).fetchone()
-    conn.close()
+    try:
+        row = conn.execute("SELECT * FROM style_dna WHERE user_id = ?", (user_id,)).fetchone()
+    finally:
+        conn.close()
     if row:
         return {"has_dna": True, **dict(row)}
     return {"has_dna": False}
 
 
 @router.post("/style/dna")
-async def save_style_dna(data: StyleDNACreate, user: UserProfile = Depends(get_current_user)):
-    conn = get_db()
+@offload_io
+def save_style_dna(data: StyleDNACreate, user: UserProfile = Depends(get_current_user)):
     now = datetime.utcnow().isoformat()
     styles_json = json.dumps(data.styles)
-
-    conn.execute(
-        "INSERT OR REPLACE INTO style_dna (user_id, styles, comfort_level, summary, created_at) VALUES (?,?,?,?,?)",
-        (user.user_id, styles_json, data.comfort_level, data.summary, now)
-    )
     primary_style = data.styles[0] if data.styles else 'Evolution'
-    conn.execute(
-        "INSERT INTO style_history (user_id, styles, comfort_level, archetype, summary, created_at) VALUES (?,?,?,?,?,?)",
-        (user.user_id, styles_json, data.comfort_level, primary_style, data.summary, now)
-    )
-    conn.commit()
-    conn.close()
+
+    conn = get_db()
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO style_dna (user_id, styles, comfort_level, summary, created_at) VALUES (?,?,?,?,?)",
+            (user.user_id, styles_json, data.comfort_level, data.summary, now)
+        )
+        conn.execute(
+            "INSERT INTO style_history (user_id, styles, comfort_level, archetype, summary, created_at) VALUES (?,?,?,?,?,?)",
+            (user.user_id, styles_json, data.comfort_level, primary_style, data.summary, now)
+        )
+        conn.commit()
+    finally:
+        conn.close()
     return {"success": True}
 
 
 @router.get("/style/aura")
-async def get_aesthetic_aura(user: UserProfile = Depends(get_current_user)):
+@offload_io
+def get_aesthetic_aura(user: UserProfile = Depends(get_current_user)):
     conn = get_db()
-    items = conn.execute(
-        "SELECT * FROM wardrobe_items WHERE user_id = ?", (user.user_id,)
-    ).fetchall()
-    wardrobe_items = [dict(item) for item in items]
-
-    dna_row = conn.execute("SELECT * FROM style_dna WHERE user_id = ?", (user.user_id,)).fetchone()
-    conn.close()
+    try:
+        items = conn.execute(
+            "SELECT * FROM wardrobe_items WHERE user_id = ?", (user.user_id,)
+        ).fetchall()
+        dna_row = conn.execute("SELECT * FROM style_dna WHERE user_id = ?", (user.user_id,)).fetchone()
+    finally:
+        conn.close()
+    wardrobe_items = [row_to_item(item) for item in items]
 
     colors = {}
     for item in wardrobe_items:
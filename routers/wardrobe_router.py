@@ -1,38 +1,134 @@
+import base64
+import json
 import time
 import uuid
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 
-from fastapi import APIRouter, HTTPException, Depends, Form
+from fastapi import APIRouter, HTTPException, Depends, Form, Query, Request, Response
 
-from database import get_db
+from database import get_db, row_to_item
 from auth_utils import get_current_user, UserProfile
 from ai_model import FashionAIModel
+from executors import ExecutorSaturated, offload_io, run_io
 from logger import get_logger
+import image_store
 
 router = APIRouter(prefix="/api/wardrobe", tags=["wardrobe"])
 logger = get_logger(__name__)
 
 
+def _store_image(image_url: Optional[str]) -> Optional[str]:
+    """Move an uploaded data-URL image into the image store; the DB keeps only its reference."""
+    try:
+        return image_store.store_image_url(image_url)
+    except Exception as exc:
+        logger.warning("Image store skipped — keeping inline image — error=%s", exc)
+        return image_url
+
+
+# Columns a client may ask for with ?fields= (never the embedding BLOB)
+WARDROBE_FIELDS = (
+    "item_id", "name", "category", "color", "fabric", "brand",
+    "image_url", "last_worn", "wear_count", "created_at",
+)
+# ?view=summary — enough to render a wardrobe grid tile
+SUMMARY_FIELDS = ("item_id", "name", "category", "color", "image_url")
+MAX_PAGE_SIZE = 200
+
+
+def _encode_cursor(created_at: str, item_id: str) -> str:
+    raw = json.dumps([created_at, item_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(item_id, str):
+        raise HTTPException(400, "Invalid cursor")
+    return created_at, item_id
+
+
+def _select_columns(fields: Optional[str], view: str) -> Optional[Tuple[List[str], List[str]]]:
+    """
+    (columns to SELECT, columns to return) for ?fields= / ?view=summary,
+    or None for the full item.
+    """
+    if fields:
+        wanted = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = sorted(set(wanted) - set(WARDROBE_FIELDS))
+        if unknown:
+            raise HTTPException(400, f"Unknown fields: {', '.join(unknown)}")
+    elif view == "summary":
+        wanted = list(SUMMARY_FIELDS)
+    else:
+        return None
+    # item_id and created_at are needed for the cursor; created_at is dropped again unless asked for
+    return list(dict.fromkeys(["item_id", "created_at"] + wanted)), wanted
+
+
 @router.get("")
-async def get_wardrobe(user: UserProfile = Depends(get_current_user)):
+@offload_io
+def get_wardrobe(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: str = Query("full", pattern="^(full|summary)$"),
+    user: UserProfile = Depends(get_current_user),
+):
+    """
+    List the user's wardrobe, newest first.
+
+    Without `limit` the whole wardrobe is returned, as before. With `limit`,
+    pages are keyset-paginated on (created_at, item_id), with undated rows
+    keyed as '' so they come last and still page: pass the
+    `X-Next-Cursor` response header back as `cursor` to get the next page;
+    the header is absent on the last page. `fields=a,b,c` or `view=summary`
+    return only those columns.
+    """
+    selection = _select_columns(fields, view)
+    columns = ", ".join(selection[0]) if selection else "*"
+
+    sql = f"SELECT {columns} FROM wardrobe_items WHERE user_id = ?"
+    params: List[Any] = [user.user_id]
+    if cursor:
+        created_at, item_id = _decode_cursor(cursor)
+        sql += " AND (COALESCE(created_at, ''), item_id) < (?, ?)"
+        params += [created_at, item_id]
+    sql += " ORDER BY COALESCE(created_at, '') DESC, item_id DESC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit + 1)  # one extra row tells us whether another page exists
+
     conn = get_db()
     try:
-        items = conn.execute(
-            "SELECT * FROM wardrobe_items WHERE user_id = ? ORDER BY created_at DESC",
-            (user.user_id,)
-        ).fetchall()
-        logger.info("Wardrobe fetch — user=%s items=%d", user.user_id[:8], len(items))
-        return [dict(row) for row in items]
+        rows = conn.execute(sql, params).fetchall()
     except Exception as e:
         logger.error("Wardrobe fetch failed — user=%s error=%s", user.user_id[:8], e)
         raise HTTPException(500, "Failed to fetch wardrobe")
     finally:
         conn.close()
 
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(last["created_at"] or "", last["item_id"])
+
+    logger.info("Wardrobe fetch — user=%s items=%d", user.user_id[:8], len(rows))
+    if selection:
+        wanted = selection[1]
+        return image_store.publish([{col: row[col] for col in wanted} for row in rows], request)
+    return image_store.publish([row_to_item(row) for row in rows], request)
+
 
 @router.post("")
-async def add_wardrobe_item(
+@offload_io
+def add_wardrobe_item(
     name: str = Form(...),
     category: str = Form(...),
     color: str = Form(""),
@@ -41,6 +137,7 @@ async def add_wardrobe_item(
     user: UserProfile = Depends(get_current_user)
 ):
     item_id = str(uuid.uuid4())
+    image_url = _store_image(image_url)
     conn = get_db()
     try:
         now = datetime.utcnow().isoformat()
@@ -78,7 +175,8 @@ async def add_wardrobe_item(
 
 
 @router.delete("/{item_id}")
-async def delete_wardrobe_item(item_id: str, user: UserProfile = Depends(get_current_user)):
+@offload_io
+def delete_wardrobe_item(item_id: str, user: UserProfile = Depends(get_current_user)):
     conn = get_db()
     try:
         conn.execute(
@@ -87,12 +185,12 @@ async def delete_wardrobe_item(item_id: str, user: UserProfile = Depends(get_cur
         )
         conn.commit()
 
-        # Invalidate FAISS index so it rebuilds fresh on next search
+        # Drop just this item from the FAISS index — the rest stays searchable
         try:
             import embedding_store
-            embedding_store.delete_index(user.user_id)
+            embedding_store.remove_item(user.user_id, item_id)
         except Exception as faiss_exc:
-            logger.warning("FAISS delete_index skipped — user=%s error=%s", user.user_id[:8], faiss_exc)
+            logger.warning("FAISS remove_item skipped — user=%s error=%s", user.user_id[:8], faiss_exc)
 
         logger.info("Wardrobe item deleted — user=%s item=%s", user.user_id[:8], item_id[:8])
         return {"success": True}
@@ -104,7 +202,8 @@ async def delete_wardrobe_item(item_id: str, user: UserProfile = Depends(get_cur
 
 
 @router.post("/{item_id}/wear")
-async def wear_item(item_id: str, data: Dict[str, Any] = None, user: UserProfile = Depends(get_current_user)):
+@offload_io
+def wear_item(item_id: str, data: Dict[str, Any] = None, user: UserProfile = Depends(get_current_user)):
     conn = get_db()
     try:
         worn_at = data.get('worn_at', datetime.utcnow().isoformat()) if data else datetime.utcnow().isoformat()
@@ -123,7 +222,8 @@ async def wear_item(item_id: str, data: Dict[str, Any] = None, user: UserProfile
 
 
 @router.put("/{item_id}")
-async def update_wardrobe_item(
+@offload_io
+def update_wardrobe_item(
     item_id: str,
     name: Optional[str] = Form(None),
     category: Optional[str] = Form(None),
@@ -144,7 +244,7 @@ async def update_wardrobe_item(
         if fabric is not None:
             fields.append("fabric = ?"); values.append(fabric)
         if image_url is not None:
-            fields.append("image_url = ?"); values.append(image_url)
+            fields.append("image_url = ?"); values.append(_store_image(image_url))
 
         if fields:
             sql = f"UPDATE wardrobe_items SET {', '.join(fields)} WHERE item_id = ? AND user_id = ?"
@@ -153,6 +253,28 @@ async def update_wardrobe_item(
             conn.commit()
             logger.info("Wardrobe item updated — user=%s item=%s fields=%s", user.user_id[:8], item_id[:8], fields)
 
+            # Re-embed when an attribute that feeds the embedding changed
+            if any(v is not None for v in (name, category, color, fabric)):
+                row = conn.execute(
+                    "SELECT item_id, name, category, color, fabric FROM wardrobe_items WHERE item_id = ? AND user_id = ?",
+                    (item_id, user.user_id)
+                ).fetchone()
+                if row:
+                    item_dict = dict(row)
+                    try:
+                        from ai_matcher import _text_to_pseudo_embedding
+                        from database import save_embedding
+                        save_embedding(conn, item_id, _text_to_pseudo_embedding(item_dict))
+                        conn.commit()
+                    except Exception as emb_exc:
+                        logger.warning("Embedding refresh skipped — item=%s error=%s", item_id[:8], emb_exc)
+
+                    try:
+                        import embedding_store
+                        embedding_store.update_item(user.user_id, item_dict)
+                    except Exception as faiss_exc:
+                        logger.warning("FAISS update_item skipped — item=%s error=%s", item_id[:8], faiss_exc)
+
         return {"success": True}
     except Exception as e:
         logger.error("Update wardrobe item failed — user=%s item=%s error=%s", user.user_id[:8], item_id[:8], e)
@@ -161,22 +283,46 @@ async def update_wardrobe_item(
         conn.close()
 
 
-@router.post("/{item_id}/remove-bg")
-async def remove_background(item_id: str, user: UserProfile = Depends(get_current_user)):
+def _item_image_url(item_id: str, user_id: str) -> Optional[str]:
+    """The item's image_url ('' if it has none), or None if the item doesn't exist."""
     conn = get_db()
-    item = conn.execute(
-        "SELECT * FROM wardrobe_items WHERE item_id = ? AND user_id = ?",
-        (item_id, user.user_id)
-    ).fetchone()
-
-    if not item:
+    try:
+        row = conn.execute(
+            "SELECT image_url FROM wardrobe_items WHERE item_id = ? AND user_id = ?",
+            (item_id, user_id)
+        ).fetchone()
+    finally:
         conn.close()
-        raise HTTPException(404, "Item not found")
+    return None if row is None else (row["image_url"] or "")
 
-    image_url: str = item["image_url"] or ""
 
-    if not image_url.startswith("data:image"):
+def _replace_image(item_id: str, user_id: str, image_url: str) -> str:
+    stored = _store_image(image_url)
+    conn = get_db()
+    try:
+        conn.execute(
+            "UPDATE wardrobe_items SET image_url = ? WHERE item_id = ? AND user_id = ?",
+            (stored, item_id, user_id)
+        )
+        conn.commit()
+    finally:
         conn.close()
+    return stored
+
+
+@router.post("/{item_id}/remove-bg")
+async def remove_background(item_id: str, request: Request, alpha_matting: bool = False,
+                            user: UserProfile = Depends(get_current_user)):
+    return image_store.publish(await _remove_background(item_id, alpha_matting, user), request)
+
+
+async def _remove_background(item_id: str, alpha_matting: bool, user: UserProfile) -> Dict[str, Any]:
+    image_url = await run_io(_item_image_url, item_id, user.user_id)
+    if image_url is None:
+        raise HTTPException(404, "Item not found")
+
+    image_data = await run_io(image_store.load_data_url, image_url)
+    if image_data is None:
         return {
             "success": False,
             "bg_removed_url": image_url,
@@ -187,44 +333,40 @@ async def remove_background(item_id: str, user: UserProfile = Depends(get_curren
         logger.info("Background removal started — user=%s item=%s", user.user_id[:8], item_id[:8])
         start = time.perf_counter()
 
-        result = await FashionAIModel.remove_background(image_url)
+        result = await FashionAIModel.remove_background(image_data, alpha_matting)
 
         elapsed_ms = (time.perf_counter() - start) * 1000
         logger.info("Background removal done — user=%s item=%s time=%.1fms", user.user_id[:8], item_id[:8], elapsed_ms)
 
         if result.get("success") and result.get("bg_removed_image"):
-            bg_removed_data = f"data:image/png;base64,{result['bg_removed_image']}"
-            conn.execute(
-                "UPDATE wardrobe_items SET image_url = ? WHERE item_id = ? AND user_id = ?",
-                (bg_removed_data, item_id, user.user_id)
+            bg_removed_url = await run_io(
+                _replace_image, item_id, user.user_id, f"data:image/png;base64,{result['bg_removed_image']}"
             )
-            conn.commit()
-            conn.close()
             return {
                 "success": True,
-                "bg_removed_url": bg_removed_data,
+                "bg_removed_url": bg_removed_url,
                 "message": "Background removed — your item now looks like a lookbook photo.",
             }
 
-        conn.close()
         return {
             "success": False,
             "bg_removed_url": image_url,
             "message": result.get("error", "Background removal failed — original image kept."),
         }
 
+    except ExecutorSaturated:
+        raise
     except MemoryError:
         logger.error("Background removal OOM — image too large for t2.micro — user=%s item=%s", user.user_id[:8], item_id[:8])
-        conn.close()
         return {"success": False, "bg_removed_url": image_url, "message": "Image too large to process. Try a smaller image."}
     except Exception as exc:
         logger.error("Background removal failed — user=%s item=%s error=%s", user.user_id[:8], item_id[:8], exc)
-        conn.close()
         return {"success": False, "bg_removed_url": image_url, "message": f"Background removal failed: {exc}"}
 
 
 @router.post("/{item_id}/archive")
-async def archive_item(item_id: str, data: Dict[str, Any], user: UserProfile = Depends(get_current_user)):
+@offload_io
+def archive_item(item_id: str, data: Dict[str, Any], user: UserProfile = Depends(get_current_user)):
     conn = get_db()
     try:
         row = conn.execute(
@@ -248,6 +390,13 @@ async def archive_item(item_id: str, data: Dict[str, Any], user: UserProfile = D
         )
         conn.execute("DELETE FROM wardrobe_items WHERE item_id = ? AND user_id = ?", (item_id, user.user_id))
         conn.commit()
+
+        try:
+            import embedding_store
+            embedding_store.remove_item(user.user_id, item_id)
+        except Exception as faiss_exc:
+            logger.warning("FAISS remove_item skipped — user=%s error=%s", user.user_id[:8], faiss_exc)
+
         logger.info("Item archived — user=%s item=%s reason=%s", user.user_id[:8], item_id[:8], data.get('reason'))
         return {"success": True}
     except HTTPException:
@@ -262,7 +411,8 @@ async def archive_item(item_id: str, data: Dict[str, Any], user: UserProfile = D
 # ── Archive ────────────────────────────────────────────────────────────────────
 
 @router.get("/archive")
-async def get_archive(user: UserProfile = Depends(get_current_user)):
+@offload_io
+def get_archive(request: Request, user: UserProfile = Depends(get_current_user)):
     conn = get_db()
     try:
         archived = conn.execute(
@@ -270,12 +420,12 @@ async def get_archive(user: UserProfile = Depends(get_current_user)):
             (user.user_id,)
         ).fetchall()
         logger.info("Archive fetch — user=%s items=%d", user.user_id[:8], len(archived))
-        return [{
+        return image_store.publish([{
             "id": item['item_id'], "name": item['name'], "category": item['category'],
             "color": item['color'], "fabric": item['fabric'], "image_url": item['image_url'],
             "wear_count": item['wear_count'], "archived_date": item['deleted_at'],
             "archive_reason": item['archive_reason'], "memory_note": item['memory_note']
-        } for item in archived]
+        } for item in archived], request)
     except Exception as e:
         logger.error("Archive fetch failed — user=%s error=%s", user.user_id[:8], e)
         raise HTTPException(500, "Failed to fetch archive")
@@ -284,7 +434,8 @@ async def get_archive(user: UserProfile = Depends(get_current_user)):
 
 
 @router.delete("/archive/{item_id}")
-async def permanent_delete_archive(item_id: str, user: UserProfile = Depends(get_current_user)):
+@offload_io
+def permanent_delete_archive(item_id: str, user: UserProfile = Depends(get_current_user)):
     conn = get_db()
     try:
         conn.execute(
@@ -0,0 +1,270 @@
+# scan_cache.py — result cache for image scans (autotag, background removal)
+# Users rescan the same photo, and outfit-match re-submits the same image for
+# every new variation; each scan redid decode, mask, colour clustering, CLIP and pattern
+# detection. Results are cached in a local SQLite file keyed by:
+#
+#   - the SHA-256 of the uploaded bytes — exact repeats, found without decoding
+#   - a 64-bit difference hash (dHash) of the decoded image — near-duplicates
+#     (re-encoded, resized or re-compressed copies of the same photo), found
+#     through four 16-bit bands: any hash within SCAN_CACHE_MAX_DISTANCE ≤ 3
+#     bits shares at least one band exactly
+#   - a coarse colour signature (mean colour of each image quarter) stored next
+#     to the dHash — the dHash is grayscale, so a recoloured copy of a garment
+#     hashes the same; a near hit also needs every channel mean within
+#     SCAN_CACHE_COLOR_TOLERANCE
+#
+# Near-duplicate matches are opt-in per kind: tags transfer to a re-encoded copy
+# of a photo, a background-removed image does not. Entries expire after
+# SCAN_CACHE_TTL seconds and the least recently used are evicted beyond
+# SCAN_CACHE_MAX_ENTRIES. Any cache failure falls back to computing the result.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from database import get_db_at
+from executors import run_io
+
+logger = logging.getLogger(__name__)
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except (ImportError, OSError):
+    CV2_AVAILABLE = False
+
+SCAN_CACHE_ENABLED = os.getenv("SCAN_CACHE_ENABLED", "true").lower() == "true"
+SCAN_CACHE_PATH = os.getenv("SCAN_CACHE_PATH", "/app/data/scan_cache.db")
+SCAN_CACHE_TTL = int(os.getenv("SCAN_CACHE_TTL", str(7 * 24 * 3600)))
+SCAN_CACHE_MAX_ENTRIES = int(os.getenv("SCAN_CACHE_MAX_ENTRIES", "5000"))
+SCAN_CACHE_MAX_DISTANCE = min(3, int(os.getenv("SCAN_CACHE_MAX_DISTANCE", "3")))
+SCAN_CACHE_MAX_RESULT_KB = int(os.getenv("SCAN_CACHE_MAX_RESULT_KB", "4096"))
+SCAN_CACHE_COLOR_TOLERANCE = int(os.getenv("SCAN_CACHE_COLOR_TOLERANCE", "16"))
+
+_BANDS = 4  # 64-bit hash → four 16-bit bands; pigeonhole covers distances up to 3
+
+_schema_ready = set()
+_lock = threading.Lock()
+_counters = {"exact_hits": 0, "near_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+
+class ScanKey(NamedTuple):
+    sha256: str
+    phash: Optional[int]  # None when near-duplicate lookup wasn't needed or the image didn't decode
+    color: Optional[str] = None  # colour signature (hex), set with phash
+
+
+# ------------------------------------------------------------------
+# Hashing
+# ------------------------------------------------------------------
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _decode_small(data: bytes) -> Optional[np.ndarray]:
+    if not CV2_AVAILABLE:
+        return None
+    # Reduced decode: JPEG is decoded straight at 1/8 scale, which is all the thumbnails need
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_REDUCED_COLOR_8)
+    if image is None or image.size == 0:
+        return None
+    return image
+
+
+def _dhash(image: np.ndarray) -> int:
+    """64-bit dHash: sign of horizontal gradients on a 9×8 grayscale thumbnail."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    thumb = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = np.packbits((thumb[:, 1:] > thumb[:, :-1]).ravel())
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def _color_signature(image: np.ndarray) -> str:
+    """Mean BGR of each quarter of the image — 12 bytes, as hex."""
+    return cv2.resize(image, (2, 2), interpolation=cv2.INTER_AREA).tobytes().hex()
+
+
+def perceptual_hash(data: bytes) -> Optional[int]:
+    image = _decode_small(data)
+    return _dhash(image) if image is not None else None
+
+
+def fingerprint(data: bytes) -> Tuple[Optional[int], Optional[str]]:
+    """(dHash, colour signature) from a single decode, or (None, None)."""
+    image = _decode_small(data)
+    if image is None:
+        return None, None
+    return _dhash(image), _color_signature(image)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def same_colors(a: str, b: str) -> bool:
+    diff = np.abs(np.frombuffer(bytes.fromhex(a), np.uint8).astype(np.int16)
+                  - np.frombuffer(bytes.fromhex(b), np.uint8).astype(np.int16))
+    return int(diff.max()) <= SCAN_CACHE_COLOR_TOLERANCE
+
+
+def _bands(phash: int) -> Tuple[int, ...]:
+    return tuple((phash >> (16 * i)) & 0xFFFF for i in range(_BANDS))
+
+
+# ------------------------------------------------------------------
+# Store
+# ------------------------------------------------------------------
+
+def _connect():
+    conn = get_db_at(SCAN_CACHE_PATH)
+    if SCAN_CACHE_PATH not in _schema_ready:
+        with _lock:
+            if SCAN_CACHE_PATH not in _schema_ready:
+                conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS scan_cache (
+                        kind       TEXT NOT NULL,
+                        sha256     TEXT NOT NULL,
+                        phash      TEXT,
+                        color      TEXT,
+                        band0      INTEGER, band1 INTEGER, band2 INTEGER, band3 INTEGER,
+                        result     TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        used_at    REAL NOT NULL,
+                        hits       INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (kind, sha256)
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_scan_cache_band0 ON scan_cache (kind, band0);
+                    CREATE INDEX IF NOT EXISTS idx_scan_cache_band1 ON scan_cache (kind, band1);
+                    CREATE INDEX IF NOT EXISTS idx_scan_cache_band2 ON scan_cache (kind, band2);
+                    CREATE INDEX IF NOT EXISTS idx_scan_cache_band3 ON scan_cache (kind, band3);
+                    CREATE INDEX IF NOT EXISTS idx_scan_cache_used ON scan_cache (used_at);
+                """)
+                # Files written before the colour signature existed; their rows never near-match
+                if "color" not in {r["name"] for r in conn.execute("PRAGMA table_info(scan_cache)")}:
+                    conn.execute("ALTER TABLE scan_cache ADD COLUMN color TEXT")
+                    conn.commit()
+                _schema_ready.add(SCAN_CACHE_PATH)
+    return conn
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _counters[name] += 1
+
+
+def _touch(conn, kind: str, sha256: str, now: float) -> None:
+    conn.execute("UPDATE scan_cache SET used_at = ?, hits = hits + 1 WHERE kind = ? AND sha256 = ?", (now, kind, sha256))
+    conn.commit()
+
+
+def lookup(kind: str, data: bytes, near_duplicates: bool = False) -> Tuple[ScanKey, Optional[Dict[str, Any]]]:
+    """
+    (key, cached result or None) for the image bytes `data`. The perceptual
+    hash is only computed when there is no exact match and near_duplicates is set.
+    """
+    sha256 = content_hash(data)
+    try:
+        conn = _connect()
+        try:
+            now = time.time()
+            fresh_after = now - SCAN_CACHE_TTL
+            row = conn.execute(
+                "SELECT phash, color, result FROM scan_cache WHERE kind = ? AND sha256 = ? AND created_at > ?",
+                (kind, sha256, fresh_after),
+            ).fetchone()
+            if row is not None:
+                _touch(conn, kind, sha256, now)
+                _count("exact_hits")
+                phash = int(row["phash"], 16) if row["phash"] else None
+                return ScanKey(sha256, phash, row["color"]), json.loads(row["result"])
+
+            phash, color = fingerprint(data) if near_duplicates else (None, None)
+            if phash is not None:
+                bands = _bands(phash)
+                candidates = conn.execute(
+                    "SELECT sha256, phash, color, result FROM scan_cache WHERE kind = ? AND created_at > ? AND "
+                    "color IS NOT NULL AND (band0 = ? OR band1 = ? OR band2 = ? OR band3 = ?)",
+                    (kind, fresh_after, *bands),
+                ).fetchall()
+                candidates = [r for r in candidates if same_colors(color, r["color"])]
+                best = min(candidates, key=lambda r: hamming(phash, int(r["phash"], 16)), default=None)
+                if best is not None and hamming(phash, int(best["phash"], 16)) <= SCAN_CACHE_MAX_DISTANCE:
+                    _touch(conn, kind, best["sha256"], now)
+                    _count("near_hits")
+                    return ScanKey(sha256, phash, color), json.loads(best["result"])
+        finally:
+            conn.close()
+    except Exception as exc:
+        _count("errors")
+        logger.warning("Scan cache lookup failed — kind=%s error=%s", kind, exc)
+        return ScanKey(sha256, None), None
+
+    _count("misses")
+    return ScanKey(sha256, phash, color), None
+
+
+def store(kind: str, key: ScanKey, result: Dict[str, Any]) -> None:
+    payload = json.dumps(result)
+    if len(payload) > SCAN_CACHE_MAX_RESULT_KB * 1024:
+        return
+    bands = _bands(key.phash) if key.phash is not None else (None,) * _BANDS
+    try:
+        conn = _connect()
+        try:
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO scan_cache (kind, sha256, phash, color, band0, band1, band2, band3, "
+                "result, created_at, used_at) VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                (kind, key.sha256, f"{key.phash:016x}" if key.phash is not None else None, key.color, *bands,
+                 payload, now, now),
+            )
+            conn.execute("DELETE FROM scan_cache WHERE created_at <= ?", (now - SCAN_CACHE_TTL,))
+            conn.execute(
+                "DELETE FROM scan_cache WHERE rowid IN (SELECT rowid FROM scan_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (SCAN_CACHE_MAX_ENTRIES,),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        _count("stores")
+    except Exception as exc:
+        _count("errors")
+        logger.warning("Scan cache store failed — kind=%s error=%s", kind, exc)
+
+
+async def cached(
+    kind: str,
+    data: bytes,
+    compute: Callable[[], Awaitable[Dict[str, Any]]],
+    near_duplicates: bool = False,
+    usable: Callable[[Dict[str, Any]], bool] = None,
+) -> Dict[str, Any]:
+    """
+    The cached result of scan `kind` for image bytes `data`, or `await compute()`.
+    Only successful results are stored; `usable` can reject a hit (e.g. one
+    missing a field this caller needs), which recomputes and replaces it.
+    """
+    if not SCAN_CACHE_ENABLED:
+        return await compute()
+    key, hit = await run_io(lookup, kind, data, near_duplicates)
+    if hit is not None and (usable is None or usable(hit)):
+        return hit
+    result = await compute()
+    if result.get("success"):
+        await run_io(store, kind, key, result)
+    return result
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        counters = dict(_counters)
+    lookups = counters["exact_hits"] + counters["near_hits"] + counters["misses"]
+    hits = counters["exact_hits"] + counters["near_hits"]
+    return {**counters, "enabled": SCAN_CACHE_ENABLED, "hit_rate": round(hits / lookups, 3) if lookups else 0.0}
@@ -5,7 +5,7 @@ import colorsys
 import random
 from typing import Any, Dict, List, Tuple
 
-from .data_loader import COLOR_DICTIONARY
+from .color_names import rgb_to_color_name
 
 
 class ColorMatcher:
@@ -96,13 +96,7 @@ class ColorMatcher:
 
     @staticmethod
     def _rgb_to_color_name(rgb: Tuple[int, int, int]) -> str:
-        r, g, b = rgb
-        best, min_dist = "Gray", float("inf")
-        for name, val in COLOR_DICTIONARY.items():
-            dist = (r - val[0]) ** 2 + (g - val[1]) ** 2 + (b - val[2]) ** 2
-            if dist < min_dist:
-                min_dist, best = dist, name
-        return best
+        return rgb_to_color_name(*rgb)
 
     # ------------------------------------------------------------------
     # Suggestion engine
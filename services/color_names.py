@@ -0,0 +1,84 @@
+# services/color_names.py
+# RGB → colour name, shared by LocalComputerVision and ColorMatcher.
+#
+# Naming is nearest-neighbour over COLOR_DICTIONARY by squared RGB distance.
+# Both callers used to scan the whole dictionary in Python on every call (once
+# per swatch in get_matching_colors). Instead RGB space is cut into a 32×32×32
+# grid, built once on first use:
+#
+#   - a cell where one name is nearest to every colour in it stores that name,
+#     and the lookup is a single array index
+#   - a cell near the boundary between names stores the few names that can win
+#     somewhere inside it, and only those are compared
+#
+# so the result is exactly what the full scan returned.
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .data_loader import COLOR_DICTIONARY
+
+_SHIFT = 3                                  # 8-bit channel → 32 levels
+_LEVELS = 256 >> _SHIFT
+_CELL_RADIUS = np.sqrt(3) * ((1 << _SHIFT) - 1) / 2  # cell centre → farthest corner
+_MIXED = -1                                 # table value for cells with several candidates
+_FALLBACK = "Gray"                          # the name when the dictionary is empty
+
+
+class _NameTable:
+    def __init__(self, names: List[str], palette: np.ndarray):
+        self.names = names
+        self.palette = [tuple(int(v) for v in rgb) for rgb in palette]
+        self.candidates: Dict[int, Tuple[int, ...]] = {}
+
+        centres = np.arange(_LEVELS, dtype=np.float32) * (1 << _SHIFT) + ((1 << _SHIFT) - 1) / 2
+        grid = np.stack(np.meshgrid(centres, centres, centres, indexing="ij"), axis=-1).reshape(-1, 3)
+        cells = np.full(len(grid), _MIXED, dtype=np.int64)
+        for start in range(0, len(grid), 4096):  # bounded (4096 × names) distance matrix
+            dist = np.sqrt(((grid[start:start + 4096, None, :] - palette[None]) ** 2).sum(-1))
+            # Triangle inequality: a name more than 2·radius farther from the centre
+            # than the nearest one can't be nearest anywhere in the cell
+            within = dist <= (dist.min(axis=1) + 2 * _CELL_RADIUS + 1e-3)[:, None]
+            single = within.sum(axis=1) == 1
+            cells[start:start + 4096][single] = dist[single].argmin(axis=1)
+            for row in np.flatnonzero(~single):
+                self.candidates[start + int(row)] = tuple(int(i) for i in np.flatnonzero(within[row]))
+        self.cells: List[int] = cells.tolist()  # a list indexes faster than an array from Python
+
+    def lookup(self, r: int, g: int, b: int) -> str:
+        cell = ((r >> _SHIFT) * _LEVELS + (g >> _SHIFT)) * _LEVELS + (b >> _SHIFT)
+        i = self.cells[cell]
+        if i != _MIXED:
+            return self.names[i]
+        best, min_dist = 0, float("inf")
+        for j in self.candidates[cell]:  # ascending dictionary order, so ties go as in a full scan
+            pr, pg, pb = self.palette[j]
+            dist = (r - pr) ** 2 + (g - pg) ** 2 + (b - pb) ** 2
+            if dist < min_dist:
+                min_dist, best = dist, j
+        return self.names[best]
+
+
+_lock = threading.Lock()
+_table: Optional[_NameTable] = None
+
+
+def _name_table() -> Optional[_NameTable]:
+    global _table
+    if _table is None and COLOR_DICTIONARY:
+        with _lock:
+            if _table is None:
+                names = list(COLOR_DICTIONARY)
+                palette = np.array([COLOR_DICTIONARY[n][:3] for n in names], dtype=np.float32)
+                _table = _NameTable(names, palette)
+    return _table
+
+
+def rgb_to_color_name(r: int, g: int, b: int) -> str:
+    """Closest COLOR_DICTIONARY name for an RGB colour."""
+    table = _name_table()
+    if table is None:
+        return _FALLBACK
+    return table.lookup(*(min(255, max(0, int(c))) for c in (r, g, b)))
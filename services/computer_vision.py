@@ -3,12 +3,19 @@
 # Includes FashionCLIP embeddings, background removal, and improved color extraction.
 
 import base64
+import hashlib
 import logging
-from typing import Dict, Optional, Tuple, List, Any
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Optional, Tuple, List, Any, Sequence
 import numpy as np
 import io
 
-from .data_loader import CATEGORY_MAP, COLOR_DICTIONARY
+from .color_names import rgb_to_color_name
+from .data_loader import CATEGORY_MAP
 
 logger = logging.getLogger(__name__)
 
@@ -22,13 +29,6 @@ except (ImportError, OSError):
     CV2_AVAILABLE = False
     logger.warning("OpenCV not available - image processing will be limited")
 
-try:
-    from sklearn.cluster import KMeans
-    SKLEARN_AVAILABLE = True
-except (ImportError, OSError):
-    SKLEARN_AVAILABLE = False
-    logger.warning("sklearn not available - color clustering will use fallback")
-
 try:
     import torch
     TORCH_AVAILABLE = True
@@ -40,7 +40,7 @@ except (ImportError, OSError):
 # Background removal (rembg)
 # ------------------------------------------------------------------
 try:
-    from rembg import remove
+    from rembg import new_session, remove
     REMBG_AVAILABLE = True
 except (ImportError, OSError):
     REMBG_AVAILABLE = False
@@ -49,11 +49,32 @@ except (ImportError, OSError):
 # ------------------------------------------------------------------
 # Lazy model loaders
 # ------------------------------------------------------------------
+FASHIONCLIP_MODEL = os.getenv("FASHIONCLIP_MODEL", "patrickjohncyh/fashion-clip")
+FASHIONCLIP_REVISION = os.getenv("FASHIONCLIP_REVISION") or None
+CLIP_CACHE_DIR = os.getenv("CLIP_CACHE_DIR", "/app/data/clip_cache")
+# Image-tower backend: torch (fp32), int8 (dynamically quantized torch) or onnx (onnxruntime)
+CLIP_BACKEND = os.getenv("CLIP_BACKEND", "torch").lower()
+CLIP_ONNX_THREADS = int(os.getenv("CLIP_ONNX_THREADS", str(min(4, os.cpu_count() or 1))))
+CLIP_PARITY_MIN_COSINE = float(os.getenv("CLIP_PARITY_MIN_COSINE", "0.99"))
+# Image analysis runs at most this size on the longer side; outputs that need the
+# original resolution (background-removed PNGs) upscale the mask instead
+CV_WORKING_SIZE = int(os.getenv("CV_WORKING_SIZE", "1024"))
+# Concurrent image encodes are run as one batch; CLIP_BATCH_MAX=1 turns batching off
+CLIP_BATCH_MAX = int(os.getenv("CLIP_BATCH_MAX", "8"))
+CLIP_BATCH_WAIT_MS = float(os.getenv("CLIP_BATCH_WAIT_MS", "5"))
+# rembg model: u2net (full), u2netp (small and faster), isnet-general-use, ...
+REMBG_MODEL = os.getenv("REMBG_MODEL", "u2net")
+
 SAM_AVAILABLE = False
 FASHIONCLIP_AVAILABLE = False
 predictor = None
 clip_model = None
 clip_processor = None
+clip_backend = "torch"  # the backend actually in use, after the parity check
+clip_backend_parity: Optional[Dict[str, float]] = None
+_image_encoder = None
+rembg_session = None
+_rembg_lock = threading.Lock()
 
 
 def load_sam() -> None:
@@ -80,6 +101,21 @@ def load_sam() -> None:
         logger.warning("SAM loading failed: %s", exc)
 
 
+def load_rembg() -> None:
+    """Create the rembg session (model download + onnxruntime session) once per process."""
+    global rembg_session
+    if rembg_session is not None or not REMBG_AVAILABLE:
+        return
+    with _rembg_lock:
+        if rembg_session is not None:
+            return
+        try:
+            rembg_session = new_session(REMBG_MODEL)
+            logger.info("rembg session (%s) ready.", REMBG_MODEL)
+        except Exception as exc:
+            logger.warning("rembg session creation failed: %s", exc)
+
+
 def load_fashionclip() -> None:
     """Load FashionCLIP model for embeddings and similarity matching."""
     global FASHIONCLIP_AVAILABLE, clip_model, clip_processor
@@ -88,12 +124,505 @@ def load_fashionclip() -> None:
     try:
         from transformers import CLIPModel, CLIPProcessor
 
-        clip_model = CLIPModel.from_pretrained("patrickjohncyh/fashion-clip")
-        clip_processor = CLIPProcessor.from_pretrained("patrickjohncyh/fashion-clip")
+        clip_model = CLIPModel.from_pretrained(FASHIONCLIP_MODEL, revision=FASHIONCLIP_REVISION)
+        clip_processor = CLIPProcessor.from_pretrained(FASHIONCLIP_MODEL, revision=FASHIONCLIP_REVISION)
         FASHIONCLIP_AVAILABLE = True
         logger.info("FashionCLIP loaded successfully.")
     except (ImportError, OSError, Exception) as exc:
         logger.warning("FashionCLIP loading failed: %s", exc)
+        return
+
+    _init_clip_backend()
+
+    # Label sets are fixed, so their text embeddings are computed once, here
+    try:
+        for labels in (BROAD_LABELS, SHOE_LABELS):
+            label_text_embeddings(labels)
+    except Exception as exc:
+        logger.warning("CLIP label embedding precompute failed: %s", exc)
+
+
+# ------------------------------------------------------------------
+# CLIP label sets and their cached text embeddings
+# ------------------------------------------------------------------
+# Classification is zero-shot: softmax over image·label similarities. The label
+# side never changes, so its text-tower output is cached in memory and on disk
+# (keyed by model revision and label list); a scan only runs the image encoder.
+
+BROAD_LABELS = [
+    # Clothing
+    "t-shirt", "shirt", "blouse", "tank top", "crop top", "sweater", "hoodie",
+    "cardigan", "polo", "turtleneck",
+    "jeans", "pants", "trousers", "leggings", "shorts", "cargo pants", "joggers",
+    "skirt", "mini skirt", "midi skirt", "maxi skirt",
+    "dress", "maxi dress", "mini dress", "midi dress", "bodycon dress",
+    "jumpsuit", "romper", "overalls",
+    "jacket", "coat", "blazer", "puffer jacket", "leather jacket",
+    # Non-clothing (single representative label per category)
+    "shoes",       # shoes catch-all — Stage 2 will refine
+    "handbag", "tote bag", "backpack", "crossbody bag", "clutch",
+    "belt", "hat", "scarf", "sunglasses",
+    "necklace", "earrings", "ring", "watch",
+]
+
+
+SHOE_LABELS = [
+    "sneakers",          # general athletic / casual
+    "running shoes",     # sporty, mesh upper
+    "canvas sneakers",   # low-top canvas like Converse/Vans
+    "high-top sneakers", # high ankle athletic
+    "ankle boots",       # short shaft, any heel
+    "knee-high boots",   # tall shaft
+    "combat boots",      # chunky, lace-up, military
+    "chelsea boots",     # elastic side panel, no laces
+    "cowboy boots",      # pointed toe, stacked heel, western
+    "stiletto heels",    # very thin high heel
+    "block heels",       # chunky square heel
+    "kitten heels",      # low thin heel
+    "platform heels",    # thick platform + heel
+    "wedge heels",       # solid wedge sole
+    "strappy heels",     # open, strappy construction
+    "flat sandals",      # no heel, open toe
+    "sports sandals",    # velcro / buckle straps
+    "gladiator sandals", # multiple straps up the leg
+    "loafers",           # slip-on, closed toe, low heel
+    "oxford shoes",      # lace-up, closed toe, formal
+    "brogues",           # oxford with decorative perforations
+    "ballet flats",      # very flat, rounded toe, no fastening
+    "pointed flats",     # flat with pointed toe
+    "mules",             # backless, closed toe
+    "slide sandals",     # backless, open toe
+    "flip flops",        # thong sandal
+    "mary janes",        # rounded toe, single strap across instep
+    "platform shoes",    # thick sole all around, no distinct heel
+    "espadrilles",       # rope/jute sole
+    "monk strap shoes",  # buckle strap, no laces, formal
+]
+
+_label_embeddings: Dict[Tuple[str, ...], np.ndarray] = {}
+_label_embeddings_lock = threading.Lock()
+
+
+def _model_revision() -> str:
+    config = getattr(clip_model, "config", None)
+    return getattr(config, "_commit_hash", None) or FASHIONCLIP_REVISION or "main"
+
+
+def _label_cache_path(labels: Tuple[str, ...]) -> str:
+    digest = hashlib.sha1("\n".join(labels).encode("utf-8")).hexdigest()[:16]
+    model = FASHIONCLIP_MODEL.replace("/", "--")
+    return os.path.join(CLIP_CACHE_DIR, f"{model}@{_model_revision()[:12]}-{digest}.npy")
+
+
+def _encode_label_text(labels: Tuple[str, ...]) -> np.ndarray:
+    inputs = clip_processor(text=list(labels), return_tensors="pt", padding=True)
+    with torch.no_grad():
+        features = clip_model.get_text_features(**inputs)
+    features = features / features.norm(dim=-1, keepdim=True)
+    return features.cpu().numpy().astype(np.float32)
+
+
+def label_text_embeddings(labels: Sequence[str]) -> np.ndarray:
+    """
+    L2-normalised CLIP text embeddings for `labels`, shape (len(labels), dim).
+    Looked up in memory, then on disk, and only then run through the text encoder.
+    """
+    key = tuple(labels)
+    matrix = _label_embeddings.get(key)
+    if matrix is not None:
+        return matrix
+    with _label_embeddings_lock:
+        matrix = _label_embeddings.get(key)
+        if matrix is not None:
+            return matrix
+
+        path = _label_cache_path(key)
+        try:
+            matrix = np.load(path)
+            if matrix.ndim != 2 or matrix.shape[0] != len(key):
+                logger.warning("Ignoring malformed CLIP label cache %s", path)
+                matrix = None
+        except FileNotFoundError:
+            pass
+        except Exception as exc:
+            logger.warning("CLIP label cache unreadable (%s): %s", path, exc)
+            matrix = None
+
+        if matrix is None:
+            matrix = _encode_label_text(key)
+            try:
+                os.makedirs(CLIP_CACHE_DIR, exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    np.save(f, matrix)
+                os.replace(tmp_path, path)
+            except OSError as exc:
+                logger.warning("CLIP label cache not written (%s): %s", path, exc)
+
+        matrix.setflags(write=False)
+        _label_embeddings[key] = matrix
+        return matrix
+
+
+# ------------------------------------------------------------------
+# Micro-batching of concurrent image encodes
+# ------------------------------------------------------------------
+# Scans run on several CPU-pool threads at once, and each used to run its own
+# batch-of-one CLIP forward. Encodes now go through a single batching thread:
+# a request that arrives while the encoder is idle runs immediately, and
+# requests that pile up while it is busy are run together as one forward (up
+# to CLIP_BATCH_MAX, waiting at most CLIP_BATCH_WAIT_MS to fill the batch).
+
+class InferenceBatcher:
+    """
+    Runs `fn(items) -> results` (one result per item, same order) on batches of
+    items submitted from many threads. Each caller blocks only on its own result.
+    """
+
+    def __init__(self, name: str, fn, max_batch: int, max_wait_ms: float):
+        self.name = name
+        self._fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._last_batch_size = 0
+        self._batches = 0
+        self._items = 0
+        self._failed = 0
+        self._histogram: Dict[int, int] = {}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def submit(self, item: Any) -> "Future":
+        future: Future = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name=f"wya-{self.name}-batcher", daemon=True)
+                self._thread.start()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item: Any) -> Any:
+        return self.submit(item).result()
+
+    def _collect(self) -> List[Tuple[Any, "Future", float]]:
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch:  # everything already waiting
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        # Under load (others queued, or the last batch wasn't a single) wait briefly to fill the batch;
+        # a lone request on an idle encoder is not held back.
+        if len(batch) > 1 or self._last_batch_size > 1:
+            deadline = batch[0][2] + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            waits = [started - enqueued for _, _, enqueued in batch]
+            try:
+                results = self._fn([item for item, _, _ in batch])
+                error = None
+            except Exception as exc:
+                results, error = None, exc
+            with self._lock:
+                self._last_batch_size = len(batch)
+                self._batches += 1
+                self._items += len(batch)
+                self._histogram[len(batch)] = self._histogram.get(len(batch), 0) + 1
+                self._wait_total += sum(waits)
+                self._wait_max = max(self._wait_max, *waits)
+                if error is not None:
+                    self._failed += 1
+            for i, (_, future, _) in enumerate(batch):
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(results[i])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "batcher": self.name,
+                "max_batch": self.max_batch,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "batches": self._batches,
+                "items": self._items,
+                "failed_batches": self._failed,
+                "avg_batch": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "batch_sizes": dict(sorted(self._histogram.items())),
+                "avg_queue_wait_ms": round(self._wait_total / self._items * 1000, 2) if self._items else 0.0,
+                "max_queue_wait_ms": round(self._wait_max * 1000, 2),
+            }
+
+
+def _encode_image_batch(pixel_values: List["torch.Tensor"]) -> List["torch.Tensor"]:
+    encoder = _image_encoder or _torch_image_encoder(clip_model)
+    return list(encoder(torch.cat(pixel_values)).split(1))
+
+
+clip_batcher = InferenceBatcher("clip", _encode_image_batch, CLIP_BATCH_MAX, CLIP_BATCH_WAIT_MS)
+
+
+def _clip_image_embeds(pil_img) -> "torch.Tensor":
+    """L2-normalised CLIP image embedding, shape (1, dim), from the configured backend."""
+    pixel_values = clip_processor(images=pil_img, return_tensors="pt")["pixel_values"]
+    if clip_batcher.max_batch > 1:
+        return clip_batcher(pixel_values)
+    return _encode_image_batch([pixel_values])[0]
+
+
+# ------------------------------------------------------------------
+# CLIP image-tower backends
+# ------------------------------------------------------------------
+# The image encoder is the per-scan cost (label text embeddings are cached), so
+# it can run on a cheaper backend than the fp32 model. An encoder maps
+# pixel_values (N, 3, H, W) to L2-normalised embeddings (N, dim). A non-default
+# backend is only used if it matches fp32 on a parity check at load time.
+
+def _torch_image_encoder(model) -> Any:
+    def encode(pixel_values: "torch.Tensor") -> "torch.Tensor":
+        with torch.no_grad():
+            features = model.get_image_features(pixel_values=pixel_values)
+        return features / features.norm(dim=-1, keepdim=True)
+    return encode
+
+
+def _int8_image_encoder() -> Any:
+    """Dynamic int8 quantization of the vision tower's Linear layers (int8 weights, fp32 activations)."""
+    tower = torch.quantization.quantize_dynamic(
+        torch.nn.ModuleDict({"vision": clip_model.vision_model, "projection": clip_model.visual_projection}),
+        {torch.nn.Linear}, dtype=torch.qint8,
+    )
+
+    def encode(pixel_values: "torch.Tensor") -> "torch.Tensor":
+        with torch.no_grad():
+            pooled = tower["vision"](pixel_values=pixel_values).pooler_output
+            features = tower["projection"](pooled)
+        return features / features.norm(dim=-1, keepdim=True)
+    return encode
+
+
+def _onnx_model_path() -> str:
+    model = FASHIONCLIP_MODEL.replace("/", "--")
+    return os.path.join(CLIP_CACHE_DIR, f"{model}@{_model_revision()[:12]}-image.onnx")
+
+
+def _export_image_tower(path: str) -> None:
+    class ImageTower(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            features = self.model.get_image_features(pixel_values=pixel_values)
+            return features / features.norm(dim=-1, keepdim=True)
+
+    size = (getattr(clip_processor.image_processor, "crop_size", None) or {}).get("height", 224)
+    os.makedirs(CLIP_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    torch.onnx.export(
+        ImageTower(clip_model).eval(), (torch.zeros(1, 3, size, size),), tmp_path,
+        input_names=["pixel_values"], output_names=["image_embeds"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+        opset_version=17,
+    )
+    os.replace(tmp_path, path)
+    logger.info("FashionCLIP image tower exported to %s", path)
+
+
+def _onnx_image_encoder() -> Any:
+    """The image tower exported to ONNX (once per model revision) and run under onnxruntime."""
+    import onnxruntime as ort
+
+    path = _onnx_model_path()
+    if not os.path.exists(path):
+        _export_image_tower(path)
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = CLIP_ONNX_THREADS
+    options.inter_op_num_threads = 1
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def encode(pixel_values: "torch.Tensor") -> "torch.Tensor":
+        inputs = {"pixel_values": pixel_values.cpu().numpy().astype(np.float32)}
+        return torch.from_numpy(session.run(["image_embeds"], inputs)[0])
+    return encode
+
+
+def _parity_images(count: int = 4) -> List[Any]:
+    """A colour ramp plus seeded noise — enough to expose numeric drift in the image tower."""
+    from PIL import Image
+    rng = np.random.default_rng(0)
+    ramp = np.linspace(0, 255, 224, dtype=np.uint8)
+    images = [np.dstack([np.tile(ramp, (224, 1)), np.tile(ramp[:, None], (1, 224)), np.full((224, 224), 128, np.uint8)])]
+    images += [rng.integers(0, 256, (224, 224, 3), dtype=np.uint8) for _ in range(count - 1)]
+    return [Image.fromarray(image) for image in images]
+
+
+def _compare_embeddings(reference: np.ndarray, candidate: np.ndarray, text: np.ndarray) -> Dict[str, float]:
+    """Cosine similarity between paired (normalised) embeddings, and how often the top label agrees."""
+    cosine = np.sum(reference * candidate, axis=1)
+    agree = (reference @ text.T).argmax(axis=1) == (candidate @ text.T).argmax(axis=1)
+    return {
+        "min_cosine": round(float(cosine.min()), 5),
+        "mean_cosine": round(float(cosine.mean()), 5),
+        "top1_agreement": round(float(agree.mean()), 3),
+    }
+
+
+def check_backend_parity(encoder: Any, images: Optional[List[Any]] = None) -> Dict[str, float]:
+    """Compare `encoder` with the fp32 torch image tower on `images` (default: synthetic ones)."""
+    pixel_values = clip_processor(images=images or _parity_images(), return_tensors="pt")["pixel_values"]
+    reference = _torch_image_encoder(clip_model)(pixel_values).cpu().numpy()
+    candidate = encoder(pixel_values).cpu().numpy()
+    return _compare_embeddings(reference, candidate, label_text_embeddings(BROAD_LABELS))
+
+
+def _init_clip_backend() -> None:
+    """Select the image encoder for CLIP_BACKEND; fp32 torch if it can't be built or drifts from it."""
+    global clip_backend, clip_backend_parity, _image_encoder
+    _image_encoder, clip_backend, clip_backend_parity = _torch_image_encoder(clip_model), "torch", None
+    if CLIP_BACKEND == "torch":
+        return
+    builders = {"int8": _int8_image_encoder, "onnx": _onnx_image_encoder}
+    if CLIP_BACKEND not in builders:
+        logger.warning("Unknown CLIP_BACKEND=%s — using torch", CLIP_BACKEND)
+        return
+    try:
+        encoder = builders[CLIP_BACKEND]()
+        clip_backend_parity = check_backend_parity(encoder)
+    except Exception as exc:
+        logger.warning("CLIP %s backend unavailable: %s — using torch", CLIP_BACKEND, exc)
+        return
+    if clip_backend_parity["min_cosine"] < CLIP_PARITY_MIN_COSINE:
+        logger.warning("CLIP %s backend failed parity %s — using torch", CLIP_BACKEND, clip_backend_parity)
+        return
+    _image_encoder, clip_backend = encoder, CLIP_BACKEND
+    logger.info("CLIP image tower on %s backend — parity %s", CLIP_BACKEND, clip_backend_parity)
+
+
+def _clip_label_probs(image_embeds: "torch.Tensor", labels: Sequence[str]) -> "torch.Tensor":
+    """
+    Softmax over `labels` for one image, shape (1, len(labels)) — the same
+    numbers as CLIPModel(text=labels, images=...).logits_per_image.softmax(dim=1).
+    """
+    text_embeds = torch.from_numpy(label_text_embeddings(labels))
+    with torch.no_grad():
+        logits = clip_model.logit_scale.exp() * image_embeds @ text_embeds.T
+    return logits.softmax(dim=1)
+
+
+# ------------------------------------------------------------------
+# Dominant-colour quantization
+# ------------------------------------------------------------------
+# get_dominant_color used to fit KMeans(n_init=5) on every masked pixel. It now
+# clusters a 32×32×32 colour histogram of a fixed-size pixel sample instead: a
+# few hundred weighted bin centroids rather than up to a million pixels.
+
+COLOR_SAMPLE_BUDGET = int(os.getenv("COLOR_SAMPLE_BUDGET", "20000"))
+SECONDARY_COLOR_MIN_SHARE = 0.15  # of the clustered pixels
+_HIST_SHIFT = 3  # 8-bit channel → 32 levels
+
+
+def _color_histogram(rgb: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(mean RGB of each occupied 32³ bin, pixel count per bin) for an (N, 3) uint8 array."""
+    q = rgb.astype(np.int32) >> _HIST_SHIFT
+    idx = (q[:, 0] << 10) | (q[:, 1] << 5) | q[:, 2]
+    counts = np.bincount(idx, minlength=1 << 15)
+    occupied = np.flatnonzero(counts)
+    sums = np.stack(
+        [np.bincount(idx, weights=rgb[:, c], minlength=1 << 15)[occupied] for c in range(3)], axis=1
+    )
+    weights = counts[occupied].astype(np.float64)
+    return sums / weights[:, None], weights
+
+
+def _weighted_kmeans(points: np.ndarray, weights: np.ndarray, k: int,
+                     iterations: int = 30, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """Lloyd's k-means on weighted points (k-means++ seeding); returns (centers, total weight per center)."""
+    k = max(1, min(k, len(points)))
+    rng = np.random.default_rng(seed)
+    centers = [points[np.argmax(weights)]]
+    for _ in range(1, k):
+        d2 = np.min(((points[:, None, :] - np.asarray(centers)[None]) ** 2).sum(-1), axis=1)
+        p = weights * d2
+        if p.sum() <= 0:
+            break
+        centers.append(points[rng.choice(len(points), p=p / p.sum())])
+    centers = np.asarray(centers, dtype=np.float64)
+
+    for _ in range(iterations):
+        labels = ((points[:, None, :] - centers[None]) ** 2).sum(-1).argmin(axis=1)
+        totals = np.bincount(labels, weights=weights, minlength=len(centers))
+        sums = np.stack([np.bincount(labels, weights=weights * points[:, c], minlength=len(centers))
+                         for c in range(3)], axis=1)
+        updated = np.where(totals[:, None] > 0, sums / np.maximum(totals, 1e-12)[:, None], centers)
+        if np.allclose(updated, centers, atol=0.5):
+            centers = updated
+            break
+        centers = updated
+
+    labels = ((points[:, None, :] - centers[None]) ** 2).sum(-1).argmin(axis=1)
+    return centers, np.bincount(labels, weights=weights, minlength=len(centers))
+
+
+def _merge_close_clusters(centers: np.ndarray, weights: np.ndarray,
+                          distance: float = 40.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fold clusters closer than `distance` (RGB) into the heavier one. Shading and
+    noise split one fabric colour over several clusters; merged, the weights
+    say how much of the garment each actual colour covers.
+    """
+    merged_centers: List[np.ndarray] = []
+    merged_weights: List[float] = []
+    for j in np.argsort(weights)[::-1]:
+        for m, center in enumerate(merged_centers):
+            if np.linalg.norm(center - centers[j]) < distance:
+                total = merged_weights[m] + weights[j]
+                merged_centers[m] = (center * merged_weights[m] + centers[j] * weights[j]) / total
+                merged_weights[m] = total
+                break
+        else:
+            merged_centers.append(centers[j].astype(np.float64))
+            merged_weights.append(float(weights[j]))
+    return np.asarray(merged_centers), np.asarray(merged_weights)
+
+
+# ------------------------------------------------------------------
+# Per-request analysis state
+# ------------------------------------------------------------------
+class AnalysisContext:
+    """
+    State shared by the analysis steps for one image. The shared
+    LocalComputerVision instance is used from several threads at once, so
+    results that aren't return values (secondary colour, shoe sub-type) and
+    the CLIP image embedding live here rather than on the engine.
+    """
+
+    def __init__(self):
+        self.image_embeds: Optional["torch.Tensor"] = None  # normalised (1, d), from the garment crop
+        self.secondary_color: Optional[str] = None
+        self.shoe_subtype: str = "Shoes"
+
+    def embedding(self) -> Optional[np.ndarray]:
+        """The image embedding as a float32 vector, or None if CLIP didn't run."""
+        if self.image_embeds is None:
+            return None
+        return self.image_embeds[0].detach().cpu().numpy().astype(np.float32)
 
 
 # ------------------------------------------------------------------
@@ -104,71 +633,138 @@ class LocalComputerVision:
 
     # ---- image decoding ----
 
-    def decode_image(self, base64_str: str) -> np.ndarray:
-        """Decode base64 image to numpy array."""
-        if not CV2_AVAILABLE:
-            logger.error("OpenCV not available for image decoding")
-            return np.zeros((256, 256, 3), dtype=np.uint8)
+    def decode_image(self, base64_str: str, max_side: Optional[int] = None) -> np.ndarray:
+        """Decode base64 image to numpy array (see decode_image_bytes for `max_side`)."""
         try:
             if "," in base64_str:
                 base64_str = base64_str.split(",")[1]
             if not base64_str or len(base64_str) < 100:
                 raise ValueError("Invalid base64 image data")
             img_data = base64.b64decode(base64_str)
-            nparr = np.frombuffer(img_data, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        except Exception as exc:
+            logger.error("Image decode error: %s", exc)
+            return np.zeros((256, 256, 3), dtype=np.uint8)
+        return self.decode_image_bytes(img_data, max_side)
+
+    def decode_image_bytes(self, data, max_side: Optional[int] = None) -> np.ndarray:
+        """
+        Decode encoded image bytes (PNG/JPEG/WebP; any buffer) to a BGR numpy array.
+        With `max_side`, the result's longer side is at most that: the size is
+        read from the header first and JPEGs are decoded straight at 1/2, 1/4 or
+        1/8 scale, so a 12MP photo never exists in memory at full resolution.
+        """
+        if not CV2_AVAILABLE:
+            logger.error("OpenCV not available for image decoding")
+            return np.zeros((256, 256, 3), dtype=np.uint8)
+        try:
+            nparr = np.frombuffer(data, np.uint8)
+            img = cv2.imdecode(nparr, self._decode_flag(data, max_side))
             if img is None:
                 raise ValueError("cv2.imdecode returned None")
             if img.shape[0] < 10 or img.shape[1] < 10:
                 raise ValueError(f"Image too small: {img.shape}")
-            return img
+            return self.to_working_size(img, max_side) if max_side else img
         except Exception as exc:
             logger.error("Image decode error: %s", exc)
             return np.zeros((256, 256, 3), dtype=np.uint8)
 
+    @staticmethod
+    def _decode_flag(data, max_side: Optional[int]) -> int:
+        """The largest reduced-decode scale that keeps the image at least `max_side` on its longer side."""
+        if not max_side:
+            return cv2.IMREAD_COLOR
+        try:
+            from PIL import Image as PILImage
+            with PILImage.open(io.BytesIO(data)) as header:  # lazy: reads the header, not the pixels
+                long_side = max(header.size)
+        except Exception:
+            return cv2.IMREAD_COLOR
+        for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                             (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if long_side // factor >= max_side:
+                return flag
+        return cv2.IMREAD_COLOR
+
+    @staticmethod
+    def to_working_size(image: np.ndarray, max_side: int = None) -> np.ndarray:
+        """`image` scaled down (never up) so its longer side is at most `max_side` (default CV_WORKING_SIZE)."""
+        max_side = max_side or CV_WORKING_SIZE
+        h, w = image.shape[:2]
+        if max(h, w) <= max_side:
+            return image
+        scale = max_side / max(h, w)
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
     def encode_image_to_base64(self, image: np.ndarray) -> str:
         """Encode numpy image to base64 string."""
+        data = self.encode_image_png(image)
+        return base64.b64encode(data).decode('utf-8') if data else ""
+
+    def encode_image_png(self, image: np.ndarray) -> bytes:
+        """Encode numpy image to PNG bytes (b'' on failure)."""
         if not CV2_AVAILABLE:
-            return ""
+            return b""
         try:
             _, buffer = cv2.imencode('.png', image)
-            return base64.b64encode(buffer).decode('utf-8')
+            return buffer.tobytes()
         except Exception as exc:
             logger.error("Image encode error: %s", exc)
-            return ""
+            return b""
 
     # ---- background removal ----
 
-    def remove_background(self, image: np.ndarray) -> np.ndarray:
+    def remove_background(self, image: np.ndarray, alpha_matting: bool = False) -> np.ndarray:
         """
-        Remove background using rembg (returns RGBA numpy array with true transparency).
+        Remove background using rembg (returns a BGRA numpy array with true transparency).
         Falls back to GrabCut masking with white background if rembg is unavailable.
         """
         if not CV2_AVAILABLE:
             return image
 
         if REMBG_AVAILABLE:
-            try:
-                from PIL import Image as PILImage
-                rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                pil_in = PILImage.fromarray(rgb)
-                pil_out = remove(pil_in)   # RGBA PIL Image
-                return np.array(pil_out)   # shape (H, W, 4)
-            except Exception as exc:
-                logger.warning("rembg failed: %s — using GrabCut fallback", exc)
-
-        # GrabCut fallback — white background, no alpha
-        mask = self.get_improved_mask(image)
+            load_rembg()
+            if rembg_session is not None:
+                try:
+                    return self._rembg_cutout(image, alpha_matting)
+                except Exception as exc:
+                    logger.warning("rembg failed: %s — using GrabCut fallback", exc)
+
+        # GrabCut fallback — white background, no alpha. The mask is computed at
+        # working size and only scaled up to cut the full-resolution image.
+        mask = self.get_improved_mask(self.to_working_size(image))
+        if mask.shape[:2] != image.shape[:2]:
+            mask = cv2.resize(mask, (image.shape[1], image.shape[0]), interpolation=cv2.INTER_LINEAR)
+            mask = np.where(mask >= 128, 255, 0).astype(np.uint8)
         result = image.copy()
         result[mask == 0] = [255, 255, 255]
         return result
 
+    def _rembg_cutout(self, image: np.ndarray, alpha_matting: bool) -> np.ndarray:
+        if alpha_matting:
+            # Matting refines the edge against the full-resolution pixels, so it gets the whole image
+            rgba = remove(cv2.cvtColor(image, cv2.COLOR_BGR2RGB), session=rembg_session, alpha_matting=True)
+            return cv2.cvtColor(np.asarray(rgba, dtype=np.uint8), cv2.COLOR_RGBA2BGRA)
+        # The network sees a 320×320 resize either way: predict the mask at working size and
+        # scale it up (soft edges kept) onto the original pixels
+        small = self.to_working_size(image)
+        mask = remove(cv2.cvtColor(small, cv2.COLOR_BGR2RGB), session=rembg_session, only_mask=True)
+        mask = np.asarray(mask, dtype=np.uint8)
+        if mask.shape[:2] != image.shape[:2]:
+            mask = cv2.resize(mask, (image.shape[1], image.shape[0]), interpolation=cv2.INTER_LINEAR)
+        return cv2.merge((*cv2.split(image), mask))
+
+    def remove_background_png(self, image: np.ndarray, alpha_matting: bool = False) -> bytes:
+        """PNG bytes of `image` with its background removed (b'' on failure)."""
+        return self.encode_image_png(self.remove_background(image, alpha_matting))
+
     def encode_image_to_base64_png(self, image: np.ndarray) -> str:
         """Encode RGB/BGR/RGBA numpy array to base64 PNG, preserving alpha if present."""
         try:
             from PIL import Image as PILImage
             if image.ndim == 3 and image.shape[2] == 4:
-                pil = PILImage.fromarray(image, "RGBA")
+                rgba = cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA) if CV2_AVAILABLE else image
+                pil = PILImage.fromarray(rgba, "RGBA")
             else:
                 rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if CV2_AVAILABLE else image
                 pil = PILImage.fromarray(rgb, "RGB")
@@ -181,8 +777,13 @@ class LocalComputerVision:
 
     # ---- FashionCLIP embeddings ----
 
-    def get_image_embedding(self, image: np.ndarray) -> np.ndarray:
-        """Generate FashionCLIP embedding for similarity comparison."""
+    def get_image_embedding(self, image: np.ndarray, ctx: Optional[AnalysisContext] = None) -> np.ndarray:
+        """
+        Generate FashionCLIP embedding for similarity comparison. Reuses the
+        embedding identify_garment() stored on `ctx` instead of running CLIP again.
+        """
+        if ctx is not None and ctx.image_embeds is not None:
+            return ctx.embedding()
         load_fashionclip()
         if not FASHIONCLIP_AVAILABLE or not TORCH_AVAILABLE:
             # Fallback to pseudo-embedding based on color/texture
@@ -195,14 +796,7 @@ class LocalComputerVision:
             rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
             pil_img = Image.fromarray(rgb_image)
             
-            # Process through FashionCLIP
-            inputs = clip_processor(images=pil_img, return_tensors="pt")
-            with torch.no_grad():
-                embedding = clip_model.get_image_features(**inputs)
-            
-            # Normalize
-            embedding = embedding / embedding.norm(dim=-1, keepdim=True)
-            return embedding.cpu().numpy()[0]
+            return _clip_image_embeds(pil_img).cpu().numpy()[0]
             
         except Exception as exc:
             logger.warning("FashionCLIP embedding failed: %s", exc)
@@ -331,55 +925,23 @@ class LocalComputerVision:
 
     # ── Dedicated shoe sub-classifier ───────────────────────────────────────
 
-    def _classify_shoe_subtype(self, pil_img, image_np: np.ndarray) -> str:
+    def _classify_shoe_subtype(self, pil_img, image_np: np.ndarray, image_embeds=None) -> str:
         """
         Two-pass shoe identification:
           Pass 1 — broad CLIP categories to confirm it's a shoe.
           Pass 2 — focused CLIP call with only shoe labels.
           Pass 3 — CV shape heuristics as tiebreaker (heel height, sole thickness, openness).
+        `image_embeds` is the crop's CLIP embedding when the caller already has it.
         """
         import torch
 
         # ── Pass 2: focused shoe-only CLIP ──────────────────────────────────
-        shoe_labels = [
-            "sneakers",          # general athletic / casual
-            "running shoes",     # sporty, mesh upper
-            "canvas sneakers",   # low-top canvas like Converse/Vans
-            "high-top sneakers", # high ankle athletic
-            "ankle boots",       # short shaft, any heel
-            "knee-high boots",   # tall shaft
-            "combat boots",      # chunky, lace-up, military
-            "chelsea boots",     # elastic side panel, no laces
-            "cowboy boots",      # pointed toe, stacked heel, western
-            "stiletto heels",    # very thin high heel
-            "block heels",       # chunky square heel
-            "kitten heels",      # low thin heel
-            "platform heels",    # thick platform + heel
-            "wedge heels",       # solid wedge sole
-            "strappy heels",     # open, strappy construction
-            "flat sandals",      # no heel, open toe
-            "sports sandals",    # velcro / buckle straps
-            "gladiator sandals", # multiple straps up the leg
-            "loafers",           # slip-on, closed toe, low heel
-            "oxford shoes",      # lace-up, closed toe, formal
-            "brogues",           # oxford with decorative perforations
-            "ballet flats",      # very flat, rounded toe, no fastening
-            "pointed flats",     # flat with pointed toe
-            "mules",             # backless, closed toe
-            "slide sandals",     # backless, open toe
-            "flip flops",        # thong sandal
-            "mary janes",        # rounded toe, single strap across instep
-            "platform shoes",    # thick sole all around, no distinct heel
-            "espadrilles",       # rope/jute sole
-            "monk strap shoes",  # buckle strap, no laces, formal
-        ]
-
-        inputs = clip_processor(text=shoe_labels, images=pil_img, return_tensors="pt", padding=True)
-        with torch.no_grad():
-            probs = clip_model(**inputs).logits_per_image.softmax(dim=1)[0]
+        if image_embeds is None:
+            image_embeds = _clip_image_embeds(pil_img)
+        probs = _clip_label_probs(image_embeds, SHOE_LABELS)[0]
 
         top_probs, top_idx = torch.topk(probs, 5)
-        top_labels = [shoe_labels[i] for i in top_idx]
+        top_labels = [SHOE_LABELS[i] for i in top_idx]
         top_scores = [p.item() for p in top_probs]
 
         # Aggregate into sub-type buckets
@@ -541,8 +1103,15 @@ class LocalComputerVision:
 
     # ── Main garment identifier ──────────────────────────────────────────────
 
-    def identify_garment(self, image: np.ndarray, mask: np.ndarray) -> str:
-        """Identify garment category using FashionCLIP (two-stage for shoes)."""
+    def identify_garment(
+        self, image: np.ndarray, mask: np.ndarray, ctx: Optional[AnalysisContext] = None
+    ) -> str:
+        """
+        Identify garment category using FashionCLIP (two-stage for shoes).
+        The crop's image embedding and the shoe sub-type are left on `ctx`.
+        """
+        ctx = ctx if ctx is not None else AnalysisContext()
+        ctx.shoe_subtype = "Shoes"
         load_fashionclip()
         if not FASHIONCLIP_AVAILABLE:
             return self._identify_garment_hf_api(image)
@@ -565,27 +1134,13 @@ class LocalComputerVision:
             pil_img = Image.fromarray(cv2.cvtColor(cropped, cv2.COLOR_BGR2RGB))
 
             # ── Stage 1: broad category detection ───────────────────────────
-            broad_labels = [
-                # Clothing
-                "t-shirt", "shirt", "blouse", "tank top", "crop top", "sweater", "hoodie",
-                "cardigan", "polo", "turtleneck",
-                "jeans", "pants", "trousers", "leggings", "shorts", "cargo pants", "joggers",
-                "skirt", "mini skirt", "midi skirt", "maxi skirt",
-                "dress", "maxi dress", "mini dress", "midi dress", "bodycon dress",
-                "jumpsuit", "romper", "overalls",
-                "jacket", "coat", "blazer", "puffer jacket", "leather jacket",
-                # Non-clothing (single representative label per category)
-                "shoes",       # shoes catch-all — Stage 2 will refine
-                "handbag", "tote bag", "backpack", "crossbody bag", "clutch",
-                "belt", "hat", "scarf", "sunglasses",
-                "necklace", "earrings", "ring", "watch",
-            ]
-            inputs = clip_processor(text=broad_labels, images=pil_img, return_tensors="pt", padding=True)
-            with torch.no_grad():
-                probs = clip_model(**inputs).logits_per_image.softmax(dim=1)
+            if ctx.image_embeds is None:
+                ctx.image_embeds = _clip_image_embeds(pil_img)
+            image_embeds = ctx.image_embeds
+            probs = _clip_label_probs(image_embeds, BROAD_LABELS)
 
             top_probs, top_indices = torch.topk(probs[0], 5)
-            top_labels = [broad_labels[i] for i in top_indices]
+            top_labels = [BROAD_LABELS[i] for i in top_indices]
             top_scores = [p.item() for p in top_probs]
 
             scores: Dict[str, float] = {
@@ -611,13 +1166,9 @@ class LocalComputerVision:
                         scores[bucket] += score
                         break
 
-            # Reset side-effect slots
-            self._last_secondary_color: Optional[str] = None
-            self._last_shoe_subtype: str = "Shoes"
-
             # ── Accessory / jewellery / bag — high specificity ───────────────
             if scores["jewellery"] > 0.2:
-                raw = broad_labels[probs.argmax().item()]
+                raw = BROAD_LABELS[probs.argmax().item()]
                 if "watch"    in raw: return "Watch"
                 if "necklace" in raw: return "Necklace"
                 if "ring"     in raw: return "Ring"
@@ -630,8 +1181,7 @@ class LocalComputerVision:
 
             # ── Shoes — Stage 2 focused sub-classifier ───────────────────────
             if scores["shoes"] > 0.18:
-                subtype = self._classify_shoe_subtype(pil_img, cropped)
-                self._last_shoe_subtype = subtype
+                ctx.shoe_subtype = self._classify_shoe_subtype(pil_img, cropped, image_embeds)
                 return "Shoes"
 
             # ── Clothing decision tree ───────────────────────────────────────
@@ -642,7 +1192,7 @@ class LocalComputerVision:
             if scores["pants"] > 0.3:
                 if scores["jumpsuit"] > 0.2 and aspect_ratio > 2.0:
                     return "Jumpsuit"
-                raw = broad_labels[probs.argmax().item()]
+                raw = BROAD_LABELS[probs.argmax().item()]
                 if "short"  in raw: return "Shorts"
                 if "jean"   in raw: return "Jeans"
                 if "legging" in raw: return "Trousers"
@@ -652,12 +1202,12 @@ class LocalComputerVision:
                     return "Jumpsuit"
                 return "Dress"
             if scores["top"] > 0.3:
-                raw = broad_labels[probs.argmax().item()]
+                raw = BROAD_LABELS[probs.argmax().item()]
                 if "sweater"  in raw or "cardigan" in raw: return "Sweater"
                 if "t-shirt"  in raw:                      return "T-Shirt"
                 return "Top"
             if scores["outerwear"] > 0.3:
-                raw = broad_labels[probs.argmax().item()]
+                raw = BROAD_LABELS[probs.argmax().item()]
                 return "Jacket" if "blazer" in raw or "jacket" in raw else "Outerwear"
 
             # Tiebreakers
@@ -666,7 +1216,7 @@ class LocalComputerVision:
             if scores["jumpsuit"] > 0.15 and scores["skirt"] > 0.15:
                 return "Jumpsuit" if aspect_ratio > 2.2 else "Skirt"
 
-            raw = broad_labels[probs.argmax().item()]
+            raw = BROAD_LABELS[probs.argmax().item()]
             if "skirt" in raw.lower() and aspect_ratio < 2.5:
                 return "Skirt"
             return CATEGORY_MAP.get(raw, "Top")
@@ -678,10 +1228,15 @@ class LocalComputerVision:
     # ---- colour extraction ----
 
     def get_dominant_color(
-        self, image: np.ndarray, mask: np.ndarray
+        self, image: np.ndarray, mask: np.ndarray, ctx: Optional[AnalysisContext] = None
     ) -> Tuple[str, str, Tuple[int, int, int]]:
-        """Return (hex, color_name, rgb_tuple) for the dominant garment colour."""
-        if not CV2_AVAILABLE or not SKLEARN_AVAILABLE:
+        """
+        Return (hex, color_name, rgb_tuple) for the dominant garment colour.
+        A distinct second colour, if any, is left on `ctx.secondary_color`.
+        """
+        ctx = ctx if ctx is not None else AnalysisContext()
+        ctx.secondary_color = None
+        if not CV2_AVAILABLE:
             return "#808080", "Gray", (128, 128, 128)
 
         mask = mask.astype(np.uint8)
@@ -700,6 +1255,8 @@ class LocalComputerVision:
         pixels = image[mask > 0]
         if len(pixels) < 1_000:
             return "#808080", "Gray", (128, 128, 128)
+        if len(pixels) > COLOR_SAMPLE_BUDGET:  # fixed budget, evenly spread over the garment
+            pixels = pixels[np.linspace(0, len(pixels) - 1, COLOR_SAMPLE_BUDGET).astype(np.intp)]
 
         px_rgb = cv2.cvtColor(pixels.reshape(-1, 1, 3), cv2.COLOR_BGR2RGB).reshape(-1, 3)
         px_hsv = cv2.cvtColor(pixels.reshape(-1, 1, 3), cv2.COLOR_BGR2HSV).reshape(-1, 3)
@@ -711,19 +1268,19 @@ class LocalComputerVision:
         )
         filtered = px_rgb[quality] if np.sum(quality) > 500 else px_rgb
 
+        # One pass: 32³ histogram of the sampled pixels, then a weighted k-means over its bins
+        centers, weights = None, None
         try:
-            n = min(5, max(3, len(filtered) // 1_000))
-            km = KMeans(n_clusters=n, n_init=5, random_state=42)
-            km.fit(filtered)
-            counts = np.bincount(km.labels_)
-            for idx in np.argsort(counts)[::-1][:2]:
-                rgb = km.cluster_centers_[idx].astype(int)
-                if 60 < int(rgb.sum()) < 750:
-                    r, g, b = int(rgb[0]), int(rgb[1]), int(rgb[2])
+            bins, bin_weights = _color_histogram(filtered)
+            centers, weights = _weighted_kmeans(bins, bin_weights, k=min(5, max(3, len(filtered) // 1_000)))
+            centers, weights = _merge_close_clusters(centers, weights)
+            order = np.argsort(weights)[::-1]
+            for idx in order[:2]:
+                if 60 < int(centers[idx].astype(int).sum()) < 750:
                     break
             else:
-                rgb = km.cluster_centers_[np.argsort(counts)[-1]].astype(int)
-                r, g, b = int(rgb[0]), int(rgb[1]), int(rgb[2])
+                idx = order[0]
+            r, g, b = (int(x) for x in centers[idx])
         except Exception:
             r, g, b = (int(x) for x in np.median(filtered, axis=0))
 
@@ -733,32 +1290,21 @@ class LocalComputerVision:
 
         hex_color = "#{:02x}{:02x}{:02x}".format(r, g, b)
 
-        # ── Secondary color (2nd largest cluster, if distinct enough) ──
-        self._last_secondary_color: Optional[str] = None
-        self._last_shoe_subtype: str = "Shoes"
-        if SKLEARN_AVAILABLE:
-            try:
-                counts_sorted = np.argsort(np.bincount(km.labels_))[::-1]
-                if len(counts_sorted) > 1:
-                    sec_rgb = km.cluster_centers_[counts_sorted[1]].astype(int)
-                    sec_r, sec_g, sec_b = int(sec_rgb[0]), int(sec_rgb[1]), int(sec_rgb[2])
-                    # Only report secondary if visually distinct from primary
-                    dist = ((r - sec_r)**2 + (g - sec_g)**2 + (b - sec_b)**2) ** 0.5
-                    if dist > 60:
-                        self._last_secondary_color = self._map_rgb_to_color_name(sec_r, sec_g, sec_b)
-            except Exception:
-                pass
+        # ── Secondary color: the largest other cluster that is visually distinct and not a speck ──
+        if centers is not None:
+            total = float(weights.sum())
+            for j in np.argsort(weights)[::-1]:
+                sec_r, sec_g, sec_b = (int(x) for x in centers[j])
+                dist = ((r - sec_r)**2 + (g - sec_g)**2 + (b - sec_b)**2) ** 0.5
+                if dist > 60 and weights[j] >= SECONDARY_COLOR_MIN_SHARE * total:
+                    ctx.secondary_color = self._map_rgb_to_color_name(sec_r, sec_g, sec_b)
+                    break
 
         return hex_color, name, (r, g, b)
 
     def _map_rgb_to_color_name(self, r: int, g: int, b: int) -> str:
         """Map RGB values to closest color name from dictionary."""
-        best, min_dist = "Gray", float("inf")
-        for name, val in COLOR_DICTIONARY.items():
-            dist = (r - val[0]) ** 2 + (g - val[1]) ** 2 + (b - val[2]) ** 2
-            if dist < min_dist:
-                min_dist, best = dist, name
-        return best
+        return rgb_to_color_name(r, g, b)
 
     # ---- texture analysis ----
 
@@ -20,6 +20,8 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from typing import Optional
 
+from executors import run_io
+
 logger = logging.getLogger(__name__)
 
 GMAIL_ADDRESS: Optional[str] = os.getenv("WYA_GMAIL_ADDRESS")
@@ -76,7 +78,7 @@ class EmailService:
         <p>Your Gmail notification setup is working correctly.</p>
         </body></html>
         """
-        return self._send(to_email, "WYA — Email notification test", html)
+        return await run_io(self._send, to_email, "WYA — Email notification test", html)
 
 
 # Module-level singleton
@@ -0,0 +1,133 @@
+# services/model_warmup.py
+# Model preload + warmup, started from main.lifespan.
+#
+# FashionCLIP, SAM and the rembg session are otherwise loaded by the first scan
+# that needs them, so that request pays for from_pretrained / the checkpoint read
+# and for the first forward pass (allocator growth, lazy kernel setup). Here they are loaded
+# at startup and run once on a synthetic image; /health/ready stays 503 until
+# this has finished, so traffic only arrives once the models are warm.
+#
+# In CV_WORKER_MODE=process the models live in the worker processes, so the
+# warmup runs there (see vision_workers.warmup) and the timings are reported back.
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict
+
+import numpy as np
+
+from executors import run_cpu
+from services import computer_vision as cv
+
+logger = logging.getLogger(__name__)
+
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "true").lower() == "true"
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+
+# pending → warming → ready | degraded (warmup raised; models still load lazily), or disabled
+READY_STATES = {"ready", "degraded", "disabled"}
+
+_lock = threading.Lock()
+_state: Dict[str, Any] = {
+    "status": "pending" if MODEL_PRELOAD else "disabled",
+    "started_at": None,
+    "finished_at": None,
+    "models": {},
+    "clip_backend": None,
+    "timings_ms": {},
+    "error": None,
+}
+
+
+def status() -> Dict[str, Any]:
+    with _lock:
+        return {**_state, "models": dict(_state["models"]), "timings_ms": dict(_state["timings_ms"])}
+
+
+def is_ready() -> bool:
+    with _lock:
+        return _state["status"] in READY_STATES
+
+
+def _set_state(**fields: Any) -> None:
+    with _lock:
+        _state.update(fields)
+
+
+def _timed(timings: Dict[str, float], key: str, fn, *args: Any) -> Any:
+    start = time.perf_counter()
+    result = fn(*args)
+    timings[key] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def _warmup_image() -> np.ndarray:
+    """A 256×256 BGR 'garment': a two-tone rectangle on a light gradient background."""
+    image = np.tile(np.linspace(200, 240, 256, dtype=np.uint8)[:, None, None], (1, 256, 3))
+    image[48:208, 64:192] = (60, 60, 170)
+    image[128:208, 64:192] = (150, 90, 40)
+    return image
+
+
+def _dummy_inference(timings: Dict[str, float]) -> None:
+    vision = cv.LocalComputerVision()
+    image = _warmup_image()
+    mask = _timed(timings, "mask_ms", vision.get_improved_mask, image)  # SAM, or GrabCut
+    _timed(timings, "color_ms", vision.get_dominant_color, image, mask)
+    if cv.rembg_session is not None:
+        _timed(timings, "bg_removal_ms", vision.remove_background, image)
+    if cv.FASHIONCLIP_AVAILABLE:
+        from PIL import Image
+        pil_img = Image.fromarray(image[:, :, ::-1])
+
+        def clip_forward():
+            embeds = cv._clip_image_embeds(pil_img)
+            cv._clip_label_probs(embeds, cv.BROAD_LABELS)
+            cv._clip_label_probs(embeds, cv.SHOE_LABELS)
+
+        _timed(timings, "clip_inference_ms", clip_forward)
+
+
+def warm_models() -> Dict[str, Any]:
+    """Load the vision models in this process and run them once. Blocking."""
+    timings: Dict[str, float] = {}
+    _timed(timings, "fashionclip_load_ms", cv.load_fashionclip)
+    _timed(timings, "sam_load_ms", cv.load_sam)
+    _timed(timings, "rembg_load_ms", cv.load_rembg)
+    if MODEL_WARMUP:
+        _dummy_inference(timings)
+    return {
+        "models": {"fashionclip": cv.FASHIONCLIP_AVAILABLE, "sam": cv.SAM_AVAILABLE,
+                   "rembg": cv.rembg_session is not None},
+        "clip_backend": {"backend": cv.clip_backend, "parity": cv.clip_backend_parity},
+        "timings_ms": timings,
+    }
+
+
+async def run_startup_warmup() -> None:
+    """Preload and warm the models (where scans will run them), then mark the app ready."""
+    if not MODEL_PRELOAD:
+        _set_state(status="disabled")
+        logger.info("Model preload disabled — models load on first use")
+        return
+
+    from services import vision_workers
+
+    started = time.perf_counter()
+    _set_state(status="warming", started_at=datetime.utcnow().isoformat())
+    try:
+        if vision_workers.ENABLED:
+            report = await vision_workers.warmup()
+        else:
+            report = await run_cpu(warm_models)
+    except Exception as exc:
+        logger.error("Model warmup failed: %s", exc)
+        _set_state(status="degraded", error=str(exc), finished_at=datetime.utcnow().isoformat())
+        return
+
+    report["timings_ms"]["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    _set_state(status="ready", finished_at=datetime.utcnow().isoformat(), **report)
+    logger.info("Models warm — %s %s", report["models"], report["timings_ms"])
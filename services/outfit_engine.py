@@ -0,0 +1,200 @@
+# services/outfit_engine.py
+# Multi-outfit planner: beam search over outfit slots on the compatibility matrix.
+# The wardrobe is categorized and embedded once per call, however many outfits are asked for.
+
+import logging
+import os
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ai_matcher import _colors_harmonize, compatibility_matrix, fashion_matcher
+
+logger = logging.getLogger(__name__)
+
+BEAM_WIDTH = int(os.getenv("OUTFIT_BEAM_WIDTH", "32"))
+DIVERSITY_PENALTY = float(os.getenv("OUTFIT_DIVERSITY_PENALTY", "6.0"))
+
+# Score of an outfit with fewer than two items (nothing to pair yet) —
+# same neutral default create_complete_outfit reports.
+_NEUTRAL_SCORE = 75.0
+
+# Slots filled after the base (top + bottom, or dress). Optional slots may be left empty.
+_SLOTS: List[Tuple[str, bool]] = [
+    ("outerwear", True),
+    ("shoes", False),
+    ("accessories", True),
+]
+
+STYLES = ['casual', 'formal', 'boho', 'streetwear', 'classic']
+
+
+# Beams are held as parallel arrays: `items` is (beams, slots) of wardrobe indices
+# with -1 for an empty slot, `pair_sum` is the running sum of pairwise scores.
+_EMPTY = -1
+_N_SLOTS = 2 + len(_SLOTS)
+
+
+def _mean_scores(items: np.ndarray, pair_sum: np.ndarray) -> np.ndarray:
+    n = (items != _EMPTY).sum(axis=1)
+    pairs = n * (n - 1) / 2
+    return np.where(pairs > 0, pair_sum / np.maximum(pairs, 1), _NEUTRAL_SCORE)
+
+
+def _top(scores: np.ndarray, width: int) -> np.ndarray:
+    """Indices of the `width` highest scores, best first."""
+    if scores.size > width:
+        keep = np.argpartition(-scores, width - 1)[:width]
+    else:
+        keep = np.arange(scores.size)
+    return keep[np.argsort(-scores[keep], kind='stable')]
+
+
+# category -> first matching group, in AdvancedFashionMatcher.category_groups order
+_GROUP_OF: Dict[str, str] = {}
+for _gname, _gcats in fashion_matcher.category_groups.items():
+    for _cat in _gcats:
+        _GROUP_OF.setdefault(_cat, _gname)
+
+
+def _categorize(items: List[Dict[str, Any]]) -> Dict[str, List[int]]:
+    pools: Dict[str, List[int]] = {}
+    for idx, item in enumerate(items):
+        group = _GROUP_OF.get(item.get('category', 'Unknown'))
+        if group:
+            pools.setdefault(group, []).append(idx)
+    return pools
+
+
+_SLOT_GROUPS = {group for group, _ in _SLOTS}
+
+
+def _base_beams(items: List[Dict[str, Any]], compat: np.ndarray, pools: Dict[str, List[int]],
+                width: int) -> Tuple[np.ndarray, np.ndarray]:
+    rows: List[Tuple[int, int]] = []
+    sums: List[float] = []
+    tops, bottoms = pools.get('tops', []), pools.get('bottoms', [])
+    if tops and bottoms:
+        pair_scores = compat[np.ix_(tops, bottoms)].ravel()
+        for flat in _top(pair_scores, width):
+            t, b = divmod(int(flat), len(bottoms))
+            rows.append((tops[t], bottoms[b]))
+            sums.append(float(pair_scores[flat]))
+    singles = pools.get('dresses', [])
+    if not rows and not singles:
+        # No complete base — anchor on anything that isn't filled by a later
+        # slot (a lone top or bottom), so shoes don't anchor a second pair of shoes
+        singles = [i for i, item in enumerate(items)
+                   if _GROUP_OF.get(item.get('category', 'Unknown')) not in _SLOT_GROUPS]
+        singles = singles or list(range(len(items)))
+    rows.extend((d, _EMPTY) for d in singles)
+    sums.extend(0.0 for _ in singles)
+
+    items = np.full((len(rows), _N_SLOTS), _EMPTY, dtype=np.intp)
+    items[:, :2] = np.asarray(rows, dtype=np.intp).reshape(-1, 2)
+    return items, np.asarray(sums, dtype=np.float64)
+
+
+def _extend(items: np.ndarray, pair_sum: np.ndarray, slot: int, pool: List[int], optional: bool,
+            compat: np.ndarray, width: int) -> Tuple[np.ndarray, np.ndarray]:
+    if not pool or not len(items):
+        return items, pair_sum
+    candidates = np.asarray(pool, dtype=np.intp)
+    filled = items != _EMPTY
+    # gains[c, b]: candidate c's summed score against everything already in beam b
+    gains = (compat[candidates[:, None, None], np.where(filled, items, 0)[None]] * filled).sum(axis=2)
+    # An item can't fill two slots of the same outfit, and a beam anchored on
+    # an item of this slot's group (e.g. shoes) doesn't take a second one
+    valid = ~(candidates[:, None, None] == items[None]).any(axis=2)
+    valid &= ~np.isin(items, candidates).any(axis=1)[None, :]
+
+    new_items = np.repeat(items[None, :, :], len(candidates), axis=0)
+    new_items[:, :, slot] = candidates[:, None]
+    new_items = new_items[valid]
+    new_sum = (pair_sum[None, :] + gains)[valid]
+    if optional:
+        new_items = np.concatenate([items, new_items])
+        new_sum = np.concatenate([pair_sum, new_sum])
+
+    keep = _top(_mean_scores(new_items, new_sum), width)
+    return new_items[keep], new_sum[keep]
+
+
+def _pick_diverse(items: np.ndarray, scores: np.ndarray, count: int, penalty: float) -> List[int]:
+    """Greedy top-N: each item already used by a chosen outfit costs `penalty` points."""
+    used = np.zeros(int(items.max()) + 2, dtype=np.float64)  # last cell absorbs _EMPTY
+    canonical = np.sort(items, axis=1)
+    chosen: List[int] = []
+    available = np.ones(len(items), dtype=bool)
+    while len(chosen) < count and available.any():
+        adjusted = np.where(available, scores - penalty * used[items].sum(axis=1), -np.inf)
+        best = int(np.argmax(adjusted))
+        chosen.append(best)
+        # Drop the pick and any other slot ordering of the same items
+        available &= ~(canonical == canonical[best]).all(axis=1)
+        used[items[best][items[best] != _EMPTY]] += 1
+    return chosen
+
+
+def _to_outfit(items: List[Dict[str, Any]], indices: np.ndarray, score: float,
+               style: str, occasion: str) -> Dict[str, Any]:
+    selected = [items[i] for i in indices if i != _EMPTY]
+    seed = selected[0]
+    seed_color = seed.get('color', 'Black')
+    partner_color = selected[1].get('color', seed_color) if len(selected) > 1 else seed_color
+    harmonize, h_type = _colors_harmonize(seed_color, partner_color)
+    vibe = h_type.replace('_', ' ').title() if harmonize and h_type != 'none' else style.capitalize()
+    outfit_name = random.choice([
+        f"{vibe} {seed_color} Edit",
+        f"{seed_color} {style.capitalize()} Story",
+        f"The {seed_color} Moment"
+    ])
+    return {
+        'name': outfit_name,
+        'vibe': vibe,
+        'item_ids': [it.get('id') for it in selected],
+        'items': selected,
+        'compatibility_score': round(float(score), 1),
+        'styling_tips': fashion_matcher._generate_styling_tips(selected, style, occasion),
+    }
+
+
+def plan_outfits(
+    items: List[Dict[str, Any]],
+    count: int = 3,
+    styles: Optional[List[str]] = None,
+    occasion: str = "daytime",
+    beam_width: int = BEAM_WIDTH,
+    diversity_penalty: float = DIVERSITY_PENALTY,
+) -> List[Dict[str, Any]]:
+    """
+    Return up to `count` distinct outfits from the wardrobe, best first.
+
+    Slots are filled in order — base (top + bottom, or dress), outerwear, shoes,
+    accessory — keeping the `beam_width` best partial outfits by mean pairwise
+    compatibility at each step. The final outfits are chosen greedily with a
+    penalty for reusing items, so a week's plan doesn't repeat the same pieces.
+    """
+    if len(items) < 2 or count <= 0:
+        return []
+    styles = styles or STYLES
+    width = max(beam_width, count)
+
+    compat = compatibility_matrix(items)
+    pools = _categorize(items)
+
+    beams, pair_sum = _base_beams(items, compat, pools, width)
+    for slot, (group, optional) in enumerate(_SLOTS, start=2):
+        beams, pair_sum = _extend(beams, pair_sum, slot, pools.get(group, []), optional, compat, width)
+    complete = (beams != _EMPTY).sum(axis=1) >= 2
+    beams, scores = beams[complete], _mean_scores(beams, pair_sum)[complete]
+    if not len(beams):
+        return []
+
+    chosen = _pick_diverse(beams, scores, count, diversity_penalty)
+    logger.debug("Planned %d outfits from %d items (%d candidates)", len(chosen), len(items), len(beams))
+    return [
+        _to_outfit(items, beams[b], scores[b], styles[i % len(styles)], occasion)
+        for i, b in enumerate(chosen)
+    ]
@@ -13,6 +13,7 @@ logger = logging.getLogger(__name__)
 
 try:
     from ai_matcher import fashion_matcher, _text_to_pseudo_embedding, cosine_similarity
+    from .outfit_engine import STYLES, plan_outfits
     MATCHER_AVAILABLE = True
 except ImportError:
     MATCHER_AVAILABLE = False
@@ -36,16 +37,14 @@ class OutfitGenerator:
     def generate_outfits_from_wardrobe(
         self, items: List[Dict[str, Any]], count: int = 3
     ) -> List[Dict[str, Any]]:
-        """Generate `count` outfit suggestions from the wardrobe using color harmony."""
+        """
+        Generate `count` distinct outfit suggestions from the wardrobe.
+        The wardrobe is scored once and searched with outfit_engine.plan_outfits,
+        so asking for a week of outfits costs about the same as asking for one.
+        """
         if not MATCHER_AVAILABLE or not items:
             return []
-        outfits = []
-        styles = ['casual', 'formal', 'boho', 'streetwear', 'classic']
-        for i in range(min(count, len(styles))):
-            outfit = fashion_matcher.create_complete_outfit(items, style=styles[i])
-            if outfit:
-                outfits.append(outfit)
-        return outfits
+        return plan_outfits(items, count=count, styles=STYLES)
 
     # ------------------------------------------------------------------
     # Gap Analysis (Feature 3) — delegates to AdvancedFashionMatcher
@@ -0,0 +1,186 @@
+# services/vision_workers.py
+# Optional process-pool tier for the computer vision pipeline.
+#
+# GrabCut, colour clustering, Sobel pattern detection and CLIP inference are CPU-bound and
+# mostly hold the GIL, so in the API process they compete with request handling
+# however many threads they get. With CV_WORKER_MODE=process, autotag and
+# background removal run in a pool of worker processes instead:
+#
+#   - each worker loads FashionCLIP / SAM / rembg once, in its initializer, and runs
+#     them on a warmup image (services/model_warmup.py)
+#   - the image goes to the worker as raw encoded bytes in a shared-memory
+#     block, not as a pickled base64 string
+#   - tasks have a timeout (CV_TASK_TIMEOUT); a hung or crashed worker is
+#     replaced (see executors.BoundedProcessPool)
+#
+# The default mode, "thread", keeps everything in-process on the CPU thread pool.
+
+import asyncio
+import base64
+import binascii
+import logging
+import os
+import time
+import traceback
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Union
+
+import numpy as np
+
+from executors import BoundedProcessPool, register_process_pool
+
+logger = logging.getLogger(__name__)
+
+CV_WORKER_MODE = os.getenv("CV_WORKER_MODE", "thread").lower()
+CV_WORKERS = int(os.getenv("CV_WORKERS", str(min(4, os.cpu_count() or 1))))
+CV_QUEUE_LIMIT = int(os.getenv("CV_QUEUE_LIMIT", "16"))
+CV_TASK_TIMEOUT = float(os.getenv("CV_TASK_TIMEOUT", "60"))
+CV_PRELOAD_MODELS = os.getenv("CV_PRELOAD_MODELS", "true").lower() == "true"
+
+_WARMUP_HOLD_S = 0.2  # a warmup task keeps its worker busy this long, so the others take the rest
+_WARMUP_ROUNDS = 5
+
+ENABLED = CV_WORKER_MODE == "process"
+
+
+# ------------------------------------------------------------------
+# Worker side — runs in the spawned processes
+# ------------------------------------------------------------------
+
+def _init_worker(preload_models: bool) -> None:
+    """Process initializer: one compute thread per process, models loaded up front."""
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s")
+    try:
+        import cv2
+        cv2.setNumThreads(1)  # parallelism comes from the processes
+    except ImportError:
+        pass
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+    global _worker_warmup
+    from ai_model import FashionAIModel  # noqa: F401 — imports the CV stack once per worker
+    if preload_models:
+        from services import model_warmup
+        _worker_warmup = model_warmup.warm_models()
+    logger.info("CV worker %d ready.", os.getpid())
+
+
+_worker_warmup: Dict[str, Any] = None  # this worker's model_warmup.warm_models() report
+
+
+def _warmup_task(hold: float = 0.0) -> Dict[str, Any]:
+    global _worker_warmup
+    if _worker_warmup is None:
+        from services import model_warmup
+        _worker_warmup = model_warmup.warm_models()
+    time.sleep(hold)
+    return {**_worker_warmup, "pid": os.getpid()}
+
+
+def _read_image(shm_name: str, size: int, max_side: int = None) -> np.ndarray:
+    from ai_model import FashionAIModel
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        buf = np.frombuffer(shm.buf, dtype=np.uint8, count=size)
+        try:
+            return FashionAIModel.vision.decode_image_bytes(buf, max_side)
+        except Exception as exc:
+            # The traceback's frames still hold views of the block
+            traceback.clear_frames(exc.__traceback__)
+            raise
+        finally:
+            del buf  # release the view before closing the block, or close() raises BufferError
+    finally:
+        shm.close()
+
+
+def _autotag_task(shm_name: str, size: int, include_embedding: bool = False) -> Dict[str, Any]:
+    from ai_model import FashionAIModel
+    from services.computer_vision import CV_WORKING_SIZE
+    return FashionAIModel._autotag_sync(_read_image(shm_name, size, CV_WORKING_SIZE), include_embedding)
+
+
+def _remove_background_task(shm_name: str, size: int, alpha_matting: bool = False) -> bytes:
+    from ai_model import FashionAIModel
+
+    img = _read_image(shm_name, size)
+    if img is None or img.size == 0:
+        raise ValueError("Failed to decode image")
+    return FashionAIModel.vision.remove_background_png(img, alpha_matting)
+
+
+# ------------------------------------------------------------------
+# API side
+# ------------------------------------------------------------------
+
+pool = BoundedProcessPool(
+    "cv", CV_WORKERS, CV_QUEUE_LIMIT, CV_TASK_TIMEOUT,
+    initializer=_init_worker, initargs=(CV_PRELOAD_MODELS,),
+)
+if ENABLED:
+    register_process_pool(pool)
+
+
+def image_bytes(image_data: str) -> bytes:
+    """Raw encoded image bytes from a base64 string or data URL."""
+    if not image_data or not isinstance(image_data, str):
+        raise ValueError("Invalid image_data: must be non-empty string")
+    payload = image_data.split(",", 1)[1] if "," in image_data else image_data
+    if len(payload) < 100:
+        raise ValueError("Invalid base64 image data")
+    try:
+        return base64.b64decode(payload)
+    except (binascii.Error, ValueError) as exc:
+        raise ValueError(f"Invalid base64 image data: {exc}")
+
+
+async def _run_with_image(task: Callable[..., Any], image_data: Union[str, bytes], *args: Any) -> Any:
+    data = image_data if isinstance(image_data, bytes) else image_bytes(image_data)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    try:
+        shm.buf[:len(data)] = data
+        return await pool.run(task, shm.name, len(data), *args)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+async def autotag(image_data: Union[str, bytes], include_embedding: bool = False) -> Dict[str, Any]:
+    """FashionAIModel autotag result for a base64 image (or its raw bytes), computed in a worker process."""
+    return await _run_with_image(_autotag_task, image_data, include_embedding)
+
+
+async def warmup() -> Dict[str, Any]:
+    """
+    Start every worker and wait until its models are loaded and warm. Returns
+    the slowest worker's timings and which models all of them have.
+
+    Nothing routes a task to a particular worker, so each report carries the
+    worker's pid and rounds of tasks are sent until every worker has answered.
+    """
+    by_pid: Dict[int, Dict[str, Any]] = {}
+    for _ in range(_WARMUP_ROUNDS):
+        for report in await asyncio.gather(*(pool.run(_warmup_task, _WARMUP_HOLD_S) for _ in range(pool.max_workers))):
+            by_pid[report["pid"]] = report
+        if len(by_pid) >= pool.max_workers:
+            break
+    else:
+        logger.warning("CV warmup confirmed %d of %d workers.", len(by_pid), pool.max_workers)
+    reports = list(by_pid.values())
+    timings: Dict[str, float] = {}
+    for report in reports:
+        for key, ms in report["timings_ms"].items():
+            timings[key] = max(ms, timings.get(key, 0.0))
+    models = {name: all(r["models"].get(name) for r in reports) for name in reports[0]["models"]}
+    return {"models": models, "clip_backend": reports[0].get("clip_backend"),
+            "timings_ms": timings, "workers": len(reports)}
+
+
+async def remove_background(image_data: Union[str, bytes], alpha_matting: bool = False) -> bytes:
+    """PNG bytes of the image with its background removed, computed in a worker process."""
+    return await _run_with_image(_remove_background_task, image_data, alpha_matting)
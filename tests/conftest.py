@@ -16,6 +16,9 @@ import tempfile
 import pytest
 from fastapi.testclient import TestClient
 
+# The client is built without the lifespan, so no startup warmup ever runs
+os.environ.setdefault("MODEL_PRELOAD", "false")
+
 # ── Temp DB setup (session-scoped — created once, shared across all tests) ────
 
 DB_FILE = tempfile.mktemp(suffix="_wya_test.db")
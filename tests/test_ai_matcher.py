@@ -0,0 +1,109 @@
+"""
+test_ai_matcher.py
+──────────────────
+Unit tests for ai_matcher — pseudo-embeddings and outfit scoring.
+"""
+
+import numpy as np
+
+import ai_matcher
+
+
+WARDROBE = [
+    {"item_id": "item-top",   "name": "White Linen Shirt", "category": "Shirt",  "color": "White",   "fabric": "Linen"},
+    {"item_id": "item-jeans", "name": "Blue Jeans",        "category": "Jeans",  "color": "Denim",   "fabric": "Denim"},
+    {"item_id": "item-boots", "name": "Chelsea Boots",     "category": "Boots",  "color": "Black",   "fabric": "Leather"},
+    {"item_id": "item-dress", "name": "Boho Maxi Dress",   "category": "Dress",  "color": "Cream",   "fabric": "Linen"},
+    {"item_id": "item-odd",   "name": "",                  "category": "Cape",   "color": "Octarine"},
+]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# ENCODER
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestEncoder:
+
+    def test_batch_matches_single_item(self):
+        matrix = ai_matcher.encode_items(WARDROBE)
+        assert matrix.shape == (len(WARDROBE), ai_matcher.EMBEDDING_DIM)
+        for row, item in zip(matrix, WARDROBE):
+            assert np.allclose(row, ai_matcher._text_to_pseudo_embedding(item), atol=1e-6)
+
+    def test_embeddings_are_unit_length(self):
+        norms = np.linalg.norm(ai_matcher.encode_items(WARDROBE), axis=1)
+        assert np.allclose(norms, 1.0, atol=1e-5)
+
+    def test_empty_wardrobe(self):
+        assert ai_matcher.encode_items([]).shape == (0, ai_matcher.EMBEDDING_DIM)
+
+    def test_memoized_vectors_are_read_only(self):
+        vec = ai_matcher._text_to_pseudo_embedding(WARDROBE[0])
+        assert vec is ai_matcher._text_to_pseudo_embedding(dict(WARDROBE[0], item_id="other"))
+        assert not vec.flags.writeable
+
+    def test_style_keyword_changes_embedding(self):
+        plain = {"category": "Top", "color": "Red", "name": "top"}
+        formal = dict(plain, name="silk top")
+        assert not np.allclose(
+            ai_matcher._text_to_pseudo_embedding(plain),
+            ai_matcher._text_to_pseudo_embedding(formal),
+        )
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# COMPATIBILITY MATRIX
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestCompatibilityMatrix:
+
+    def test_matches_pairwise_scores(self):
+        matrix = ai_matcher.compatibility_matrix(WARDROBE)
+        assert matrix.shape == (len(WARDROBE), len(WARDROBE))
+        for i, a in enumerate(WARDROBE):
+            for j, b in enumerate(WARDROBE):
+                if i != j:
+                    assert abs(matrix[i, j] - ai_matcher.compute_similarity_score(a, b)) <= 0.1
+
+    def test_symmetric(self):
+        matrix = ai_matcher.compatibility_matrix(WARDROBE)
+        assert np.allclose(matrix, matrix.T)
+
+    def test_top_bottom_bonus_beats_same_group(self):
+        top = {"category": "Shirt", "color": "White"}
+        other_top = {"category": "Blouse", "color": "White"}
+        jeans = {"category": "Jeans", "color": "White"}
+        matrix = ai_matcher.compatibility_matrix([top, other_top, jeans])
+        assert matrix[0, 2] > matrix[0, 1]
+
+    def test_outfit_uses_best_partner(self):
+        items = [dict(it, id=it["item_id"]) for it in WARDROBE]
+        items[0]["wear_count"] = 5
+        outfit = ai_matcher.AdvancedFashionMatcher().create_complete_outfit(items)
+        assert outfit["item_ids"][:3] == ["item-top", "item-jeans", "item-boots"]
+        assert 50 <= outfit["compatibility_score"] <= 99
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# CLOSET RANKING
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestRankClosetMatches:
+
+    def test_top_k_matches_full_ranking(self):
+        wardrobe = WARDROBE * 10  # plenty of tied scores at the cut-off
+        seed = {"category": "Jeans", "color": "Black", "name": "jeans"}
+        full = ai_matcher.fashion_matcher.rank_closet_matches(seed, wardrobe)
+        for k in (1, 3, 7, len(wardrobe)):
+            top = ai_matcher.fashion_matcher.rank_closet_matches(seed, wardrobe, top_k=k)
+            assert top == full[:k]
+
+    def test_results_are_copies(self):
+        ranked = ai_matcher.fashion_matcher.rank_closet_matches(WARDROBE[0], WARDROBE, top_k=2)
+        assert len(ranked) == 2
+        assert all("match_score" in r for r in ranked)
+        assert all("match_score" not in w for w in WARDROBE)
+
+    def test_empty_inputs(self):
+        assert ai_matcher.fashion_matcher.rank_closet_matches(WARDROBE[0], []) == []
+        assert ai_matcher.fashion_matcher.rank_closet_matches(WARDROBE[0], WARDROBE, top_k=0) == []
@@ -0,0 +1,53 @@
+"""
+test_color_names.py
+───────────────────
+Tests for services.color_names — the shared RGB → colour-name lookup.
+"""
+
+import numpy as np
+import pytest
+
+from services import color_names
+from services.color_matcher import ColorMatcher
+from services.data_loader import COLOR_DICTIONARY
+
+
+def _full_scan(r, g, b):
+    best, min_dist = "Gray", float("inf")
+    for name, val in COLOR_DICTIONARY.items():
+        dist = (r - val[0]) ** 2 + (g - val[1]) ** 2 + (b - val[2]) ** 2
+        if dist < min_dist:
+            min_dist, best = dist, name
+    return best
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# LOOKUP
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestColorNames:
+
+    @pytest.fixture(autouse=True)
+    def dictionary(self):
+        if not COLOR_DICTIONARY:
+            pytest.skip("colour dictionary not available")
+
+    def test_same_names_as_a_full_scan(self):
+        rng = np.random.default_rng(7)
+        colours = rng.integers(0, 256, (5_000, 3)).tolist()
+        colours += [list(v) for v in COLOR_DICTIONARY.values()]
+        assert [color_names.rgb_to_color_name(*c) for c in colours] == [_full_scan(*c) for c in colours]
+
+    def test_vision_and_matcher_agree(self):
+        from services.computer_vision import LocalComputerVision
+        vision = LocalComputerVision()
+        for rgb in [(190, 30, 45), (30, 45, 90), (75, 115, 155), (240, 235, 225), (3, 136, 77)]:
+            assert vision._map_rgb_to_color_name(*rgb) == ColorMatcher._rgb_to_color_name(rgb)
+
+    def test_out_of_range_values_are_clamped(self):
+        assert color_names.rgb_to_color_name(-20, 300.7, 128) == _full_scan(0, 255, 128)
+
+    def test_empty_dictionary_falls_back(self, monkeypatch):
+        monkeypatch.setattr(color_names, "COLOR_DICTIONARY", {})
+        monkeypatch.setattr(color_names, "_table", None)
+        assert color_names.rgb_to_color_name(10, 20, 30) == "Gray"
@@ -0,0 +1,380 @@
+"""
+test_computer_vision.py
+───────────────────────
+Unit tests for services.computer_vision helpers that don't need the CLIP / SAM
+models loaded.
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from services import computer_vision as cv
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# CLIP LABEL EMBEDDING CACHE
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestLabelEmbeddingCache:
+
+    @pytest.fixture(autouse=True)
+    def fake_text_encoder(self, tmp_path, monkeypatch):
+        calls = []
+
+        def encode(labels):
+            calls.append(labels)
+            matrix = np.arange(len(labels) * 4, dtype=np.float32).reshape(len(labels), 4) + 1
+            return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+        monkeypatch.setattr(cv, "CLIP_CACHE_DIR", str(tmp_path))
+        monkeypatch.setattr(cv, "_encode_label_text", encode)
+        monkeypatch.setattr(cv, "_label_embeddings", {})
+        return calls
+
+    def test_encoded_once_per_label_set(self, fake_text_encoder):
+        first = cv.label_text_embeddings(cv.SHOE_LABELS)
+        again = cv.label_text_embeddings(list(cv.SHOE_LABELS))
+        assert again is first
+        assert first.shape == (len(cv.SHOE_LABELS), 4) and not first.flags.writeable
+        assert len(fake_text_encoder) == 1
+
+    def test_persisted_across_processes(self, fake_text_encoder, monkeypatch):
+        stored = cv.label_text_embeddings(cv.BROAD_LABELS)
+        monkeypatch.setattr(cv, "_label_embeddings", {})  # as a fresh worker would start
+        assert np.array_equal(cv.label_text_embeddings(cv.BROAD_LABELS), stored)
+        assert len(fake_text_encoder) == 1
+
+    def test_keyed_by_model_revision_and_labels(self, fake_text_encoder, monkeypatch):
+        cv.label_text_embeddings(["shirt", "dress"])
+        cv.label_text_embeddings(["shirt", "skirt"])
+        monkeypatch.setattr(cv, "_label_embeddings", {})
+        monkeypatch.setattr(cv, "FASHIONCLIP_REVISION", "abc123")
+        cv.label_text_embeddings(["shirt", "dress"])
+        assert len(fake_text_encoder) == 3
+
+    def test_unwritable_cache_dir_still_works(self, fake_text_encoder, monkeypatch, tmp_path):
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        monkeypatch.setattr(cv, "CLIP_CACHE_DIR", str(blocker / "cache"))
+        assert cv.label_text_embeddings(["hat"]).shape == (1, 4)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# PER-SCAN ANALYSIS CONTEXT
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _two_tone_image():
+    image = np.zeros((300, 300, 3), dtype=np.uint8)
+    image[:, :180] = (40, 40, 200)   # red (BGR), the larger area
+    image[:, 180:] = (200, 120, 60)  # blue
+    return image
+
+
+class TestAnalysisContext:
+
+    @pytest.fixture
+    def vision(self):
+        if not cv.CV2_AVAILABLE:
+            pytest.skip("OpenCV not installed")
+        return cv.LocalComputerVision()
+
+    def test_secondary_color_lands_on_context(self, vision):
+        image = _two_tone_image()
+        mask = np.full(image.shape[:2], 255, dtype=np.uint8)
+        ctx = cv.AnalysisContext()
+        _, primary, _ = vision.get_dominant_color(image, mask, ctx)
+        assert ctx.secondary_color and ctx.secondary_color != primary
+        assert not hasattr(vision, "_last_secondary_color")
+
+    def test_contexts_are_independent(self, vision):
+        mask = np.full((300, 300), 255, dtype=np.uint8)
+        two_tone, plain = cv.AnalysisContext(), cv.AnalysisContext()
+        vision.get_dominant_color(_two_tone_image(), mask, two_tone)
+        vision.get_dominant_color(np.full((300, 300, 3), (40, 40, 200), dtype=np.uint8), mask, plain)
+        assert two_tone.secondary_color and plain.secondary_color is None
+
+    def test_embedding_reused_from_context(self, vision, monkeypatch):
+        ctx = cv.AnalysisContext()
+        assert ctx.embedding() is None and ctx.shoe_subtype == "Shoes"
+
+        stored = np.linspace(0, 1, 8, dtype=np.float32)
+        ctx.image_embeds = object()  # stands in for the CLIP tensor
+        monkeypatch.setattr(ctx, "embedding", lambda: stored)
+        monkeypatch.setattr(cv, "load_fashionclip", lambda: pytest.fail("CLIP should not run again"))
+        assert vision.get_image_embedding(_two_tone_image(), ctx) is stored
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# CLIP IMAGE BACKENDS
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _unit_rows(matrix):
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+class TestClipBackend:
+
+    @pytest.fixture(autouse=True)
+    def backend_globals(self, monkeypatch):
+        monkeypatch.setattr(cv, "clip_backend", "torch")
+        monkeypatch.setattr(cv, "clip_backend_parity", None)
+        monkeypatch.setattr(cv, "_image_encoder", None)
+        monkeypatch.setattr(cv, "CLIP_BACKEND", "int8")
+
+    def _select(self, monkeypatch, parity):
+        encoder = object()
+        monkeypatch.setattr(cv, "_int8_image_encoder", lambda: encoder)
+        monkeypatch.setattr(cv, "check_backend_parity", lambda enc: parity)
+        cv._init_clip_backend()
+        return encoder
+
+    def test_parity_metrics(self):
+        rng = np.random.default_rng(1)
+        reference = _unit_rows(rng.normal(size=(6, 16)))
+        text = _unit_rows(rng.normal(size=(10, 16)))
+        assert cv._compare_embeddings(reference, reference, text) == {
+            "min_cosine": 1.0, "mean_cosine": 1.0, "top1_agreement": 1.0,
+        }
+        drifted = cv._compare_embeddings(reference, _unit_rows(reference + rng.normal(scale=0.5, size=(6, 16))), text)
+        assert drifted["min_cosine"] < 0.99
+
+    def test_backend_used_when_it_matches_fp32(self, monkeypatch):
+        encoder = self._select(monkeypatch, {"min_cosine": 0.998, "mean_cosine": 0.999, "top1_agreement": 1.0})
+        assert cv.clip_backend == "int8" and cv._image_encoder is encoder
+
+    def test_falls_back_to_torch_on_drift(self, monkeypatch):
+        encoder = self._select(monkeypatch, {"min_cosine": 0.93, "mean_cosine": 0.95, "top1_agreement": 0.75})
+        assert cv.clip_backend == "torch" and cv._image_encoder is not encoder
+        assert cv.clip_backend_parity["min_cosine"] == 0.93
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# MICRO-BATCHING
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestInferenceBatcher:
+
+    def test_lone_request_is_not_held_back(self):
+        batcher = cv.InferenceBatcher("test", lambda items: [x * 2 for x in items], max_batch=8, max_wait_ms=500)
+        start = time.perf_counter()
+        assert batcher(21) == 42
+        assert time.perf_counter() - start < 0.4
+        assert batcher.stats()["batch_sizes"] == {1: 1}
+
+    def test_concurrent_requests_share_a_batch(self):
+        release = threading.Event()
+        sizes = []
+
+        def fn(items):
+            sizes.append(len(items))
+            release.wait(1)  # first batch holds the encoder while the rest queue up
+            return [x + 1 for x in items]
+
+        batcher = cv.InferenceBatcher("test", fn, max_batch=4, max_wait_ms=50)
+        first = batcher.submit(0)
+        while not sizes:
+            time.sleep(0.001)
+        rest = [batcher.submit(i) for i in range(1, 6)]
+        release.set()
+
+        assert [f.result(1) for f in [first] + rest] == [1, 2, 3, 4, 5, 6]
+        assert sizes == [1, 4, 1]
+        stats = batcher.stats()
+        assert stats["items"] == 6 and stats["batch_sizes"] == {1: 2, 4: 1}
+
+    def test_errors_reach_every_caller_in_the_batch(self):
+        def fn(items):
+            raise RuntimeError("forward failed")
+
+        batcher = cv.InferenceBatcher("test", fn, max_batch=4, max_wait_ms=0)
+        with pytest.raises(RuntimeError):
+            batcher(1)
+        assert batcher.stats()["failed_batches"] == 1
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# WORKING-SIZE DECODING
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestWorkingSize:
+
+    @pytest.fixture
+    def vision(self):
+        if not cv.CV2_AVAILABLE:
+            pytest.skip("OpenCV not installed")
+        return cv.LocalComputerVision()
+
+    def _jpeg(self, h, w):
+        image = np.zeros((h, w, 3), dtype=np.uint8)
+        image[h // 4: 3 * h // 4, w // 4: 3 * w // 4] = (40, 40, 200)
+        return cv.cv2.imencode(".jpg", image)[1].tobytes()
+
+    def test_large_photo_decoded_at_working_size(self, vision):
+        data = self._jpeg(3000, 4000)
+        assert vision._decode_flag(data, 1024) == cv.cv2.IMREAD_REDUCED_COLOR_2
+        img = vision.decode_image_bytes(data, max_side=1024)
+        assert img.shape == (768, 1024, 3)
+        assert tuple(img[384, 512]) == pytest.approx((40, 40, 200), abs=8)
+
+    def test_small_and_unbounded_decodes_untouched(self, vision):
+        assert vision.decode_image_bytes(self._jpeg(300, 400), max_side=1024).shape == (300, 400, 3)
+        assert vision.decode_image_bytes(self._jpeg(1200, 1600)).shape == (1200, 1600, 3)
+
+    def test_background_removal_keeps_full_resolution(self, vision, monkeypatch):
+        monkeypatch.setattr(cv, "REMBG_AVAILABLE", False)
+        monkeypatch.setattr(cv, "CV_WORKING_SIZE", 256)
+        seen = []
+
+        def mask_at_working_size(image):
+            seen.append(image.shape)
+            mask = np.zeros(image.shape[:2], dtype=np.uint8)
+            mask[64:192, 64:192] = 255
+            return mask
+
+        monkeypatch.setattr(vision, "get_improved_mask", mask_at_working_size)
+        image = np.full((1024, 1024, 3), 90, dtype=np.uint8)
+        result = vision.remove_background(image)
+        assert seen == [(256, 256, 3)] and result.shape == image.shape
+        assert tuple(result[0, 0]) == (255, 255, 255) and tuple(result[512, 512]) == (90, 90, 90)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# DOMINANT COLOUR
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _garment(rgb, secondary=None, shape="rect", noise=10.0, stripes=False, seed=0):
+    """A shaded, noisy garment on a light background, and its mask."""
+    rng = np.random.default_rng(seed)
+    h, w = 480, 360
+    image = np.full((h, w, 3), 235, dtype=np.float32)
+    mask = np.zeros((h, w), dtype=np.uint8)
+    if shape == "rect":
+        mask[h // 8: 7 * h // 8, w // 6: 5 * w // 6] = 255
+    else:
+        cv.cv2.ellipse(mask, (w // 2, h // 2), (w // 3, int(h * 0.4)), 0, 0, 360, 255, -1)
+    shade = np.linspace(0.85, 1.1, h, dtype=np.float32)[:, None, None]
+
+    def fabric(colour):
+        return np.clip(np.float32(colour[::-1]) * shade + rng.normal(0, noise, (h, w, 3)), 0, 255)
+
+    cloth = fabric(rgb)
+    if secondary is not None:
+        alt = fabric(secondary)
+        if stripes:
+            band = (np.arange(h) // 24) % 3 == 0
+            cloth[band] = alt[band]
+        else:
+            cloth[:, : w // 2 - w // 10] = alt[:, : w // 2 - w // 10]
+    image[mask > 0] = cloth[mask > 0]
+    return image.astype(np.uint8), mask
+
+
+class TestDominantColor:
+
+    # (fabric RGB, generator options, colour name the KMeans implementation reported)
+    CASES = [
+        ((30, 45, 90), {"shape": "ellipse"}, "Navy"),
+        ((75, 115, 155), {"noise": 14}, "Denim"),
+        ((0, 140, 80), {"shape": "ellipse"}, "Emerald"),
+        ((205, 160, 40), {"noise": 16}, "Mustard"),
+        ((90, 50, 120), {}, "Purple"),
+        ((195, 155, 105), {}, "Camel"),
+        ((85, 95, 65), {}, "Olive"),
+        ((235, 170, 190), {}, "Rose"),
+        ((165, 65, 40), {}, "Rust"),
+        ((110, 20, 35), {"noise": 8}, "Burgundy"),
+        ((190, 175, 215), {}, "Lilac"),
+    ]
+
+    @pytest.fixture
+    def vision(self):
+        if not cv.CV2_AVAILABLE:
+            pytest.skip("OpenCV not installed")
+        return cv.LocalComputerVision()
+
+    @pytest.mark.parametrize("rgb, options, expected", CASES)
+    def test_matches_previous_kmeans_names(self, vision, rgb, options, expected):
+        image, mask = _garment(rgb, **options)
+        _, name, found = vision.get_dominant_color(image, mask)
+        assert name == expected
+        assert np.linalg.norm(np.subtract(found, rgb)) < 35
+
+    def test_stripes_report_both_colours(self, vision):
+        image, mask = _garment((190, 30, 45), secondary=(30, 45, 90), stripes=True)
+        ctx = cv.AnalysisContext()
+        _, name, _ = vision.get_dominant_color(image, mask, ctx)
+        assert (name, ctx.secondary_color) == ("Red", "Navy")
+
+    def test_pixel_budget_bounds_the_work(self, vision, monkeypatch):
+        monkeypatch.setattr(cv, "COLOR_SAMPLE_BUDGET", 2_000)
+        seen = []
+        real = cv._color_histogram
+        monkeypatch.setattr(cv, "_color_histogram", lambda rgb: seen.append(len(rgb)) or real(rgb))
+        image, mask = _garment((90, 50, 120))
+        assert vision.get_dominant_color(image, mask)[1] == "Purple"
+        assert seen and seen[0] <= 2_000
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# REMBG SESSION
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestRembgSession:
+
+    @pytest.fixture
+    def vision(self):
+        if not cv.CV2_AVAILABLE:
+            pytest.skip("OpenCV not installed")
+        return cv.LocalComputerVision()
+
+    @pytest.fixture
+    def fake_rembg(self, monkeypatch):
+        calls = {"sessions": [], "remove": []}
+
+        def new_session(model):
+            calls["sessions"].append(model)
+            return f"session:{model}"
+
+        def remove(data, session=None, only_mask=False, alpha_matting=False):
+            calls["remove"].append({"shape": data.shape, "session": session,
+                                    "only_mask": only_mask, "alpha_matting": alpha_matting})
+            mask = np.zeros(data.shape[:2], dtype=np.uint8)
+            mask[data.shape[0] // 4: 3 * data.shape[0] // 4, data.shape[1] // 4: 3 * data.shape[1] // 4] = 255
+            if only_mask:
+                return mask
+            return np.dstack((data, mask))
+
+        monkeypatch.setattr(cv, "REMBG_AVAILABLE", True)
+        monkeypatch.setattr(cv, "rembg_session", None)
+        monkeypatch.setattr(cv, "new_session", new_session, raising=False)
+        monkeypatch.setattr(cv, "remove", remove, raising=False)
+        return calls
+
+    def test_session_created_once(self, vision, fake_rembg, monkeypatch):
+        monkeypatch.setattr(cv, "REMBG_MODEL", "u2netp")
+        image = np.full((64, 64, 3), 90, dtype=np.uint8)
+        vision.remove_background(image)
+        vision.remove_background(image)
+        assert fake_rembg["sessions"] == ["u2netp"]
+        assert {c["session"] for c in fake_rembg["remove"]} == {"session:u2netp"}
+
+    def test_mask_at_working_size_cutout_at_full_size(self, vision, fake_rembg, monkeypatch):
+        monkeypatch.setattr(cv, "CV_WORKING_SIZE", 256)
+        image = np.zeros((1024, 1024, 3), dtype=np.uint8)
+        image[..., 0] = 200  # blue, so a channel swap would show
+        png = vision.remove_background_png(image)
+        assert fake_rembg["remove"] == [{"shape": (256, 256, 3), "session": "session:u2net",
+                                         "only_mask": True, "alpha_matting": False}]
+        decoded = cv.cv2.imdecode(np.frombuffer(png, np.uint8), cv.cv2.IMREAD_UNCHANGED)
+        assert decoded.shape == (1024, 1024, 4)
+        assert tuple(decoded[512, 512]) == (200, 0, 0, 255) and decoded[0, 0, 3] == 0
+
+    def test_alpha_matting_only_on_request(self, vision, fake_rembg, monkeypatch):
+        monkeypatch.setattr(cv, "CV_WORKING_SIZE", 256)
+        image = np.full((1024, 1024, 3), 90, dtype=np.uint8)
+        result = vision.remove_background(image, alpha_matting=True)
+        assert fake_rembg["remove"][0]["alpha_matting"] and fake_rembg["remove"][0]["shape"] == (1024, 1024, 3)
+        assert result.shape == (1024, 1024, 4)
@@ -0,0 +1,262 @@
+"""
+test_database.py
+────────────────
+Unit tests for database — schema migrations, embedding storage and pooling.
+Each test gets its own SQLite file created through init_db().
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+import database
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "wya.db"))
+    database.init_db()
+    conn = database.get_db()
+    yield conn
+    conn.close()
+
+
+def _add_item(conn, item_id, user_id="user-a", created_at="2024-01-01", embedding=None):
+    conn.execute(
+        "INSERT INTO wardrobe_items (item_id, user_id, name, category, created_at, embedding) VALUES (?,?,?,?,?,?)",
+        (item_id, user_id, item_id, "Top", created_at, embedding),
+    )
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# EMBEDDING STORAGE
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestEmbeddingStorage:
+
+    def test_round_trip_is_binary(self, conn):
+        vec = np.linspace(-1, 1, 24, dtype=np.float32)
+        _add_item(conn, "item-1")
+        database.save_embedding(conn, "item-1", vec)
+        raw = conn.execute("SELECT embedding FROM wardrobe_items").fetchone()[0]
+        assert isinstance(raw, bytes)
+        assert raw.startswith(database.EMBEDDING_MAGIC)
+        assert len(raw) == 8 + 24 * 4
+        assert np.array_equal(database.load_embedding(conn, "item-1"), vec)
+
+    def test_corrupt_blob_reads_as_none(self, conn):
+        _add_item(conn, "item-1", embedding=b"WYAE\x02\x00\x18\x00" + bytes(96))
+        assert database.load_embedding(conn, "item-1") is None
+
+    def test_bulk_loader(self, conn):
+        for i, day in enumerate(["2024-01-01", "2024-03-01", "2024-02-01"]):
+            _add_item(conn, f"item-{i}", created_at=day)
+            database.save_embedding(conn, f"item-{i}", np.full(24, i, dtype=np.float32))
+        _add_item(conn, "no-embedding")
+        _add_item(conn, "other-user", user_id="user-b", embedding=database.encode_embedding(np.ones(24)))
+
+        ids, matrix = database.load_embedding_matrix(conn, "user-a")
+        assert ids == ["item-1", "item-2", "item-0"]
+        assert matrix.dtype == np.float32 and matrix.shape == (3, 24)
+        assert matrix[:, 0].tolist() == [1.0, 2.0, 0.0]
+
+    def test_bulk_loader_skips_mismatched_dimensions(self, conn):
+        _add_item(conn, "item-a", created_at="2024-02-01", embedding=database.encode_embedding(np.ones(24)))
+        _add_item(conn, "item-b", created_at="2024-01-01", embedding=database.encode_embedding(np.ones(512)))
+        ids, matrix = database.load_embedding_matrix(conn, "user-a")
+        assert ids == ["item-a"]
+        assert matrix.shape == (1, 24)
+
+    def test_bulk_loader_empty(self, conn):
+        ids, matrix = database.load_embedding_matrix(conn, "nobody")
+        assert ids == [] and matrix.size == 0
+
+    def test_json_rows_migrated_on_startup(self, conn):
+        _add_item(conn, "legacy", embedding=json.dumps([0.5] * 24))
+        _add_item(conn, "garbage", embedding="not json")
+        conn.execute("PRAGMA user_version = 0")  # as a database from before the BLOB format
+        conn.commit()
+        database.init_db()
+
+        types = dict(conn.execute("SELECT item_id, typeof(embedding) FROM wardrobe_items").fetchall())
+        assert types == {"legacy": "blob", "garbage": "null"}
+        assert np.allclose(database.load_embedding(conn, "legacy"), 0.5)
+
+    def test_row_to_item_drops_embedding(self, conn):
+        _add_item(conn, "item-1", embedding=database.encode_embedding(np.ones(24)))
+        row = conn.execute("SELECT * FROM wardrobe_items").fetchone()
+        item = database.row_to_item(row)
+        assert "embedding" not in item
+        assert item["item_id"] == "item-1"
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# MIGRATIONS & QUERY PLANS
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestMigrations:
+
+    def test_fresh_database_is_at_latest_version(self, conn):
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == database.SCHEMA_VERSION
+
+    def test_user_indexes_created(self, conn):
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        expected = {name for name, _table, _cols in database.USER_INDEXES}
+        assert expected | {"idx_wardrobe_items_user_created_id"} <= names
+
+    def test_rerun_is_a_no_op(self, conn, caplog):
+        with caplog.at_level("INFO", logger="database"):
+            database.init_db()
+        assert not any("-> v" in r.getMessage() for r in caplog.records)
+
+    def test_failed_migration_keeps_version(self, conn, monkeypatch):
+        def _boom(cursor):
+            raise RuntimeError("boom")
+        conn.execute("PRAGMA user_version = 1")
+        monkeypatch.setattr(database, "MIGRATIONS", [(1, "one", _boom), (2, "two", _boom)])
+        assert database._run_migrations(conn) == 1
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+
+    def test_inline_images_moved_to_store(self, conn, tmp_path, monkeypatch):
+        import base64
+        import image_store
+        monkeypatch.setattr(image_store, "IMAGE_DIR", str(tmp_path / "images"))
+        data_url = "data:image/png;base64," + base64.b64encode(b"\x89PNG" + bytes(500)).decode()
+        conn.execute(
+            "INSERT INTO wardrobe_items (item_id, user_id, name, image_url) VALUES ('i1', 'u', 'x', ?)", (data_url,)
+        )
+        conn.execute("PRAGMA user_version = 2")
+        conn.commit()
+        database.init_db()
+
+        ref = conn.execute("SELECT image_url FROM wardrobe_items").fetchone()[0]
+        assert image_store.key_from_reference(ref) == ref
+        assert image_store.load_data_url(ref) == data_url
+
+    def test_hot_queries_use_indexes(self, conn):
+        assert database.check_query_plans(conn) == {}
+
+    def test_missing_index_is_reported(self, tmp_path, caplog):
+        # Plain connection: EXPLAIN statements cached on a pooled one keep their old plan
+        conn = database.sqlite3.connect(str(tmp_path / "bare.db"))
+        conn.execute("CREATE TABLE wardrobe_items (item_id TEXT, user_id TEXT, name TEXT, created_at TEXT)")
+        with caplog.at_level("WARNING", logger="database"):
+            problems = database.check_query_plans(conn)
+        conn.close()
+        assert "wardrobe listing" in problems
+        assert any("wardrobe listing" in r.getMessage() for r in caplog.records)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# RECOMMEND PROJECTION
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestRecommendProjection:
+
+    def test_outfit_seed_follows_wear_count(self, conn, monkeypatch):
+        import routers.recommend_router as recommend
+        from ai_matcher import fashion_matcher
+
+        monkeypatch.setattr(recommend, "get_db", database.get_db)  # conftest points it at the slim test schema
+        for item_id, category, worn in (("tee", "T-Shirt", 1), ("shirt", "Shirt", 9), ("jeans", "Jeans", 0)):
+            conn.execute(
+                "INSERT INTO wardrobe_items (item_id, user_id, name, category, color, brand, wear_count, created_at) "
+                "VALUES (?, 'user-a', ?, ?, 'Navy', 'Acme', ?, '2024-01-01')",
+                (item_id, item_id, category, worn),
+            )
+        conn.commit()
+
+        wardrobe = recommend._fetch_wardrobe("user-a")
+        assert {"wear_count", "brand", "last_worn"} <= set(wardrobe[0])
+        outfit = fashion_matcher.create_complete_outfit(wardrobe)
+        assert outfit["item_ids"][0] == "shirt"
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# CONNECTION POOL
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestConnectionPool:
+
+    @pytest.fixture
+    def pool(self, tmp_path):
+        pool = database.ConnectionPool(str(tmp_path / "pool.db"), max_size=2, max_overflow=1, timeout=0.2)
+        yield pool
+        pool.close_all()
+
+    def test_pragmas_applied(self, pool):
+        conn = pool.acquire()
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == database.BUSY_TIMEOUT_MS
+        conn.close()
+
+    def test_close_returns_connection_to_same_thread(self, pool):
+        first = pool.acquire()
+        first.close()
+        again = pool.acquire()
+        assert again is first
+        assert pool.stats()["created"] == 1 and pool.stats()["reused"] == 1
+        again.close()
+
+    def test_uncommitted_work_is_rolled_back_on_close(self, pool):
+        conn = pool.acquire()
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.execute("INSERT INTO t VALUES (1)")
+        conn.close()
+        conn = pool.acquire()
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+        conn.close()
+
+    def test_bounded_with_overflow(self, pool):
+        held = [pool.acquire() for _ in range(3)]
+        with pytest.raises(database.sqlite3.OperationalError):
+            pool.acquire()
+        for conn in held:
+            conn.close()
+        stats = pool.stats()
+        assert stats["open"] == 2 and stats["idle"] == 2  # the overflow connection was closed
+
+    def test_waiter_gets_released_connection(self, pool):
+        import threading
+        held = [pool.acquire() for _ in range(3)]
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+        waiter.start()
+        held[0].close()
+        waiter.join(1)
+        assert got and got[0] is held[0]
+        for conn in held[1:] + got:
+            conn.close()
+
+    def test_leaked_connection_slot_is_reclaimed(self, tmp_path):
+        import gc
+        pool = database.ConnectionPool(str(tmp_path / "leak.db"), max_size=1, max_overflow=0, timeout=0.2)
+
+        def leak():
+            pool.acquire().execute("SELECT 1")  # never closed
+
+        leak()
+        gc.collect()
+        conn = pool.acquire()
+        assert pool.stats()["leaked"] == 1 and pool.stats()["open"] == 1
+        conn.close()
+        pool.close_all()
+
+    def test_stats_do_not_expose_the_file_path(self, pool, tmp_path):
+        stats = pool.stats()
+        assert stats["name"] == "pool.db"
+        assert str(tmp_path) not in repr(stats)
+
+    def test_readers_not_blocked_by_open_write(self, pool):
+        writer = pool.acquire()
+        writer.execute("CREATE TABLE t (x INTEGER)")
+        writer.commit()
+        writer.execute("INSERT INTO t VALUES (1)")  # write transaction left open
+        reader = pool.acquire()
+        assert reader.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+        reader.close()
+        writer.commit()
+        writer.close()
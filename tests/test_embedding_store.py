@@ -0,0 +1,265 @@
+"""
+test_embedding_store.py
+───────────────────────
+Unit tests for embedding_store — the per-user vector index manager.
+Each test points FAISS_DIR at its own temp directory and resets the cache,
+and runs once per backend (FAISS when installed, and the NumPy fallback).
+"""
+
+import pytest
+
+import embedding_store
+
+requires_faiss = pytest.mark.skipif(not embedding_store._FAISS_AVAILABLE, reason="faiss-cpu not installed")
+
+
+WARDROBE = [
+    {"item_id": "item-top",    "name": "White Linen Shirt", "category": "Shirt",   "color": "White", "fabric": "Linen"},
+    {"item_id": "item-jeans",  "name": "Blue Jeans",        "category": "Jeans",   "color": "Denim", "fabric": "Denim"},
+    {"item_id": "item-boots",  "name": "Chelsea Boots",     "category": "Boots",   "color": "Black", "fabric": "Leather"},
+    {"item_id": "item-dress",  "name": "Boho Maxi Dress",   "category": "Dress",   "color": "Cream", "fabric": "Linen"},
+]
+
+
+@pytest.fixture(autouse=True, params=["numpy", pytest.param("faiss", marks=requires_faiss)])
+def store_dir(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_store, "BACKEND", request.param)
+    monkeypatch.setattr(embedding_store, "FAISS_DIR", str(tmp_path))
+    embedding_store._cache.clear()
+    yield tmp_path
+    embedding_store._cache.clear()
+
+
+def _query(item):
+    from ai_matcher import _text_to_pseudo_embedding
+    return _text_to_pseudo_embedding(item)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# INDEX CACHE
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestIndexCache:
+
+    def test_repeat_search_hits_cache(self):
+        """After a build, searches are served from memory."""
+        assert embedding_store.build_index("user-a", WARDROBE)
+        before = embedding_store.cache_stats()
+        for _ in range(3):
+            assert embedding_store.search("user-a", _query(WARDROBE[0]), top_k=1) == ["item-top"]
+        after = embedding_store.cache_stats()
+        assert after["hits"] - before["hits"] == 3
+        assert after["misses"] == before["misses"]
+
+    def test_cold_cache_loads_from_disk(self):
+        embedding_store.build_index("user-a", WARDROBE)
+        embedding_store._cache.clear()
+        assert embedding_store.search("user-a", _query(WARDROBE[1]), top_k=1) == ["item-jeans"]
+        assert embedding_store.cache_stats()["entries"] == 1
+
+    def test_add_item_visible_to_next_search(self):
+        embedding_store.build_index("user-a", WARDROBE[:2])
+        new_item = {"item_id": "item-bag", "name": "Tote", "category": "Bag", "color": "Camel", "fabric": "Leather"}
+        assert embedding_store.add_item("user-a", new_item)
+        assert "item-bag" in embedding_store.search("user-a", _query(new_item), top_k=3)
+
+    def test_delete_index_invalidates_cache(self):
+        embedding_store.build_index("user-a", WARDROBE)
+        embedding_store.search("user-a", _query(WARDROBE[0]))
+        embedding_store.delete_index("user-a")
+        assert embedding_store.search("user-a", _query(WARDROBE[0])) == []
+        assert embedding_store.cache_stats()["entries"] == 0
+
+    def test_count_based_eviction(self, monkeypatch):
+        monkeypatch.setattr(embedding_store._cache, "max_entries", 2)
+        for uid in ("user-a", "user-b", "user-c"):
+            embedding_store.build_index(uid, WARDROBE)
+        stats = embedding_store.cache_stats()
+        assert stats["entries"] == 2
+        assert stats["evictions"] >= 1
+
+    def test_memory_based_eviction(self, monkeypatch):
+        embedding_store.build_index("user-a", WARDROBE)
+        one_entry = embedding_store.cache_stats()["bytes"]
+        monkeypatch.setattr(embedding_store._cache, "max_bytes", one_entry + 1)
+        embedding_store.build_index("user-b", WARDROBE)
+        assert embedding_store.cache_stats()["entries"] == 1
+
+    def test_rebuild_elsewhere_invalidates_cached_copy(self):
+        """Another worker rewriting the files on disk must not be masked by the cache."""
+        embedding_store.build_index("user-a", WARDROBE)
+        embedding_store.search("user-a", _query(WARDROBE[0]))
+
+        # Simulate a different process rebuilding the index behind our back
+        cached = embedding_store._cache._entries.pop("user-a")
+        embedding_store._cache._bytes -= cached[3]
+        embedding_store.build_index("user-a", WARDROBE[2:])
+        embedding_store._cache._entries["user-a"] = cached
+        embedding_store._cache._bytes += cached[3]
+
+        results = embedding_store.search("user-a", _query(WARDROBE[0]), top_k=4)
+        assert set(results) == {"item-boots", "item-dress"}
+        assert embedding_store.cache_stats()["invalidations"] >= 1
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# INCREMENTAL EDITS
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestIncrementalEdits:
+
+    def test_remove_item_keeps_rest_of_index(self):
+        embedding_store.build_index("user-a", WARDROBE)
+        assert embedding_store.remove_item("user-a", "item-jeans")
+        assert embedding_store.index_exists("user-a")
+        results = embedding_store.search("user-a", _query(WARDROBE[1]), top_k=10)
+        assert "item-jeans" not in results
+        assert len(results) == 3
+
+    def test_remove_unknown_item_returns_false(self):
+        embedding_store.build_index("user-a", WARDROBE)
+        assert not embedding_store.remove_item("user-a", "nope")
+        assert not embedding_store.remove_item("user-without-index", "item-top")
+
+    def test_update_item_moves_vector(self):
+        embedding_store.build_index("user-a", WARDROBE)
+        edited = {**WARDROBE[0], "category": "Boots", "color": "Black", "fabric": "Leather", "name": "Boots"}
+        assert embedding_store.update_item("user-a", edited)
+        results = embedding_store.search("user-a", _query(edited), top_k=10)
+        assert set(results[:2]) == {"item-top", "item-boots"}
+        assert len(results) == len(WARDROBE)
+
+    def test_update_unindexed_item_adds_it(self):
+        embedding_store.build_index("user-a", WARDROBE[:1])
+        assert embedding_store.update_item("user-a", WARDROBE[1])
+        assert set(embedding_store.search("user-a", _query(WARDROBE[1]), top_k=10)) == {"item-top", "item-jeans"}
+
+    def test_edits_survive_cold_reload(self):
+        embedding_store.build_index("user-a", WARDROBE)
+        embedding_store.remove_item("user-a", "item-top")
+        embedding_store.add_item("user-a", {"item_id": "item-new", "category": "Bag", "color": "Camel"})
+        embedding_store._cache.clear()
+        results = embedding_store.search("user-a", _query(WARDROBE[0]), top_k=10)
+        assert set(results) == {"item-jeans", "item-boots", "item-dress", "item-new"}
+
+    def test_build_from_precomputed_vectors(self):
+        from ai_matcher import encode_items
+        vectors = encode_items(WARDROBE)[::-1].copy()  # deliberately mismatched to the items
+        assert embedding_store.build_index("user-a", WARDROBE, vectors=vectors)
+        assert embedding_store.search("user-a", _query(WARDROBE[3]), top_k=1) == ["item-top"]
+        assert not embedding_store.build_index("user-a", WARDROBE, vectors=vectors[:2])
+
+    @requires_faiss
+    def test_legacy_positional_index_is_upgraded(self, store_dir):
+        """Indexes written before ID mapping (plain IndexFlatL2 + id list) still load."""
+        import json
+        import numpy as np
+        import faiss
+        vectors = np.array([_query(w) for w in WARDROBE], dtype=np.float32)
+        legacy = faiss.IndexFlatL2(vectors.shape[1])
+        legacy.add(vectors)
+        faiss.write_index(legacy, str(store_dir / "user-a.index"))
+        (store_dir / "user-a.ids.json").write_text(json.dumps([w["item_id"] for w in WARDROBE]))
+
+        assert embedding_store.search("user-a", _query(WARDROBE[2]), top_k=1) == ["item-boots"]
+        assert embedding_store.remove_item("user-a", "item-boots")
+        assert "item-boots" not in embedding_store.search("user-a", _query(WARDROBE[2]), top_k=10)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# PERSISTENCE
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestPersistence:
+
+    def test_single_versioned_file(self, store_dir):
+        embedding_store.build_index("user-a", WARDROBE)
+        data = (store_dir / "user-a.faiss").read_bytes()
+        assert data.startswith(embedding_store._MAGIC)
+        assert not (store_dir / "user-a.index").exists()
+        assert not (store_dir / "user-a.ids.json").exists()
+
+    def test_failed_write_keeps_previous_index(self, store_dir, monkeypatch):
+        """A crash between writing the temp file and renaming it must not corrupt anything."""
+        embedding_store.build_index("user-a", WARDROBE)
+
+        def _crash(*args, **kwargs):
+            raise OSError("simulated crash")
+
+        with monkeypatch.context() as m:
+            m.setattr(embedding_store.os, "replace", _crash)
+            assert not embedding_store.remove_item("user-a", "item-top")
+
+        embedding_store._cache.clear()
+        assert len(embedding_store.search("user-a", _query(WARDROBE[0]), top_k=10)) == len(WARDROBE)
+        assert not list(store_dir.glob("*.tmp"))
+
+    def test_concurrent_adds_are_all_kept(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        items = [
+            {"item_id": f"item-{i}", "category": "Top", "color": "Red", "name": f"tee {i}"}
+            for i in range(24)
+        ]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            assert all(pool.map(lambda it: embedding_store.add_item("user-a", it), items))
+
+        embedding_store._cache.clear()
+        results = embedding_store.search("user-a", _query(items[0]), top_k=100)
+        assert sorted(results) == sorted(it["item_id"] for it in items)
+
+    def test_unknown_format_version_is_rejected(self, store_dir):
+        embedding_store.build_index("user-a", WARDROBE)
+        path = store_dir / "user-a.faiss"
+        data = bytearray(path.read_bytes())
+        data[8:12] = (embedding_store._FORMAT_VERSION + 1).to_bytes(4, "little")
+        path.write_bytes(bytes(data))
+        embedding_store._cache.clear()
+        assert embedding_store.search("user-a", _query(WARDROBE[0])) == []
+
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# NUMPY BACKEND
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestNumpyIndex:
+
+    def _random_index(self, n=500, d=24, seed=0):
+        import numpy as np
+        rng = np.random.default_rng(seed)
+        vectors = rng.standard_normal((n, d)).astype(np.float32)
+        index = embedding_store._NumpyIndex(d)
+        index.add_with_ids(vectors, np.arange(100, 100 + n))
+        return index, vectors, rng
+
+    def test_matches_brute_force(self, store_dir):
+        import numpy as np
+        index, vectors, rng = self._random_index()
+        query = rng.standard_normal((1, vectors.shape[1])).astype(np.float32)
+        expected = np.argsort(((vectors - query) ** 2).sum(axis=1))[:10] + 100
+        _d, labels = index.search(query, 10)
+        assert labels[0].tolist() == expected.tolist()
+
+    def test_remove_swaps_last_row(self, store_dir):
+        import numpy as np
+        index, vectors, _rng = self._random_index(n=5)
+        assert index.remove_ids(np.array([101])) == 1
+        assert index.ntotal == 4
+        _d, labels = index.search(vectors[4:5], 1)
+        assert labels[0, 0] == 104
+        assert np.allclose(index.reconstruct(104), vectors[4])
+
+    def test_pads_when_k_exceeds_ntotal(self, store_dir):
+        import numpy as np
+        index, vectors, _rng = self._random_index(n=3)
+        _d, labels = index.search(vectors[:1], 5)
+        assert labels[0, 3:].tolist() == [-1, -1]
+
+    @requires_faiss
+    def test_switching_backend_reads_existing_file(self, store_dir, monkeypatch):
+        embedding_store.build_index("user-a", WARDROBE)
+        other = "faiss" if embedding_store.BACKEND == "numpy" else "numpy"
+        monkeypatch.setattr(embedding_store, "BACKEND", other)
+        embedding_store._cache.clear()
+        assert embedding_store.search("user-a", _query(WARDROBE[3]), top_k=1) == ["item-dress"]
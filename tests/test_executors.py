@@ -0,0 +1,84 @@
+"""
+test_executors.py
+─────────────────
+Unit tests for executors — bounded I/O / CPU pools for blocking work.
+"""
+
+import asyncio
+import contextvars
+import inspect
+import threading
+
+import pytest
+
+import executors
+
+
+@pytest.fixture
+def pool():
+    pool = executors.BoundedExecutor("test", max_workers=1, max_queue=1)
+    yield pool
+    pool.shutdown()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# BOUNDED EXECUTOR
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestBoundedExecutor:
+
+    def test_rejects_beyond_queue_limit(self, pool):
+        started, release = threading.Event(), threading.Event()
+        running = pool.submit(lambda: started.set() or release.wait())
+        assert started.wait(1)
+        queued = pool.submit(lambda: "queued")
+        with pytest.raises(executors.ExecutorSaturated):
+            pool.submit(lambda: "rejected")
+        release.set()
+        assert running.result(1) and queued.result(1) == "queued"
+
+        stats = pool.stats()
+        assert stats["rejected"] == 1 and stats["peak_queued"] == 1
+        assert stats["completed"] == 2 and stats["active"] == 0 and stats["queued"] == 0
+
+    def test_failures_are_counted_and_raised(self, pool):
+        future = pool.submit(lambda: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            future.result(1)
+        assert pool.stats()["failed"] == 1
+
+    def test_runs_in_callers_context(self, pool):
+        request_id = contextvars.ContextVar("request_id", default=None)
+
+        async def main():
+            request_id.set("req-1")
+            return await pool.run(request_id.get)
+
+        assert asyncio.run(main()) == "req-1"
+
+    def test_usable_again_after_shutdown(self, pool):
+        pool.shutdown()
+        assert pool.submit(lambda: 2).result(1) == 2
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# ROUTE DECORATORS
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestOffload:
+
+    def test_handler_runs_off_the_event_loop(self):
+        def handler(item_id: str, top_k: int = 8):
+            return threading.current_thread().name, item_id, top_k
+
+        wrapped = executors.offload_io(handler)
+        assert inspect.iscoroutinefunction(wrapped)
+        assert list(inspect.signature(wrapped).parameters) == ["item_id", "top_k"]
+
+        thread, item_id, top_k = asyncio.run(wrapped("abc", top_k=3))
+        assert thread.startswith("wya-io") and (item_id, top_k) == ("abc", 3)
+
+    def test_health_info_reports_pools(self, client):
+        pools = {p["pool"]: p for p in client.get("/health/info").json()["executors"]}
+        assert set(pools) == {"io", "cpu"}
+        assert {"queued", "peak_queued", "active", "rejected"} <= set(pools["io"])
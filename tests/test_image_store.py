@@ -0,0 +1,114 @@
+"""
+test_image_store.py
+───────────────────
+Tests for image_store (content-addressed blobs) and /api/images.
+"""
+
+import base64
+import hashlib
+
+import pytest
+
+import image_store
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 4
+
+
+@pytest.fixture(autouse=True)
+def image_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_store, "IMAGE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _data_url(data=PNG, ctype="image/png"):
+    return f"data:{ctype};base64,{base64.b64encode(data).decode()}"
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# STORE
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestImageStore:
+
+    def test_put_is_content_addressed_and_sharded(self, image_dir):
+        key = image_store.put(PNG, "image/png")
+        digest = hashlib.sha256(PNG).hexdigest()
+        assert key == f"{digest}.png"
+        assert (image_dir / digest[:2] / digest[2:4] / key).read_bytes() == PNG
+
+    def test_duplicate_content_stored_once(self, image_dir):
+        assert image_store.put(PNG) == image_store.put(PNG)
+        assert len([p for p in image_dir.rglob("*") if p.is_file()]) == 1
+
+    def test_data_url_becomes_its_key(self):
+        url = _data_url()
+        ref = image_store.store_image_url(url)
+        assert ref == image_store.put(PNG)
+        assert image_store.load_data_url(ref) == url
+
+    def test_served_and_legacy_urls_stored_as_key(self):
+        key = image_store.put(PNG)
+        for url in (f"/api/images/{key}", f"http://localhost:8000/api/images/{key}"):
+            assert image_store.store_image_url(url) == key
+            assert image_store.load_data_url(url) == _data_url()
+
+    def test_other_urls_pass_through(self):
+        for url in (None, "", "https://cdn.example.com/shirt.jpg"):
+            assert image_store.store_image_url(url) == url
+
+    def test_rejects_bad_keys_and_types(self):
+        assert image_store.path_for("../../etc/passwd") is None
+        assert image_store.key_from_reference("/api/images/not-a-key.png") is None
+        with pytest.raises(ValueError):
+            image_store.put(b"<svg/>", "image/svg+xml")
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# ENDPOINT
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestImageEndpoint:
+
+    def test_streams_with_cache_headers(self, client):
+        key = image_store.put(PNG)
+        res = client.get(f"/api/images/{key}")
+        assert res.status_code == 200
+        assert res.content == PNG
+        assert res.headers["content-type"] == "image/png"
+        assert "immutable" in res.headers["cache-control"]
+
+    def test_etag_revalidation(self, client):
+        key = image_store.put(PNG)
+        etag = client.get(f"/api/images/{key}").headers["etag"]
+        res = client.get(f"/api/images/{key}", headers={"If-None-Match": etag})
+        assert res.status_code == 304
+
+    def test_unknown_key_404(self, client):
+        assert client.get(f"/api/images/{'0' * 64}.png").status_code == 404
+        assert client.get("/api/images/nope.png").status_code == 404
+
+    def test_listing_returns_absolute_urls(self, client, monkeypatch):
+        from auth_utils import UserProfile, get_current_user
+        from tests.conftest import get_test_db
+
+        key = image_store.put(PNG)
+        user = UserProfile(user_id="img-owner", email="i@wya.com", full_name="I", gender="", location="")
+        client.app.dependency_overrides[get_current_user] = lambda: user
+        conn = get_test_db()
+        conn.execute(
+            "INSERT INTO wardrobe_items (item_id, user_id, name, image_url, created_at) VALUES "
+            "('new', 'img-owner', 'n', ?, '2024-01-02'), ('old', 'img-owner', 'o', ?, '2024-01-01')",
+            (key, f"/api/images/{key}"),
+        )
+        conn.commit()
+        conn.close()
+        try:
+            urls = [i["image_url"] for i in client.get("/api/wardrobe").json()]
+            assert urls == [f"http://testserver/api/images/{key}"] * 2
+            assert client.get(urls[0]).content == PNG
+
+            monkeypatch.setattr(image_store, "IMAGE_PUBLIC_URL", "https://cdn.example.com/img")
+            summary = client.get("/api/wardrobe", params={"view": "summary"}).json()
+            assert summary[0]["image_url"] == f"https://cdn.example.com/img/{key}"
+        finally:
+            client.app.dependency_overrides.pop(get_current_user, None)
@@ -0,0 +1,72 @@
+"""
+test_model_warmup.py
+────────────────────
+Tests for services.model_warmup — startup preload / warmup and the readiness
+gate on /health/ready.
+"""
+
+import asyncio
+
+import pytest
+
+from services import model_warmup
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    state = {"status": "pending", "started_at": None, "finished_at": None,
+             "models": {}, "clip_backend": None, "timings_ms": {}, "error": None}
+    monkeypatch.setattr(model_warmup, "_state", state)
+    return state
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# WARMUP
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestWarmup:
+
+    def test_warm_models_reports_timings(self):
+        report = model_warmup.warm_models()
+        assert set(report["models"]) == {"fashionclip", "sam", "rembg"}
+        assert {"fashionclip_load_ms", "sam_load_ms", "rembg_load_ms", "mask_ms", "color_ms"} <= set(report["timings_ms"])
+
+    def test_startup_marks_ready(self, monkeypatch):
+        monkeypatch.setattr(model_warmup, "MODEL_PRELOAD", True)
+        monkeypatch.setattr(model_warmup, "warm_models",
+                            lambda: {"models": {"fashionclip": True}, "timings_ms": {"fashionclip_load_ms": 5.0}})
+        asyncio.run(model_warmup.run_startup_warmup())
+        status = model_warmup.status()
+        assert status["status"] == "ready" and model_warmup.is_ready()
+        assert status["models"] == {"fashionclip": True}
+        assert "total_ms" in status["timings_ms"] and status["finished_at"]
+
+    def test_failure_degrades_instead_of_blocking(self, monkeypatch):
+        def boom():
+            raise RuntimeError("no weights")
+        monkeypatch.setattr(model_warmup, "MODEL_PRELOAD", True)
+        monkeypatch.setattr(model_warmup, "warm_models", boom)
+        asyncio.run(model_warmup.run_startup_warmup())
+        assert model_warmup.status()["status"] == "degraded" and model_warmup.is_ready()
+
+    def test_disabled(self, monkeypatch):
+        monkeypatch.setattr(model_warmup, "MODEL_PRELOAD", False)
+        asyncio.run(model_warmup.run_startup_warmup())
+        assert model_warmup.status()["status"] == "disabled" and model_warmup.is_ready()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# READINESS
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestReadinessGate:
+
+    def test_not_ready_until_warm(self, client, fresh_state):
+        res = client.get("/health/ready")
+        assert res.status_code == 503
+        assert res.json()["checks"] == {"database": "ok", "models": "pending"}
+
+        fresh_state.update(status="ready", timings_ms={"total_ms": 12.5})
+        res = client.get("/health/ready")
+        assert res.status_code == 200
+        assert res.json()["model_timings_ms"] == {"total_ms": 12.5}
@@ -0,0 +1,79 @@
+"""
+test_outfit_engine.py
+─────────────────────
+Unit tests for services.outfit_engine — beam-search outfit planning.
+"""
+
+from services.outfit_engine import plan_outfits
+
+
+def _item(item_id, category, color="Black", name=""):
+    return {"id": item_id, "item_id": item_id, "category": category, "color": color, "name": name}
+
+
+WARDROBE = [
+    _item("t1", "Shirt", "White", "linen shirt"),
+    _item("t2", "T-Shirt", "Gray", "basic tee"),
+    _item("t3", "Blouse", "Cream", "silk blouse"),
+    _item("b1", "Jeans", "Denim", "blue jeans"),
+    _item("b2", "Trousers", "Black", "tailored trousers"),
+    _item("b3", "Skirt", "Navy"),
+    _item("d1", "Dress", "Burgundy", "maxi dress"),
+    _item("o1", "Blazer", "Navy", "wool blazer"),
+    _item("s1", "Sneakers", "White"),
+    _item("s2", "Boots", "Brown"),
+    _item("a1", "Bag", "Camel"),
+]
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# PLAN OUTFITS
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestPlanOutfits:
+
+    def test_returns_requested_count(self):
+        outfits = plan_outfits(WARDROBE, count=7)
+        assert len(outfits) == 7
+        assert all({"name", "vibe", "item_ids", "items", "compatibility_score", "styling_tips"} <= set(o) for o in outfits)
+
+    def test_outfits_are_well_formed(self):
+        for outfit in plan_outfits(WARDROBE, count=7):
+            cats = [it["category"] for it in outfit["items"]]
+            has_pair = any(c in {"Shirt", "T-Shirt", "Blouse"} for c in cats) and \
+                any(c in {"Jeans", "Trousers", "Skirt"} for c in cats)
+            assert has_pair or "Dress" in cats
+            assert sum(c in {"Sneakers", "Boots"} for c in cats) == 1
+            assert len(set(outfit["item_ids"])) == len(outfit["item_ids"])
+
+    def test_outfits_are_distinct(self):
+        outfits = plan_outfits(WARDROBE, count=7)
+        combos = {frozenset(o["item_ids"]) for o in outfits}
+        assert len(combos) == len(outfits)
+
+    def test_diversity_penalty_spreads_items(self):
+        focused = plan_outfits(WARDROBE, count=3, diversity_penalty=0.0)
+        diverse = plan_outfits(WARDROBE, count=3, diversity_penalty=50.0)
+        distinct = lambda outfits: len({i for o in outfits for i in o["item_ids"]})
+        assert distinct(diverse) >= distinct(focused)
+
+    def test_sorted_best_first_without_penalty(self):
+        scores = [o["compatibility_score"] for o in plan_outfits(WARDROBE, count=5, diversity_penalty=0.0)]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_small_wardrobes(self):
+        assert plan_outfits([], count=3) == []
+        assert plan_outfits(WARDROBE[:1], count=3) == []
+        odd_pair = [_item("h", "Hat"), _item("k", "Kimono")]
+        assert [sorted(o["item_ids"]) for o in plan_outfits(odd_pair, count=3)] == [["h", "k"]]
+        assert plan_outfits([_item("s1", "Sneakers"), _item("s2", "Boots")], count=3) == []
+
+    def test_no_bottoms_or_dresses(self):
+        tops_only = [_item("t1", "Shirt", "White"), _item("t2", "T-Shirt", "Gray"),
+                     _item("s1", "Sneakers", "White"), _item("s2", "Boots", "Brown")]
+        outfits = plan_outfits(tops_only, count=4)
+        assert outfits
+        for outfit in outfits:
+            cats = [it["category"] for it in outfit["items"]]
+            assert sum(c in {"Sneakers", "Boots"} for c in cats) == 1
+            assert sum(c in {"Shirt", "T-Shirt"} for c in cats) == 1
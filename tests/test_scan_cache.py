@@ -0,0 +1,114 @@
+"""
+test_scan_cache.py
+──────────────────
+Tests for scan_cache — exact / near-duplicate result caching for image scans.
+"""
+
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+
+import scan_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(scan_cache, "SCAN_CACHE_PATH", str(tmp_path / "scan_cache.db"))
+    monkeypatch.setattr(scan_cache, "SCAN_CACHE_ENABLED", True)
+    return tmp_path
+
+
+def _photo(seed=0, size=(240, 320)):
+    rng = np.random.default_rng(seed)
+    image = cv2.resize(rng.integers(0, 256, (6, 8, 3), dtype=np.uint8), size[::-1], interpolation=cv2.INTER_CUBIC)
+    return image
+
+
+def _encode(image, ext=".png", **params):
+    flags = [cv2.IMWRITE_JPEG_QUALITY, params["quality"]] if "quality" in params else []
+    return cv2.imencode(ext, image, flags)[1].tobytes()
+
+
+def _run(kind, data, near=False, result=None):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return result or {"success": True, "name": "Red Top"}
+
+    out = asyncio.run(scan_cache.cached(kind, data, compute, near_duplicates=near))
+    return out, len(calls)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# HASHING
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestPerceptualHash:
+
+    def test_stable_under_reencoding(self):
+        image = _photo()
+        png = scan_cache.perceptual_hash(_encode(image))
+        jpeg = scan_cache.perceptual_hash(_encode(image, ".jpg", quality=70))
+        smaller = scan_cache.perceptual_hash(_encode(cv2.resize(image, (160, 120))))
+        assert scan_cache.hamming(png, jpeg) <= 3 and scan_cache.hamming(png, smaller) <= 3
+
+    def test_different_images_differ(self):
+        a, b = (scan_cache.perceptual_hash(_encode(_photo(seed))) for seed in (0, 1))
+        assert scan_cache.hamming(a, b) > 10
+
+    def test_undecodable_bytes(self):
+        assert scan_cache.perceptual_hash(b"not an image") is None
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# CACHE
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestScanCache:
+
+    def test_exact_repeat_is_served_from_cache(self):
+        data = _encode(_photo())
+        assert _run("autotag", data) == ({"success": True, "name": "Red Top"}, 1)
+        assert _run("autotag", data) == ({"success": True, "name": "Red Top"}, 0)
+        assert scan_cache.stats()["exact_hits"] >= 1
+
+    def test_near_duplicates_only_when_asked(self):
+        image = _photo()
+        _run("autotag", _encode(image), near=True)
+        reencoded = _encode(image, ".jpg", quality=80)
+        assert _run("remove_bg", reencoded)[1] == 1
+        assert _run("autotag", reencoded, near=False)[1] == 1
+        assert _run("autotag", _encode(image, ".jpg", quality=60), near=True)[1] == 0
+        assert _run("autotag", _encode(_photo(seed=5)), near=True)[1] == 1
+
+    def test_recoloured_copy_is_not_a_near_duplicate(self):
+        gray = cv2.cvtColor(_photo(), cv2.COLOR_BGR2GRAY).astype(np.float32)
+        neutral = cv2.merge([gray] * 3).astype(np.uint8)
+        tinted = cv2.merge([gray * 0.3, gray * 0.6, gray]).astype(np.uint8)  # same shapes, reddish
+        a, b = (scan_cache.perceptual_hash(_encode(img)) for img in (neutral, tinted))
+        assert scan_cache.hamming(a, b) <= scan_cache.SCAN_CACHE_MAX_DISTANCE  # the dHash can't tell them apart
+        _run("autotag", _encode(neutral), near=True)
+        assert _run("autotag", _encode(tinted), near=True)[1] == 1
+        assert _run("autotag", _encode(neutral, ".jpg", quality=70), near=True)[1] == 0
+
+    def test_failures_not_cached(self):
+        data = _encode(_photo())
+        _run("autotag", data, result={"success": False})
+        assert _run("autotag", data)[1] == 1
+
+    def test_ttl_and_size_bound(self, monkeypatch):
+        first, second = _encode(_photo(1)), _encode(_photo(2))
+        monkeypatch.setattr(scan_cache, "SCAN_CACHE_MAX_ENTRIES", 1)
+        _run("autotag", first)
+        _run("autotag", second)
+        assert _run("autotag", first)[1] == 1  # evicted by `second`
+
+        monkeypatch.setattr(scan_cache, "SCAN_CACHE_TTL", -1)
+        assert _run("autotag", first)[1] == 1  # expired
+
+    def test_unusable_store_falls_back(self, cache_path, monkeypatch):
+        monkeypatch.setattr(scan_cache, "SCAN_CACHE_PATH", str(cache_path / "missing" / "\0bad"))
+        assert _run("autotag", _encode(_photo())) == ({"success": True, "name": "Red Top"}, 1)
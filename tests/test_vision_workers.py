@@ -0,0 +1,149 @@
+"""
+test_vision_workers.py
+──────────────────────
+Tests for the process-pool CV tier (services.vision_workers) and
+executors.BoundedProcessPool timeouts / crash recovery.
+"""
+
+import asyncio
+import base64
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import executors
+import scan_cache
+from ai_model import FashionAIModel
+from services import vision_workers
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _die():
+    os._exit(1)
+
+
+def _png_data_url():
+    img = np.full((160, 120, 3), 235, dtype=np.uint8)
+    cv2.rectangle(img, (25, 20), (95, 140), (40, 40, 160), -1)
+    return "data:image/png;base64," + base64.b64encode(cv2.imencode(".png", img)[1].tobytes()).decode()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# PROCESS POOL
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestBoundedProcessPool:
+
+    @pytest.fixture
+    def pool(self):
+        pool = executors.BoundedProcessPool("test", max_workers=1, max_queue=1, timeout=30)
+        yield pool
+        pool.shutdown()
+
+    def test_timeout_replaces_worker(self, pool):
+        async def main():
+            assert await pool.run(_sleep, 0) == 0
+            with pytest.raises(executors.WorkerError):
+                await pool.run(_sleep, 30, timeout=0.5)
+            return await pool.run(_sleep, 0)
+
+        assert asyncio.run(main()) == 0
+        stats = pool.stats()
+        assert stats["timeouts"] == 1 and stats["restarts"] == 1 and stats["failed"] == 1
+
+    def test_crash_is_retried_then_reported(self, pool):
+        async def main():
+            with pytest.raises(executors.WorkerError):
+                await pool.run(_die)
+            return await pool.run(_sleep, 0)
+
+        assert asyncio.run(main()) == 0
+        assert pool.stats()["crashes"] == 2
+
+    def test_submit_racing_a_restart_is_resubmitted(self, pool, monkeypatch):
+        assert asyncio.run(pool.run(_sleep, 0)) == 0
+        stale, current = pool._executor, pool._current
+        stale.shutdown()
+
+        def racing():  # hands out the executor another task has just shut down
+            if pool._executor is stale:
+                pool._executor = None
+                return stale
+            return current()
+
+        monkeypatch.setattr(pool, "_current", racing)
+        assert asyncio.run(pool.run(_sleep, 0)) == 0
+        assert pool.stats()["failed"] == 0
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# VISION TASKS
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestVisionWorkers:
+
+    @pytest.fixture(autouse=True)
+    def worker_pool(self, monkeypatch):
+        pool = executors.BoundedProcessPool(
+            "cv-test", max_workers=1, max_queue=2, timeout=120,
+            initializer=vision_workers._init_worker, initargs=(False,),
+        )
+        monkeypatch.setattr(vision_workers, "pool", pool)
+        monkeypatch.setattr(vision_workers, "ENABLED", True)
+        monkeypatch.setattr(scan_cache, "SCAN_CACHE_ENABLED", False)
+        yield pool
+        pool.shutdown()
+
+    def test_autotag_matches_in_process_result(self):
+        image = _png_data_url()
+        remote = asyncio.run(FashionAIModel.autotag_garment(image))
+        local = FashionAIModel._autotag_sync(image)
+        assert remote == local
+
+    def test_remove_background_returns_png(self):
+        result = asyncio.run(FashionAIModel.remove_background(_png_data_url()))
+        assert result["success"]
+        assert base64.b64decode(result["bg_removed_image"]).startswith(b"\x89PNG")
+
+    def test_bad_input_fails_without_a_worker(self, worker_pool):
+        result = asyncio.run(FashionAIModel.autotag_garment("not an image"))
+        assert result["success"] is False
+        assert worker_pool.stats()["submitted"] == 0
+
+    def test_decode_error_is_not_masked(self, monkeypatch):
+        def corrupt(data, max_side=None):
+            view = np.frombuffer(data, np.uint8)  # still referenced from the traceback
+            raise ValueError(f"corrupt image ({view.size} bytes)")
+
+        monkeypatch.setattr(FashionAIModel.vision, "decode_image_bytes", corrupt)
+        shm = vision_workers.shared_memory.SharedMemory(create=True, size=16)
+        try:
+            with pytest.raises(ValueError, match="corrupt image"):
+                vision_workers._read_image(shm.name, 16)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def test_warmup_reports_worker_models(self, worker_pool):
+        report = asyncio.run(vision_workers.warmup())
+        assert report["workers"] == worker_pool.max_workers
+        assert set(report["models"]) == {"fashionclip", "sam", "rembg"}
+        assert "mask_ms" in report["timings_ms"]
+
+    def test_warmup_reaches_every_worker(self, monkeypatch):
+        pool = executors.BoundedProcessPool(
+            "cv-test", max_workers=2, max_queue=0, timeout=120,
+            initializer=vision_workers._init_worker, initargs=(False,),
+        )
+        monkeypatch.setattr(vision_workers, "pool", pool)
+        try:
+            assert asyncio.run(vision_workers.warmup())["workers"] == 2
+        finally:
+            pool.shutdown()
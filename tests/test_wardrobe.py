@@ -149,3 +149,82 @@ class TestDeleteItem:
         item_id = self._add_item(client, auth_headers)
         res = client.delete(f"/api/wardrobe/{item_id}", headers=second_auth_headers)
         assert res.status_code in (403, 404)
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# PAGINATION & PROJECTION
+# ══════════════════════════════════════════════════════════════════════════════
+
+class TestWardrobePagination:
+
+    @pytest.fixture
+    def owner(self, client):
+        """Seed five items directly and sign requests in as their owner."""
+        from auth_utils import UserProfile, get_current_user
+        from tests.conftest import get_test_db
+
+        user = UserProfile(user_id="owner", email="o@wya.com", full_name="O", gender="", location="")
+        client.app.dependency_overrides[get_current_user] = lambda: user
+        conn = get_test_db()
+        for i, day in enumerate(["2024-01-01", "2024-01-02", "2024-01-02", "2024-01-03", "2024-01-04"]):
+            conn.execute(
+                "INSERT INTO wardrobe_items (item_id, user_id, name, category, color, image_url, created_at) "
+                "VALUES (?, 'owner', ?, 'Top', 'Black', ?, ?)",
+                (f"item-{i}", f"Item {i}", f"/api/images/{i}.png", day),
+            )
+        conn.commit()
+        conn.close()
+        yield user
+        client.app.dependency_overrides.pop(get_current_user, None)
+
+    def test_unpaged_listing_is_unchanged(self, client, owner):
+        res = client.get("/api/wardrobe")
+        assert [i["item_id"] for i in res.json()] == ["item-4", "item-3", "item-2", "item-1", "item-0"]
+        assert "X-Next-Cursor" not in res.headers
+
+    def test_keyset_pages_cover_wardrobe_once(self, client, owner):
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            res = client.get("/api/wardrobe", params=params)
+            assert res.status_code == 200 and len(res.json()) <= 2
+            seen += [i["item_id"] for i in res.json()]
+            cursor = res.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert seen == ["item-4", "item-3", "item-2", "item-1", "item-0"]
+
+    def test_undated_rows_page_past_the_boundary(self, client, owner):
+        from tests.conftest import get_test_db
+
+        conn = get_test_db()
+        for item_id in ("legacy-a", "legacy-b", "legacy-c"):
+            conn.execute(
+                "INSERT INTO wardrobe_items (item_id, user_id, name, category, created_at) "
+                "VALUES (?, 'owner', ?, 'Top', NULL)", (item_id, item_id),
+            )
+        conn.commit()
+        conn.close()
+
+        seen, cursor = [], None
+        while True:
+            res = client.get("/api/wardrobe", params={"limit": 3, **({"cursor": cursor} if cursor else {})})
+            seen += [i["item_id"] for i in res.json()]
+            cursor = res.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert seen == ["item-4", "item-3", "item-2", "item-1", "item-0", "legacy-c", "legacy-b", "legacy-a"]
+        assert seen == [i["item_id"] for i in client.get("/api/wardrobe").json()]
+
+    def test_summary_and_fields(self, client, owner):
+        summary = client.get("/api/wardrobe", params={"view": "summary", "limit": 1}).json()
+        assert summary == [{
+            "item_id": "item-4", "name": "Item 4", "category": "Top",
+            "color": "Black", "image_url": "/api/images/4.png",
+        }]
+        picked = client.get("/api/wardrobe", params={"fields": "name,color"}).json()
+        assert picked[0] == {"name": "Item 4", "color": "Black"}
+
+    def test_rejects_unknown_fields_and_bad_cursor(self, client, owner):
+        assert client.get("/api/wardrobe", params={"fields": "name,embedding"}).status_code == 400
+        assert client.get("/api/wardrobe", params={"cursor": "not-a-cursor", "limit": 2}).status_code == 400